@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("classroom_scheduler", "0006_reservationvisibility"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoomUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("week_start", models.DateField()),
+                (
+                    "weekday",
+                    models.PositiveSmallIntegerField(
+                        help_text="ISO weekday, 1 is Monday."
+                    ),
+                ),
+                ("hour", models.PositiveSmallIntegerField()),
+                ("booked_slots", models.IntegerField(default=0)),
+                (
+                    "room",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="usage",
+                        to="classroom_scheduler.room",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["week_start", "room"], name="room_usage_week_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("room", "week_start", "weekday", "hour"),
+                        name="unique_room_usage_slot",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import models
+
+from classroom_scheduler.models import Room
+
+
+class RoomUsage(models.Model):
+    """
+    Booked slots per room, week, weekday and hour of day, in the project time zone. Kept current
+    from reservation changes, so utilisation reports read these rows instead of reservations.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='usage')
+    week_start = models.DateField()
+    weekday = models.PositiveSmallIntegerField(help_text='ISO weekday, 1 is Monday.')
+    hour = models.PositiveSmallIntegerField()
+    booked_slots = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'week_start', 'weekday', 'hour'], name='unique_room_usage_slot'),
+        ]
+        indexes = [
+            models.Index(fields=['week_start', 'room'], name='room_usage_week_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id} {self.week_start} {self.weekday}/{self.hour}: {self.booked_slots}"
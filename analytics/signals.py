@@ -0,0 +1,12 @@
+from django.dispatch import receiver
+
+from classroom_scheduler.signals import reservations_changed
+from .usage import apply_usage_deltas, usage_deltas
+
+
+@receiver(reservations_changed)
+def track_room_usage(sender, action, changes, **kwargs):
+    # Applied in the writer's transaction, so a rolled back booking never shows up in the totals.
+    deltas = usage_deltas(action, changes)
+    if deltas:
+        apply_usage_deltas(deltas)
@@ -0,0 +1,78 @@
+from datetime import date, datetime
+
+from django.utils.timezone import make_aware
+from rest_framework.test import APITestCase
+
+from classroom_scheduler.models import Building, ClassGroup, Reservation, ReservationInfo, Room
+from users.models import CustomUser
+from .models import RoomUsage
+from .usage import rebuild_room_usage
+
+
+class RoomUsageTest(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(username="admin", email='admin@example.com', password="pass")
+        self.client.force_authenticate(self.admin)
+        building = Building.objects.create(name="D17", address="Kawiory 21", department="WIEiT")
+        self.small = Room.objects.create(building=building, room_number="1.38", capacity=20)
+        self.large = Room.objects.create(building=building, room_number="1.40", capacity=60)
+        group = ClassGroup.objects.create(name="Group A")
+        self.info = ReservationInfo.objects.create(user=self.admin, group=group, description="desc")
+
+    def book(self, room, day, hour):
+        return Reservation.objects.create(
+            room=room, date_time=make_aware(datetime(2025, 6, day, hour, 0)), reservation_info=self.info
+        )
+
+    def usage(self):
+        return sorted(RoomUsage.objects.filter(booked_slots__gt=0).values_list(
+            'room_id', 'week_start', 'weekday', 'hour', 'booked_slots'
+        ))
+
+    def test_usage_follows_reservation_changes(self):
+        first = self.book(self.small, 2, 10)
+        self.book(self.large, 3, 10)
+        first.room = self.large
+        first.save()
+        self.book(self.small, 10, 12).delete()
+
+        self.assertEqual(self.usage(), [
+            (self.large.id, date(2025, 6, 2), 1, 10, 1),
+            (self.large.id, date(2025, 6, 2), 2, 10, 1),
+        ])
+        incremental = self.usage()
+        rebuild_room_usage()
+        self.assertEqual(self.usage(), incremental)
+
+    def test_rebuild_counts_reservations_of_deleted_rooms(self):
+        self.book(self.small, 2, 10)
+        self.book(self.large, 3, 10).delete()
+        self.small.delete()
+
+        incremental = self.usage()
+        self.assertEqual(incremental, [(self.small.id, date(2025, 6, 2), 1, 10, 1)])
+        rebuild_room_usage()
+        self.assertEqual(self.usage(), incremental)
+
+    def test_report(self):
+        self.book(self.small, 2, 10)
+        self.book(self.large, 3, 10)
+        self.book(self.large, 10, 10)
+
+        response = self.client.get('/api/analytics/', {'start': '2025-06-02', 'end': '2025-06-15', 'group_by': 'room'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['weeks'], 2)
+        small, large = response.data['results']
+        self.assertEqual((small['booked_slots'], large['booked_slots']), (1, 2))
+        self.assertEqual(large['available_slots'], 120)
+        self.assertEqual(response.data['peak_hours'][0], {'weekday': 2, 'hour': 10, 'booked_slots': 2})
+
+        response = self.client.get('/api/analytics/', {'start': '2025-06-02', 'end': '2025-06-15'})
+        building, = response.data['results']
+        self.assertEqual(building['booked_slots'], 3)
+        # (20 + 2 * 60) booked seats out of (20 + 60) seats * 2 weeks * 60 slots.
+        self.assertEqual(building['occupancy'], round(140 / 9600, 4))
+
+    def test_report_is_staff_only(self):
+        self.client.force_authenticate(CustomUser.objects.create_user(username="student", email='student@example.com'))
+        self.assertEqual(self.client.get('/api/analytics/').status_code, 403)
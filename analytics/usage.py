@@ -0,0 +1,149 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, TruncWeek
+from django.utils import timezone
+
+from classroom_scheduler.models import Reservation
+from .models import RoomUsage
+
+# group_by value -> (grouping key, label) on Room.
+GROUPINGS = {
+    'room': ('id', 'room_number'),
+    'building': ('building_id', 'building__name'),
+    'department': ('building__department', 'building__department'),
+}
+PEAK_HOURS_LIMIT = 5
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def usage_slot(room_id, date_time):
+    local = timezone.localtime(date_time)
+    return room_id, week_start(local.date()), local.isoweekday(), local.hour
+
+
+def usage_deltas(action, changes):
+    """Net change of booked slots per (room, week, weekday, hour) for a reservations_changed batch."""
+    deltas = Counter()
+    for change in changes:
+        previous = None
+        if change['previous_room_id'] is not None and change['previous_date_time'] is not None:
+            previous = usage_slot(change['previous_room_id'], change['previous_date_time'])
+        current = usage_slot(change['room_id'], change['date_time'])
+
+        if action == 'created':
+            deltas[current] += 1
+        elif action == 'deleted':
+            # The row went away with the values it was last saved with.
+            deltas[previous or current] -= 1
+        elif previous is not None:
+            deltas[previous] -= 1
+            deltas[current] += 1
+    return {slot: delta for slot, delta in deltas.items() if delta}
+
+
+def apply_usage_deltas(deltas):
+    with transaction.atomic():
+        RoomUsage.objects.bulk_create(
+            [
+                RoomUsage(room_id=room_id, week_start=week, weekday=weekday, hour=hour)
+                for (room_id, week, weekday, hour), delta in deltas.items() if delta > 0
+            ],
+            ignore_conflicts=True
+        )
+        # A fixed order keeps concurrent writers from deadlocking on each other's rows.
+        for (room_id, week, weekday, hour), delta in sorted(deltas.items()):
+            RoomUsage.objects.filter(room_id=room_id, week_start=week, weekday=weekday, hour=hour).update(
+                booked_slots=F('booked_slots') + delta
+            )
+
+
+def rebuild_room_usage(batch_size=1000):
+    """
+    Recompute every usage row from the reservations with one aggregate query. Meant to be run
+    while reservations are not being written. Returns the number of rows.
+    """
+    # Reservations of deleted rooms count until they are tombstoned too, as in usage_deltas.
+    rows = Reservation.all_objects.filter(deleted_at__isnull=True).annotate(
+        week_start=TruncWeek('date_time', output_field=DateField()),
+        weekday=ExtractIsoWeekDay('date_time'),
+        hour=ExtractHour('date_time'),
+    ).values('room_id', 'week_start', 'weekday', 'hour').annotate(booked_slots=Count('id')).order_by()
+
+    usage = [RoomUsage(**row) for row in rows]
+    with transaction.atomic():
+        RoomUsage.objects.all().delete()
+        RoomUsage.objects.bulk_create(usage, batch_size=batch_size)
+    return len(usage)
+
+
+def utilisation_report(rooms, first_week, last_week, group_by):
+    """
+    Booked slots, utilisation and capacity-weighted occupancy of `rooms` between two week
+    starts (inclusive), grouped by room, building, department or week, plus the busiest
+    weekday/hour slots. Reads only usage rows of the requested weeks.
+    """
+    weeks = (last_week - first_week).days // 7 + 1
+    weekly_slots = settings.ANALYTICS_WEEKLY_SLOTS
+    usage = RoomUsage.objects.filter(room__in=rooms, week_start__range=(first_week, last_week))
+
+    if group_by == 'week':
+        totals = rooms.aggregate(rooms=Count('id'), capacity=Sum('capacity'))
+        booked = {
+            row['week_start']: row
+            for row in usage.values('week_start').annotate(
+                booked=Sum('booked_slots'), seat_slots=Sum(F('booked_slots') * F('room__capacity'))
+            )
+        }
+        results = [
+            summarise(week, week, booked.get(week, {}), totals, 1, weekly_slots)
+            for week in (first_week + timedelta(weeks=offset) for offset in range(weeks))
+        ]
+    else:
+        key, label = GROUPINGS[group_by]
+        booked = {
+            row['key']: row
+            for row in usage.values(key=F(f'room__{key}')).annotate(
+                booked=Sum('booked_slots'), seat_slots=Sum(F('booked_slots') * F('room__capacity'))
+            )
+        }
+        results = [
+            summarise(group['key'], group['label'], booked.get(group['key'], {}), group, weeks, weekly_slots)
+            for group in rooms.values(key=F(key), label=F(label)).annotate(
+                rooms=Count('id'), capacity=Sum('capacity')
+            ).order_by('key')
+        ]
+
+    peak_hours = usage.values('weekday', 'hour').annotate(
+        booked_slots=Sum('booked_slots')
+    ).filter(booked_slots__gt=0).order_by('-booked_slots', 'weekday', 'hour')[:PEAK_HOURS_LIMIT]
+
+    return {
+        'start': first_week,
+        'end': last_week + timedelta(days=6),
+        'weeks': weeks,
+        'group_by': group_by,
+        'results': results,
+        'peak_hours': list(peak_hours),
+    }
+
+
+def summarise(key, label, booked, totals, weeks, weekly_slots):
+    available_slots = (totals['rooms'] or 0) * weeks * weekly_slots
+    available_seat_slots = (totals['capacity'] or 0) * weeks * weekly_slots
+    booked_slots = booked.get('booked') or 0
+    return {
+        'key': key,
+        'label': label,
+        'rooms': totals['rooms'] or 0,
+        'booked_slots': booked_slots,
+        'available_slots': available_slots,
+        'utilisation': round(booked_slots / available_slots, 4) if available_slots else 0.0,
+        'occupancy': round((booked.get('seat_slots') or 0) / available_seat_slots, 4) if available_seat_slots else 0.0,
+    }
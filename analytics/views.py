@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from classroom_scheduler.models import Room
+from .usage import GROUPINGS, utilisation_report, week_start
+
+DEFAULT_WEEKS = 12
+GROUP_BY_CHOICES = [*GROUPINGS, 'week']
+
+
+class UtilisationView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='start', type=str, location=OpenApiParameter.QUERY, required=False,
+                             description=f"First day (YYYY-MM-DD), widened to its week. Defaults to {DEFAULT_WEEKS} weeks back."),
+            OpenApiParameter(name='end', type=str, location=OpenApiParameter.QUERY, required=False,
+                             description="Last day (YYYY-MM-DD), widened to its week. Defaults to the current week."),
+            OpenApiParameter(name='group_by', type=str, location=OpenApiParameter.QUERY, required=False,
+                             enum=GROUP_BY_CHOICES, description="Defaults to building."),
+            OpenApiParameter(name='building', type=int, location=OpenApiParameter.QUERY, required=False),
+            OpenApiParameter(name='department', type=str, location=OpenApiParameter.QUERY, required=False),
+            OpenApiParameter(name='room', type=int, location=OpenApiParameter.QUERY, required=False),
+        ],
+        responses={
+            200: OpenApiResponse(description="Utilisation per group and the busiest weekday/hour slots."),
+            400: OpenApiResponse(description="Invalid dates or grouping."),
+        },
+        description=(
+            "Room utilisation from the precomputed usage tables. `utilisation` is booked slots over "
+            "bookable slots; `occupancy` weighs every slot by room capacity."
+        )
+    )
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'building')
+        if group_by not in GROUP_BY_CHOICES:
+            return Response({'error': f"group_by must be one of {', '.join(GROUP_BY_CHOICES)}."}, status=400)
+
+        today = timezone.localdate()
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        try:
+            last_week = week_start(parse_date(end) if end else today)
+            first_week = week_start(parse_date(start)) if start else last_week - timedelta(weeks=DEFAULT_WEEKS - 1)
+        except (TypeError, ValueError):
+            return Response({'error': 'start and end must be dates (YYYY-MM-DD).'}, status=400)
+        if first_week > last_week:
+            return Response({'error': 'start must not be after end.'}, status=400)
+
+        rooms = Room.objects.all()
+        try:
+            if 'building' in request.query_params:
+                rooms = rooms.filter(building_id=int(request.query_params['building']))
+            if 'room' in request.query_params:
+                rooms = rooms.filter(id=int(request.query_params['room']))
+        except ValueError:
+            return Response({'error': 'building and room must be integers.'}, status=400)
+        if 'department' in request.query_params:
+            rooms = rooms.filter(building__department=request.query_params['department'])
+
+        return Response(utilisation_report(rooms, first_week, last_week, group_by))
@@ -0,0 +1,66 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+# The replica serving the current block, or None for the primary.
+_replica_alias = ContextVar('replica_alias', default=None)
+
+PIN_KEY = 'db_router:primary-pin:{}'
+
+
+def activate_replica_reads():
+    """
+    Send reads to a replica until deactivated. One replica serves the whole block, as replicas
+    lag by different amounts: a change version read from one must not be paired with a list or
+    a change log read from another that is further behind. Nested blocks keep the outer replica.
+    """
+    alias = _replica_alias.get()
+    if alias is None and settings.DATABASE_REPLICAS:
+        alias = random.choice(settings.DATABASE_REPLICAS)
+    return _replica_alias.set(alias)
+
+
+def deactivate_replica_reads(token):
+    _replica_alias.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """Let reads inside the block go to a replica. Writes always go to the primary."""
+    token = activate_replica_reads()
+    try:
+        yield
+    finally:
+        deactivate_replica_reads(token)
+
+
+def pin_to_primary(key):
+    """Send `key`'s reads to the primary until the replicas have caught up with its write."""
+    if settings.DATABASE_REPLICAS:
+        cache.set(PIN_KEY.format(key), True, timeout=settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(key):
+    return bool(settings.DATABASE_REPLICAS) and cache.get(PIN_KEY.format(key), False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _replica_alias.get()
+        if alias is not None and alias in settings.DATABASE_REPLICAS:
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary, so objects may relate across aliases.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
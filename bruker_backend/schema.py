@@ -0,0 +1,79 @@
+"""
+The OpenAPI endpoints. The schema is built at deploy time (manage.py build_openapi_schema) and
+served from memory; drf-spectacular's generator, which pulls in a large part of the import graph,
+is only imported when DEBUG has to generate it live.
+"""
+import hashlib
+import os
+from functools import cache
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+
+OPENAPI_CONTENT_TYPE = 'application/vnd.oai.openapi+json'
+
+# path -> (mtime_ns, size, body, etag); re-validated with a stat() per request, so a rebuilt file is picked up.
+_loaded = {}
+
+
+def load_schema(path):
+    """The schema file's contents and ETag, or None when it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    cached = _loaded.get(path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2:]
+
+    with open(path, 'rb') as schema_file:
+        body = schema_file.read()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    _loaded[path] = (stat.st_mtime_ns, stat.st_size, body, etag)
+    return body, etag
+
+
+def build_schema():
+    """The API's OpenAPI document as JSON bytes."""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer
+
+    generator = SchemaGenerator()
+    return OpenApiJsonRenderer().render(generator.get_schema(request=None, public=True), renderer_context={})
+
+
+@cache
+def generated_schema_view():
+    from drf_spectacular.views import SpectacularAPIView
+    return SpectacularAPIView.as_view()
+
+
+@cache
+def swagger_ui_view():
+    from drf_spectacular.views import SpectacularSwaggerView
+    return SpectacularSwaggerView.as_view(url_name='schema')
+
+
+@require_safe
+def schema(request):
+    loaded = load_schema(settings.OPENAPI_SCHEMA_FILE) if settings.OPENAPI_SCHEMA_FILE else None
+    if loaded is None:
+        if settings.DEBUG:
+            return generated_schema_view()(request)
+        return JsonResponse({'detail': 'The API schema has not been built.'}, status=503)
+
+    body, etag = loaded
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type=OPENAPI_CONTENT_TYPE)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_safe
+def swagger_ui(request):
+    return swagger_ui_view()(request)
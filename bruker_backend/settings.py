@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "django_extensions",
     "cli_tools",
+    "analytics",
 ]
 
 
@@ -69,6 +70,15 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
         'rest_framework.filters.SearchFilter',
     ],
+    # Requests per user (or client IP when anonymous) for views with a matching throttle_scope.
+    'DEFAULT_THROTTLE_RATES': {
+        'login': env("THROTTLE_LOGIN_RATE", default="10/min"),
+        'register': env("THROTTLE_REGISTER_RATE", default="5/hour"),
+        'password_reset': env("THROTTLE_PASSWORD_RESET_RATE", default="5/hour"),
+        'reservation_write': env("THROTTLE_RESERVATION_WRITE_RATE", default="120/min"),
+    },
+    # Number of proxies in front of the app, so the client IP is read from X-Forwarded-For.
+    'NUM_PROXIES': env.int("NUM_PROXIES", default=None),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -78,6 +88,10 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# OpenAPI document served by /api/schema/, built by build_openapi_schema. Without it, only DEBUG
+# generates the schema on request.
+OPENAPI_SCHEMA_FILE = env("OPENAPI_SCHEMA_FILE", default=None)
+
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
@@ -122,6 +136,22 @@ WSGI_APPLICATION = "bruker_backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connections are reused across requests instead of paying TCP/TLS setup and authentication
+# every time: either kept open per worker thread for DB_CONN_MAX_AGE seconds, or, with DB_POOL,
+# borrowed from a psycopg connection pool (requires psycopg[pool]).
+DB_POOL = env.bool("DB_POOL", default=False)
+DB_CONN_HEALTH_CHECKS = env.bool("DB_CONN_HEALTH_CHECKS", default=True)
+
+DB_OPTIONS = {}
+if DB_POOL:
+    # With CONN_HEALTH_CHECKS on, Django makes the pool verify each connection before handing it out.
+    DB_OPTIONS["pool"] = {
+        "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+        "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+        "timeout": env.float("DB_POOL_TIMEOUT", default=10.0),
+        "max_idle": env.float("DB_POOL_MAX_IDLE", default=600.0),
+    }
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -130,12 +160,48 @@ DATABASES = {
         "PASSWORD": env("DB_PASSWORD", default="bruker"),
         "HOST": env("DB_HOST", default="localhost"),
         "PORT": env.int("DB_PORT", default=5432),
+        # The pool manages connection lifetime itself and cannot be combined with persistent connections.
+        "CONN_MAX_AGE": 0 if DB_POOL else env.int("DB_CONN_MAX_AGE", default=60),
+        "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+        "OPTIONS": DB_OPTIONS,
         "TEST": {
             "NAME": env("DB_TEST_NAME", default="bruker_db_test"),
         },
     }
 }
 
+# Read replicas, given as "host" or "host:port" entries. Safe requests to the scheduler API are
+# served from a random replica, except for users who wrote within the last
+# DB_REPLICA_STICKY_SECONDS, so they always read their own writes.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(env.list("DB_REPLICA_HOSTS", default=[])):
+    host, _, port = replica.partition(":")
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": int(port) if port else DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["bruker_backend.db_router.ReplicaRouter"]
+DB_REPLICA_STICKY_SECONDS = env.int("DB_REPLICA_STICKY_SECONDS", default=10)
+
+# Caches, given as URLs: locmemcache://, dbcache://table_name (run createcachetable) or redis://host:6379/0.
+# Throttle counters only limit each worker separately unless THROTTLE_CACHE_URL is shared.
+# The default cache carries the replica read pins and the generation keys that tell workers to
+# rebuild their in-memory room matrix, autocomplete index and equipment attribute registry. With
+# more than one worker process CACHE_URL has to be shared (settings_production requires it);
+# otherwise other workers only see a write once their copy is LOCAL_INDEX_MAX_AGE seconds old,
+# and a pin to the primary only holds on the worker that took the write.
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
+    "throttle": env.cache_url("THROTTLE_CACHE_URL", default="locmemcache://throttle"),
+}
+THROTTLE_CACHE = "throttle"
+LOCAL_INDEX_MAX_AGE = env.int("LOCAL_INDEX_MAX_AGE", default=300)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -154,6 +220,31 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing profile: "pbkdf2", "scrypt" or "argon2" (needs argon2-cffi). New passwords use
+# the profile's hasher; hashes of the other hashers, or with other parameters, are upgraded on the
+# next successful login. Pick the parameters with `manage.py benchmark_password_hashers`.
+PASSWORD_HASHER_PROFILE = env("PASSWORD_HASHER_PROFILE", default="pbkdf2")
+PASSWORD_HASHER_PROFILES = {
+    "pbkdf2": "users.hashers.TunedPBKDF2PasswordHasher",
+    "scrypt": "users.hashers.TunedScryptPasswordHasher",
+    "argon2": "users.hashers.TunedArgon2PasswordHasher",
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]] + [
+    hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items() if profile != PASSWORD_HASHER_PROFILE
+] + [
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+]
+
+# Unset means Django's default iteration count.
+PASSWORD_HASH_PBKDF2_ITERATIONS = env.int("PASSWORD_HASH_PBKDF2_ITERATIONS", default=None)
+PASSWORD_HASH_SCRYPT_WORK_FACTOR = env.int("PASSWORD_HASH_SCRYPT_WORK_FACTOR", default=2 ** 14)
+PASSWORD_HASH_SCRYPT_BLOCK_SIZE = env.int("PASSWORD_HASH_SCRYPT_BLOCK_SIZE", default=8)
+PASSWORD_HASH_SCRYPT_PARALLELISM = env.int("PASSWORD_HASH_SCRYPT_PARALLELISM", default=5)
+PASSWORD_HASH_ARGON2_TIME_COST = env.int("PASSWORD_HASH_ARGON2_TIME_COST", default=2)
+PASSWORD_HASH_ARGON2_MEMORY_COST = env.int("PASSWORD_HASH_ARGON2_MEMORY_COST", default=102400)
+PASSWORD_HASH_ARGON2_PARALLELISM = env.int("PASSWORD_HASH_ARGON2_PARALLELISM", default=8)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -178,6 +269,24 @@ STATICFILES_DIRS = [
 AUTH_USER_MODEL = 'users.CustomUser'
 AUTHENTICATION_BACKENDS = ['users.backends.EmailBackend']
 
+# Reservations store only their start; every reservation occupies its room for this long.
+RESERVATION_SLOT_MINUTES = env.int("RESERVATION_SLOT_MINUTES", default=90)
+
+# How long a POST's Idempotency-Key is remembered; purge_idempotency_keys drops older ones.
+IDEMPOTENCY_KEY_TTL_HOURS = env.int("IDEMPOTENCY_KEY_TTL_HOURS", default=24)
+# A claimed key whose request has not finished after this long is taken over by the next retry,
+# as the worker handling it has most likely died.
+IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS = env.int("IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS", default=300)
+
+# Reservation change log entries older than this are purged; clients behind it resync fully.
+RESERVATION_CHANGE_RETENTION_DAYS = env.int("RESERVATION_CHANGE_RETENTION_DAYS", default=30)
+
+# Deleted rooms and reservations stay as tombstones this long before purge_deleted_records removes them.
+SOFT_DELETE_RETENTION_DAYS = env.int("SOFT_DELETE_RETENTION_DAYS", default=30)
+
+# Bookable slots per room and week; the denominator of utilisation reports.
+ANALYTICS_WEEKLY_SLOTS = env.int("ANALYTICS_WEEKLY_SLOTS", default=60)
+
 
 # Emailing settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
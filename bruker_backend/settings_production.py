@@ -0,0 +1,22 @@
+"""
+Settings for API workers in production: DJANGO_SETTINGS_MODULE=bruker_backend.settings_production.
+
+Workers only serve the JSON API, so apps needed for development (shell_plus, the crispy form
+templates) are not loaded, and the OpenAPI schema is served from OPENAPI_SCHEMA_FILE instead of
+being generated, which keeps drf-spectacular's generator out of every worker's startup.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, CACHES, INSTALLED_APPS, env
+
+DEBUG = False
+SECRET_KEY = env("SECRET_KEY")
+ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default=["*"])
+
+# Shared by every worker, so cache invalidations and replica pins reach all of them; no default.
+CACHES["default"] = env.cache_url("CACHE_URL")
+
+DEVELOPMENT_APPS = ["crispy_forms", "crispy_bootstrap5", "django_extensions"]
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEVELOPMENT_APPS]
+
+# Built at deploy time with manage.py build_openapi_schema.
+OPENAPI_SCHEMA_FILE = env("OPENAPI_SCHEMA_FILE", default=str(BASE_DIR / "openapi.json"))
@@ -0,0 +1,104 @@
+"""
+Rate limits for endpoints that hash passwords, send mail or write reservations. Counters live
+in the THROTTLE_CACHE cache, so its backend decides the storage: local memory (per process),
+the database or Redis (shared by every worker).
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+WINDOW_KEY = 'throttle:{scope}:{ident}:{window}'
+REJECTED_KEY = 'throttle:rejected:{}'
+
+
+def throttle_cache():
+    return caches[settings.THROTTLE_CACHE]
+
+
+def record_rejection(scope, ident):
+    logger.warning('Throttled %s request from %s', scope, ident)
+    cache = throttle_cache()
+    cache.add(REJECTED_KEY.format(scope), 0, timeout=None)
+    cache.incr(REJECTED_KEY.format(scope))
+
+
+def rejection_counts(scopes):
+    """{scope: requests rejected since the counters were last reset}."""
+    counts = throttle_cache().get_many([REJECTED_KEY.format(scope) for scope in scopes])
+    return {scope: counts.get(REJECTED_KEY.format(scope), 0) for scope in scopes}
+
+
+def reset_rejection_counts(scopes):
+    throttle_cache().delete_many([REJECTED_KEY.format(scope) for scope in scopes])
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Limits requests to the rate configured for `view.throttle_scope`, per user when authenticated
+    and per client IP otherwise. The sliding window is estimated from the counters of the current
+    and the previous fixed window, so a request costs one read and one increment at any rate.
+    """
+
+    def __init__(self):
+        # The scope, and so the rate, is only known once the view is.
+        pass
+
+    @property
+    def cache(self):
+        return throttle_cache()
+
+    def applies_to(self, request):
+        return True
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'ip-{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        if not self.scope or not self.applies_to(request):
+            return True
+
+        self.num_requests, self.duration = self.parse_rate(self.get_rate())
+        if self.num_requests is None:
+            return True
+
+        ident = self.get_cache_key(request, view)
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        current_key = WINDOW_KEY.format(scope=self.scope, ident=ident, window=int(window))
+        previous_key = WINDOW_KEY.format(scope=self.scope, ident=ident, window=int(window) - 1)
+
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+        self.elapsed = offset / self.duration
+        if self.previous * (1 - self.elapsed) + self.current >= self.num_requests:
+            record_rejection(self.scope, ident)
+            return False
+
+        # The counter must outlive its window, since the next one still weighs it.
+        if not self.cache.add(current_key, 1, timeout=self.duration * 2):
+            self.cache.incr(current_key)
+        return True
+
+    def wait(self):
+        remaining = self.duration * (1 - self.elapsed)
+        if self.current >= self.num_requests or not self.previous:
+            return remaining
+        # Until the previous window's share has faded enough to admit one more request.
+        fade = 1 - (self.num_requests - self.current) / self.previous
+        return max(0.0, (fade - self.elapsed) * self.duration)
+
+
+class WriteThrottle(SlidingWindowThrottle):
+    """Only counts requests that write; reads of the same view are not limited."""
+
+    def applies_to(self, request):
+        return request.method not in SAFE_METHODS
@@ -17,14 +17,14 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
-from classroom_scheduler import views
+from bruker_backend import schema
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('', include('classroom_scheduler.urls')),
     path("users/", include("users.urls", namespace='users')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    path("api/analytics/", include("analytics.urls", namespace='analytics')),
+    path('api/schema/', schema.schema, name='schema'),
+    path('api/schema/swagger-ui/', schema.swagger_ui, name='swagger-ui'),
 ]
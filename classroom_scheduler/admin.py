@@ -1,10 +1,32 @@
 from django.contrib import admin
-from .models import ClassGroup, Room, Reservation, ReservationInfo, Equipment, Building
+from .models import CalendarFeed, ClassGroup, Room, Reservation, ReservationChangeRequest, ReservationInfo, Equipment, \
+    EquipmentAttribute, Building
 # Register your models here.
 
+
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    """
+    Deleting tombstones the room, as the API does; its reservations follow with
+    purge_deleted_records. So the confirmation page neither collects them nor is blocked by them.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        rooms = [str(room) for room in objs]
+        return rooms, {Room._meta.verbose_name_plural: len(rooms)}, set(), []
+
+    def delete_model(self, request, obj):
+        obj.delete()
+
+    def delete_queryset(self, request, queryset):
+        queryset.delete()
+
+
 admin.site.register(ClassGroup)
-admin.site.register(Room)
 admin.site.register(Equipment)
+admin.site.register(EquipmentAttribute)
 admin.site.register(Building)
 admin.site.register(Reservation)
-admin.site.register(ReservationInfo)
\ No newline at end of file
+admin.site.register(ReservationInfo)
+admin.site.register(ReservationChangeRequest)
+admin.site.register(CalendarFeed)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ClassroomSchedulerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "classroom_scheduler"
+
+    def ready(self):
+        from . import events, signals  # noqa: F401
@@ -0,0 +1,144 @@
+"""
+Async counterparts of the read-heavy scheduler endpoints. Under ASGI these wait on Postgres
+without holding a worker thread; the sync viewsets stay the canonical API for writes.
+"""
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+from .changes import acurrent_version
+from .equipment import get_attribute_registry
+from .models import Building
+from .queries import available_rooms, visible_reservations, with_reservation_details
+from .serializers import BuildingSerializer, ReservationSerializer, RoomSerializer
+from .views import BuildingViewSet, ReservationViewSet, RoomViewSet, expansions, replica_pin_key
+from bruker_backend.db_router import is_pinned_to_primary, replica_reads
+
+CHUNK_SIZE = 500
+
+
+async def aserialize(serializer_class, queryset, context=None):
+    """
+    Serialise a queryset while streaming it from the database. The queryset has to load
+    every related object the serializer touches, since lazy loads are not allowed here.
+    """
+    return [
+        serializer_class(instance, context=context).data
+        async for instance in queryset.aiterator(chunk_size=CHUNK_SIZE)
+    ]
+
+
+async def authenticate(request):
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword != 'Token' or not key:
+        return None
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+async def apply_view_filters(viewset_class, request, queryset):
+    # Filter backends only compose the queryset, so the sync viewsets' configuration can be reused as is.
+    drf_request = Request(request)
+    view = viewset_class(request=drf_request, format_kwarg=None, action='list')
+    # Except for the equipment attribute registry, which may have to be loaded first.
+    view.attribute_registry = await sync_to_async(get_attribute_registry)()
+    for backend in view.filter_backends:
+        queryset = backend().filter_queryset(drf_request, queryset, view)
+    return queryset
+
+
+def read_database(request, user=None):
+    # request.user is left alone: resolving it lazily from the session would query synchronously.
+    if is_pinned_to_primary(replica_pin_key(request, user or AnonymousUser())):
+        return nullcontext()
+    return replica_reads()
+
+
+async def list_response(request, serializer_class, queryset, user=None, context=None):
+    """
+    Render the list, paginated when `page_size` is given (`page` is 1-based). The total is
+    reported in the X-Total-Count header.
+    """
+    try:
+        page_size = int(request.GET['page_size']) if 'page_size' in request.GET else None
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return JsonResponse({'error': 'page and page_size must be integers.'}, status=400)
+
+    with read_database(request, user):
+        if page_size is None:
+            data = await aserialize(serializer_class, queryset, context)
+            total = len(data)
+        else:
+            offset = max(page - 1, 0) * max(page_size, 1)
+            total = await queryset.acount()
+            data = await aserialize(serializer_class, queryset[offset:offset + max(page_size, 1)], context)
+
+    response = JsonResponse(data, safe=False)
+    response['X-Total-Count'] = total
+    return response
+
+
+async def building_list(request):
+    try:
+        buildings = await apply_view_filters(BuildingViewSet, request, Building.objects.all())
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    return await list_response(request, BuildingSerializer, buildings)
+
+
+async def room_list(request):
+    try:
+        rooms = await apply_view_filters(RoomViewSet, request, RoomViewSet.queryset.all())
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    return await list_response(request, RoomSerializer, rooms)
+
+
+async def room_available(request):
+    start_dt = parse_datetime(request.GET.get('start', ''))
+    end_dt = parse_datetime(request.GET.get('end', ''))
+
+    if not start_dt or not end_dt:
+        return JsonResponse({'error': 'Enter start and end params (ISO 8601).'}, status=400)
+
+    try:
+        rooms = await apply_view_filters(RoomViewSet, request, available_rooms(start_dt, end_dt))
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    return await list_response(request, RoomSerializer, rooms)
+
+
+async def reservation_list(request):
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    force_user_filter = request.GET.get('me', '').lower() in ['true', '1', 'yes', 'on']
+    expand = expansions(request.GET)
+    reservations = with_reservation_details(
+        visible_reservations(user, force_user_filter), expand_group='group' in expand
+    )
+
+    try:
+        reservations = await apply_view_filters(ReservationViewSet, request, reservations)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+
+    # One block, so the version and the list come from the same replica.
+    with read_database(request, user):
+        version = await acurrent_version()
+        response = await list_response(
+            request, ReservationSerializer, reservations, user=user, context={'expand': expand}
+        )
+    response['X-Change-Version'] = version
+    return response
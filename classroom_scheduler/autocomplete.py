@@ -0,0 +1,154 @@
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Building, Room
+
+INDEX_GENERATION_KEY = 'classroom_scheduler:autocomplete-generation'
+MIN_SIMILARITY = 0.3
+PREFIX_SCORE = 2.0
+
+
+def normalize(text):
+    """Lower case without diacritics, so "laboratorium" finds "Laboratórium" and "lodz" finds "Łódź"."""
+    text = unicodedata.normalize('NFKD', text.replace('ł', 'l').replace('Ł', 'L'))
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def trigrams(word):
+    # Padded like pg_trgm, so short words and word starts still yield trigrams.
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    """
+    Labels of rooms and buildings, searchable word by word: a sorted vocabulary for prefix
+    matches and a trigram inverted index over it for typo-tolerant matches. Entries are
+    (kind, id, label) tuples.
+    """
+
+    def __init__(self, entries, generation=None):
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self.entries = list(entries)
+
+        word_entries = {}
+        for position, (_, _, label) in enumerate(self.entries):
+            for word in normalize(label).replace(',', ' ').split():
+                word_entries.setdefault(word, set()).add(position)
+
+        self.words = sorted(word_entries)
+        self.word_entries = [word_entries[word] for word in self.words]
+        self.trigram_counts = []
+        self.postings = {}
+        for word_id, word in enumerate(self.words):
+            word_trigrams = trigrams(word)
+            self.trigram_counts.append(len(word_trigrams))
+            for trigram in word_trigrams:
+                self.postings.setdefault(trigram, []).append(word_id)
+
+    @classmethod
+    def build(cls, generation=None):
+        # From the primary: a lagging replica would be cached under the new generation.
+        buildings = Building.objects.using(DEFAULT_DB_ALIAS)
+        rooms = Room.objects.using(DEFAULT_DB_ALIAS)
+        entries = [('building', pk, name) for pk, name in buildings.values_list('id', 'name')]
+        entries += [
+            ('room', pk, f'{number}, {building}')
+            for pk, number, building in rooms.values_list('id', 'room_number', 'building__name')
+        ]
+        return cls(entries, generation=generation)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def word_scores(self, word):
+        """{word id: score} of the vocabulary words that `word` starts or nearly matches."""
+        start = bisect_left(self.words, word)
+        end = bisect_left(self.words, word + '\uffff', start)
+        scores = dict.fromkeys(range(start, end), PREFIX_SCORE)
+
+        # Jaccard similarity of the trigram sets, as pg_trgm's similarity() computes it.
+        word_trigrams = trigrams(word)
+        shared = Counter()
+        for trigram in word_trigrams:
+            shared.update(self.postings.get(trigram, ()))
+        for word_id, count in shared.items():
+            similarity = count / (len(word_trigrams) + self.trigram_counts[word_id] - count)
+            if similarity >= MIN_SIMILARITY and similarity > scores.get(word_id, 0):
+                scores[word_id] = similarity
+        return scores
+
+    def search(self, text, limit=10):
+        """Best matches for `text` as (kind, id, label); each of its words has to match a word of the label."""
+        scores = None
+        for word in normalize(text).replace(',', ' ').split():
+            entry_scores = {}
+            for word_id, score in self.word_scores(word).items():
+                for position in self.word_entries[word_id]:
+                    if score > entry_scores.get(position, 0):
+                        entry_scores[position] = score
+
+            if scores is None:
+                scores = entry_scores
+            else:
+                scores = {position: scores[position] + score for position, score in entry_scores.items()
+                          if position in scores}
+            if not scores:
+                return []
+
+        if not scores:
+            return []
+        best = heapq.nsmallest(
+            limit, scores, key=lambda position: (-scores[position], len(self.entries[position][2]), position)
+        )
+        return [self.entries[position] for position in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _is_current(index, generation):
+    # The age limit bounds how stale a worker can be when the default cache is not shared.
+    return (
+        index is not None and index.generation == generation
+        and time.monotonic() - index.built_at < settings.LOCAL_INDEX_MAX_AGE
+    )
+
+
+def get_autocomplete_index():
+    global _index
+
+    generation = cache.get(INDEX_GENERATION_KEY, 0)
+    index = _index
+    if _is_current(index, generation):
+        return index
+
+    with _index_lock:
+        if not _is_current(_index, generation):
+            _index = AutocompleteIndex.build(generation=generation)
+        return _index
+
+
+def _bump_index_generation():
+    try:
+        cache.incr(INDEX_GENERATION_KEY)
+    except ValueError:
+        cache.set(INDEX_GENERATION_KEY, 1, timeout=None)
+
+
+def invalidate_autocomplete_index():
+    # Other workers are told once the write commits, like for the room matrix.
+    global _index
+
+    _index = None
+    transaction.on_commit(_bump_index_generation)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import ReservationChange
+from .queries import visible_reservation_info_ids, visible_reservations, with_reservation_details
+
+# Arbitrary key of the transaction-level advisory lock that orders change log inserts.
+CHANGE_LOG_LOCK_KEY = 0x72657376
+CHANGE_PAGE_SIZE = 500
+
+
+def lock_change_log():
+    """
+    Make change log inserts commit in id order. Ids come from a sequence when the row is
+    inserted, so without the lock a transaction could commit a lower version after a client
+    has already synced past it. The lock is held until the writer's transaction ends.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CHANGE_LOG_LOCK_KEY])
+
+
+def record_changes(action, changes):
+    # atomic() keeps the lock until the entries commit, also for writers in autocommit mode.
+    with transaction.atomic():
+        lock_change_log()
+        ReservationChange.objects.bulk_create([
+            ReservationChange(
+                action=action,
+                reservation_id=change['reservation_id'],
+                reservation_info_id=change['reservation_info_id'],
+            )
+            for change in changes
+        ])
+
+
+def record_resync(user_ids):
+    with transaction.atomic():
+        lock_change_log()
+        ReservationChange.objects.bulk_create([
+            ReservationChange(action=ReservationChange.Action.RESYNC, user_id=user_id) for user_id in user_ids
+        ])
+
+
+def current_version():
+    return ReservationChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+async def acurrent_version():
+    return (await ReservationChange.objects.aaggregate(version=Max('id')))['version'] or 0
+
+
+def purge_changes(now=None):
+    """
+    Delete entries past retention, except the newest one: it keeps the head version, and a
+    client behind it is told to resync rather than finding an empty log.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=settings.RESERVATION_CHANGE_RETENTION_DAYS)
+    deleted, _ = ReservationChange.objects.filter(created_at__lt=cutoff).exclude(id=current_version()).delete()
+    return deleted
+
+
+def changes_since(user, since, force_user_filter=False, limit=CHANGE_PAGE_SIZE):
+    """
+    Reservation changes visible to `user` after version `since`, collapsed to the latest per
+    reservation. Returns (version, changes, has_more, resync); with resync set, the client has to
+    reload the full list because the log cannot bring it up to date.
+    """
+    filtered = force_user_filter or not (user.is_staff or user.is_superuser)
+    # Read first: every change up to this version is committed, thanks to lock_change_log().
+    head = current_version()
+
+    oldest = ReservationChange.objects.aggregate(oldest=Min('id'))['oldest']
+    if oldest is not None and since < oldest - 1:
+        return head, [], False, True
+    if filtered and ReservationChange.objects.filter(
+        action=ReservationChange.Action.RESYNC, user=user, id__gt=since, id__lte=head
+    ).exists():
+        return head, [], False, True
+
+    log = ReservationChange.objects.filter(id__gt=since, id__lte=head).exclude(action=ReservationChange.Action.RESYNC)
+    if filtered:
+        log = log.filter(reservation_info_id__in=visible_reservation_info_ids(user))
+    entries = list(log.order_by('id').values('id', 'action', 'reservation_id')[:limit + 1])
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    version = entries[-1]['id'] if has_more else max(head, since)
+
+    latest = {}
+    for entry in entries:
+        latest.pop(entry['reservation_id'], None)
+        latest[entry['reservation_id']] = entry
+
+    alive = [pk for pk, entry in latest.items() if entry['action'] != ReservationChange.Action.DELETED]
+    reservations = with_reservation_details(visible_reservations(user, force_user_filter)).in_bulk(alive)
+
+    changes = []
+    for pk, entry in latest.items():
+        reservation = reservations.get(pk)
+        action = entry['action'] if reservation is not None else ReservationChange.Action.DELETED
+        changes.append({'version': entry['id'], 'action': action, 'reservation_id': pk, 'reservation': reservation})
+    return version, changes, has_more, False
@@ -0,0 +1,197 @@
+"""
+The registry of equipment attributes: the type and unit of known keys of Equipment.details.
+Registered values are stored with their type, filter values are parsed by it, and numeric and
+boolean keys get an expression index (manage.py sync_equipment_attributes).
+"""
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Index
+from django.db.models.fields.json import KeyTransform
+
+from .models import Equipment, EquipmentAttribute
+from .ranking import invalidate_room_matrix
+
+REGISTRY_GENERATION_KEY = 'classroom_scheduler:equipment-attributes-generation'
+INDEX_PREFIX = 'equip_attr_'
+INDEXED_TYPES = {EquipmentAttribute.Type.INTEGER, EquipmentAttribute.Type.DECIMAL, EquipmentAttribute.Type.BOOLEAN}
+LIST_LOOKUPS = {'contains', 'contained_by'}
+TRUE_VALUES = {'true', '1', 'yes', 'on'}
+FALSE_VALUES = {'false', '0', 'no', 'off'}
+
+
+class InvalidAttributeValue(ValueError):
+    pass
+
+
+def coerce(attribute_type, value):
+    """`value` as the JSON value stored for an attribute of `attribute_type`. Raises InvalidAttributeValue."""
+    Type = EquipmentAttribute.Type
+    if attribute_type in (Type.INTEGER, Type.DECIMAL):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise InvalidAttributeValue(f'Expected a number, got {value!r}.')
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise InvalidAttributeValue(f'Expected a number, got {value!r}.')
+        if not number.is_finite():
+            raise InvalidAttributeValue(f'Expected a number, got {value!r}.')
+        if attribute_type == Type.INTEGER:
+            if number != number.to_integral_value():
+                raise InvalidAttributeValue(f'Expected a whole number, got {value!r}.')
+            return int(number)
+        return int(number) if number == number.to_integral_value() else float(number)
+
+    if attribute_type == Type.BOOLEAN:
+        if isinstance(value, bool):
+            return value
+        if str(value).strip().lower() in TRUE_VALUES:
+            return True
+        if str(value).strip().lower() in FALSE_VALUES:
+            return False
+        raise InvalidAttributeValue(f'Expected true or false, got {value!r}.')
+
+    if attribute_type == Type.LIST:
+        if isinstance(value, str):
+            return [item.strip() for item in value.split(',') if item.strip()]
+        if isinstance(value, list) and all(isinstance(item, (str, int, float)) for item in value):
+            return [str(item) for item in value]
+        raise InvalidAttributeValue(f'Expected a list of strings, got {value!r}.')
+
+    if isinstance(value, (dict, list)):
+        raise InvalidAttributeValue(f'Expected text, got {value!r}.')
+    return str(value)
+
+
+class AttributeRegistry:
+    def __init__(self, types, generation=None):
+        self.types = types
+        self.generation = generation
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, generation=None):
+        # From the primary: a lagging replica would be cached under the new generation.
+        types = EquipmentAttribute.objects.using(DEFAULT_DB_ALIAS).values_list('key', 'type')
+        return cls(dict(types), generation=generation)
+
+    def clean_details(self, details):
+        """(details with registered values coerced, {key: error})."""
+        cleaned, errors = {}, {}
+        for key, value in details.items():
+            if key in self.types and value is not None:
+                try:
+                    value = coerce(self.types[key], value)
+                except InvalidAttributeValue as exc:
+                    errors[key] = str(exc)
+            cleaned[key] = value
+        return cleaned, errors
+
+    def filter_value(self, key, lookup, raw_value):
+        """The value to compare `details.<key>` against for a query parameter. Raises InvalidAttributeValue."""
+        if lookup == 'isnull':
+            return coerce(EquipmentAttribute.Type.BOOLEAN, raw_value)
+
+        attribute_type = self.types.get(key)
+        if attribute_type is None or '__' in lookup:
+            # Unregistered keys, and paths below a key, keep the old guessing: numbers if they
+            # parse, comma separated lists for containment.
+            try:
+                return int(raw_value)
+            except ValueError:
+                return coerce(EquipmentAttribute.Type.LIST, raw_value) if 'contains' in lookup else raw_value
+
+        if attribute_type == EquipmentAttribute.Type.LIST and lookup not in LIST_LOOKUPS:
+            return raw_value
+        return coerce(attribute_type, raw_value)
+
+    def indexes(self):
+        return [
+            Index(KeyTransform(key, 'details'), name=f'{INDEX_PREFIX}{key}')
+            for key, attribute_type in sorted(self.types.items()) if attribute_type in INDEXED_TYPES
+        ]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def _is_current(registry, generation):
+    # The age limit bounds how stale a worker can be when the default cache is not shared.
+    return (
+        registry is not None and registry.generation == generation
+        and time.monotonic() - registry.built_at < settings.LOCAL_INDEX_MAX_AGE
+    )
+
+
+def get_attribute_registry():
+    global _registry
+
+    generation = cache.get(REGISTRY_GENERATION_KEY, 0)
+    registry = _registry
+    if _is_current(registry, generation):
+        return registry
+
+    with _registry_lock:
+        if not _is_current(_registry, generation):
+            _registry = AttributeRegistry.build(generation=generation)
+        return _registry
+
+
+def _bump_registry_generation():
+    try:
+        cache.incr(REGISTRY_GENERATION_KEY)
+    except ValueError:
+        cache.set(REGISTRY_GENERATION_KEY, 1, timeout=None)
+
+
+def invalidate_attribute_registry():
+    # Other workers are told once the write commits, like for the room matrix.
+    global _registry
+
+    _registry = None
+    transaction.on_commit(_bump_registry_generation)
+
+
+def normalize_equipment_details(batch_size=500):
+    """
+    Store registered values of existing equipment with their types. Returns (updated count,
+    {equipment id: errors}) for values that cannot be converted, which are left untouched.
+    """
+    registry = AttributeRegistry.build()
+    changed, invalid = [], {}
+    for equipment in Equipment.objects.order_by('id').iterator(chunk_size=batch_size):
+        if not isinstance(equipment.details, dict):
+            continue
+        cleaned, errors = registry.clean_details(equipment.details)
+        if errors:
+            invalid[equipment.pk] = errors
+        elif cleaned != equipment.details:
+            equipment.details = cleaned
+            changed.append(equipment)
+    Equipment.objects.bulk_update(changed, ['details'], batch_size=batch_size)
+    if changed:
+        # bulk_update sends no save signals, and "no" turned into False changes what a room offers.
+        invalidate_room_matrix()
+    return len(changed), invalid
+
+
+def sync_attribute_indexes():
+    """Index registered numeric and boolean keys, drop the indexes of others. Returns (created, dropped)."""
+    wanted = {index.name: index for index in AttributeRegistry.build().indexes()}
+    table = Equipment._meta.db_table
+    with connection.cursor() as cursor:
+        existing = {
+            name for name in connection.introspection.get_constraints(cursor, table) if name.startswith(INDEX_PREFIX)
+        }
+
+    with connection.schema_editor(atomic=True) as schema_editor:
+        for name in existing - set(wanted):
+            schema_editor.remove_index(Equipment, Index(fields=['details'], name=name))
+        for name in set(wanted) - existing:
+            schema_editor.add_index(Equipment, wanted[name])
+    return sorted(set(wanted) - existing), sorted(existing - set(wanted))
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import weakref
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import Room
+from .signals import reservations_changed
+
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """A single listener's queue, bound to the event loop it was created on."""
+
+    def __init__(self, room_ids=(), building_ids=(), owner=None, maxsize=SUBSCRIPTION_QUEUE_SIZE):
+        self.loop = asyncio.get_running_loop()
+        self.owner = owner
+        self.queue = asyncio.Queue(maxsize)
+        self.room_ids = frozenset(room_ids)
+        self.building_ids = frozenset(building_ids)
+        self.overflowed = False
+
+    def matches(self, event):
+        if not self.room_ids and not self.building_ids:
+            return True
+        return (
+            bool(self.room_ids & {event['room_id'], event['previous_room_id']})
+            or bool(self.building_ids & {event['building_id'], event['previous_building_id']})
+        )
+
+    def put(self, event):
+        # A listener that cannot keep up gets a single overflow marker instead of unbounded memory;
+        # clients answer it by refetching the current state once.
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        if self.overflowed and self.queue.empty():
+            self.overflowed = False
+            return {'action': 'overflow'}
+        return await self.queue.get()
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe for reservation events. Publishing is safe from any thread, so
+    sync views running in ASGI worker threads can feed listeners waiting on the event loop.
+    Only listeners in the same process are reached. Subscriptions are held weakly, so a stream
+    that is dropped without running its cleanup does not leak its queue.
+    """
+
+    def __init__(self):
+        self._subscriptions = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def subscribe(self, room_ids=(), building_ids=(), owner=None, limit=None):
+        """A new subscription, or None when `owner` already holds `limit` of them in this process."""
+        subscription = Subscription(room_ids, building_ids, owner)
+        with self._lock:
+            if limit is not None and sum(s.owner == owner for s in self._subscriptions) >= limit:
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def publish(self, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            matching = [event for event in events if subscription.matches(event)]
+            if not matching:
+                continue
+            try:
+                for event in matching:
+                    subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The listener's event loop has been closed.
+                self.unsubscribe(subscription)
+
+
+broker = EventBroker()
+
+
+def build_events(action, changes):
+    room_ids = {change['room_id'] for change in changes} | {change['previous_room_id'] for change in changes}
+    buildings = dict(Room.objects.filter(id__in=room_ids - {None}).values_list('id', 'building_id'))
+
+    return [
+        {
+            'action': action,
+            'reservation_id': change['reservation_id'],
+            'room_id': change['room_id'],
+            'building_id': buildings.get(change['room_id']),
+            'date_time': change['date_time'].isoformat() if change['date_time'] else None,
+            'previous_room_id': change['previous_room_id'],
+            'previous_building_id': buildings.get(change['previous_room_id']),
+            'previous_date_time': change['previous_date_time'].isoformat() if change['previous_date_time'] else None,
+        }
+        for change in changes
+    ]
+
+
+@receiver(reservations_changed)
+def publish_reservation_events(sender, action, changes, **kwargs):
+    if not broker.has_subscribers:
+        return
+
+    def publish():
+        broker.publish(build_events(action, changes))
+
+    transaction.on_commit(publish)
@@ -0,0 +1,120 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import CalendarFeed, ClassGroup, Reservation, ReservationInfo, ReservationVisibility
+from .queries import visible_reservations
+
+FEED_HISTORY = timedelta(days=180)
+FEED_CHUNK_SIZE = 500
+ICS_LINE_LIMIT = 75
+
+
+def touch_feeds(room_ids=(), reservation_info_ids=(), user_ids=(), group_ids=()):
+    """
+    Move the version of every feed that shows reservations in the given rooms or of the given
+    reservation infos or groups, and of the given users' personal and room feeds (what a room
+    feed details depends on its owner's visibility). Arguments may be subqueries.
+    """
+    condition = Q(pk__in=[])
+    if room_ids:
+        condition |= Q(kind=CalendarFeed.Kind.ROOM, room_id__in=room_ids)
+    if group_ids:
+        condition |= Q(kind=CalendarFeed.Kind.GROUP, group_id__in=group_ids)
+    if reservation_info_ids:
+        condition |= Q(
+            kind=CalendarFeed.Kind.GROUP,
+            group_id__in=ReservationInfo.objects.filter(id__in=reservation_info_ids).values('group_id')
+        ) | Q(
+            kind=CalendarFeed.Kind.USER,
+            user_id__in=ReservationVisibility.objects.filter(reservation_info_id__in=reservation_info_ids).values('user_id')
+        )
+    if user_ids:
+        condition |= Q(kind__in=[CalendarFeed.Kind.USER, CalendarFeed.Kind.ROOM], user_id__in=user_ids)
+
+    CalendarFeed.objects.filter(condition).update(version=F('version') + 1, changed_at=timezone.now())
+
+
+def can_follow_group(user, group_id):
+    return user.is_staff or ClassGroup.objects.filter(
+        Q(members=user) | Q(class_representatives=user) | Q(instructors=user), pk=group_id
+    ).exists()
+
+
+def feed_reservations(feed):
+    if feed.kind == CalendarFeed.Kind.ROOM:
+        reservations = Reservation.objects.filter(room_id=feed.room_id)
+        if not feed.user.is_staff:
+            # Bookings the owner cannot see through the API are shown as busy blocks only.
+            reservations = reservations.annotate(visible=Exists(ReservationVisibility.objects.filter(
+                user_id=feed.user_id, reservation_info_id=OuterRef('reservation_info_id')
+            )))
+    elif feed.kind == CalendarFeed.Kind.GROUP:
+        reservations = Reservation.objects.filter(reservation_info__group_id=feed.group_id)
+    else:
+        reservations = visible_reservations(feed.user, force_user_filter=True)
+
+    return reservations.filter(
+        date_time__gte=timezone.now() - FEED_HISTORY
+    ).select_related('room__building', 'reservation_info__group').order_by('date_time', 'id')
+
+
+def escape_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces as RFC 5545 requires, never inside a character."""
+    encoded = line.encode()
+    if len(encoded) <= ICS_LINE_LIMIT:
+        return line + '\r\n'
+
+    pieces, start, limit = [], 0, ICS_LINE_LIMIT
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        pieces.append(encoded[start:end].decode())
+        start, limit = end, ICS_LINE_LIMIT - 1
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def ics_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def write_calendar(feed, name):
+    """Yield the feed as iCalendar text, one event at a time."""
+    length = timedelta(minutes=settings.RESERVATION_SLOT_MINUTES)
+    stamp = ics_datetime(feed.changed_at)
+
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:-//bruker//classroom scheduler//EN')
+    yield fold('CALSCALE:GREGORIAN')
+    yield fold(f'X-WR-CALNAME:{escape_text(name)}')
+
+    for reservation in feed_reservations(feed).iterator(chunk_size=FEED_CHUNK_SIZE):
+        info = reservation.reservation_info
+        room = reservation.room
+        if getattr(reservation, 'visible', True):
+            summary, description = info.group.name if info.group else info.description, info.description
+        else:
+            summary, description = 'Busy', ''
+        yield fold('BEGIN:VEVENT')
+        yield fold(f'UID:reservation-{reservation.pk}@bruker')
+        yield fold(f'DTSTAMP:{stamp}')
+        yield fold(f'DTSTART:{ics_datetime(reservation.date_time)}')
+        yield fold(f'DTEND:{ics_datetime(reservation.date_time + length)}')
+        yield fold(f'SUMMARY:{escape_text(summary)}')
+        yield fold(f'LOCATION:{escape_text(f"{room.room_number}, {room.building.name}")}')
+        if description:
+            yield fold(f'DESCRIPTION:{escape_text(description)}')
+        yield fold('END:VEVENT')
+
+    yield fold('END:VCALENDAR')
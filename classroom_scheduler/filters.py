@@ -1,7 +1,14 @@
-from django.db.models import Q
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import BaseFilterBackend
 import logging
 
+from .equipment import InvalidAttributeValue, get_attribute_registry
+from .search import SEARCH_CONFIG, search_enabled
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -11,9 +18,10 @@ class DynamicJsonFilterBackend(BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
 
         q = Q()
+        registry = getattr(view, 'attribute_registry', None) or get_attribute_registry()
 
         reserved = {
-            'page', 'page_size', 'pagination', 'ordering', 'search', 'id', 'room_number', 'capacity',
+            'page', 'page_size', 'pagination', 'ordering', 'search', 'q', 'id', 'room_number', 'capacity',
             'equipment__details', 'equipment__id', 'building__id', 'building__name', 'building__address',
             'building__description', 'start', 'end',
         }
@@ -29,20 +37,60 @@ class DynamicJsonFilterBackend(BaseFilterBackend):
                 key, op = raw_key.split('__', 1)
                 lookup = f'equipment__details__{key}__{op}'
             else:
-                key = raw_key
+                key, op = raw_key, 'exact'
                 lookup = f'equipment__details__{key}__exact'
 
             logger.info(f"Using lookup: {lookup}")
 
             try:
-                val = int(raw_val)
-            except ValueError:
-                if 'contains' in lookup:
-                    val = [v.strip() for v in raw_val.split(',')]
-                else:
-                    val = raw_val
+                val = registry.filter_value(key, op, raw_val)
+            except InvalidAttributeValue as exc:
+                raise ValidationError({raw_key: str(exc)})
 
             q &= Q(**{lookup: val})
             logger.info(f"Current Q object: {q}")
 
         return queryset.filter(q)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    `?q=` search over the view's stored `search_vector`, best matches first. Every word has to
+    match, as a prefix, so "d17 1.3" finds room 1.38 in D17. Without Postgres, every word has to
+    occur in one of the view's `full_text_fallback_fields`.
+    """
+    search_param = 'q'
+
+    def terms(self, request):
+        return re.findall(r'\w[\w.\-]*', request.query_params.get(self.search_param, ''))
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.terms(request)
+        if not terms:
+            return queryset
+
+        if not search_enabled():
+            for term in terms:
+                queryset = queryset.filter(
+                    Q.create([(f'{field}__icontains', term) for field in view.full_text_fallback_fields], connector=Q.OR)
+                )
+            return queryset
+
+        # Quoted lexemes, so nothing in the input is read as tsquery syntax.
+        query = SearchQuery(
+            ' & '.join("'{}':*".format(term.lower().replace("'", "''")) for term in terms),
+            search_type='raw',
+            config=SEARCH_CONFIG
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', 'pk')
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Full-text search; results are ranked by relevance.',
+            'schema': {'type': 'string'},
+        }]
@@ -0,0 +1,122 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def key_ttl():
+    return timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def purge_expired_keys(now=None):
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=(now or timezone.now()) - key_ttl()).delete()
+    return deleted
+
+
+def claim_key(user, key, fingerprint):
+    """
+    Return (record, created). The claim is committed straight away, so a retry arriving while the
+    first request is still running finds it. A claim left unfinished for longer than
+    IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS is taken over, so a dead worker does not block the key.
+    """
+    now = timezone.now()
+    cutoff = now - key_ttl()
+    claim_cutoff = now - timedelta(seconds=settings.IDEMPOTENCY_CLAIM_TIMEOUT_SECONDS)
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, key=key, request_hash=fingerprint), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue
+            if record.created_at < cutoff:
+                # An expired key that has not been purged yet counts as unused.
+                record.delete()
+                continue
+            if record.status_code is None and record.created_at < claim_cutoff:
+                # Only one retry wins the takeover: the others no longer match the old claim time.
+                if IdempotencyKey.objects.filter(
+                    pk=record.pk, status_code__isnull=True, created_at=record.created_at
+                ).update(created_at=now, request_hash=fingerprint):
+                    record.created_at, record.request_hash = now, fingerprint
+                    return record, True
+                continue
+            return record, False
+    raise IntegrityError(f"Could not claim idempotency key {key!r}")
+
+
+def own_claim(record):
+    """The record, if the claim has not been taken over by a retry in the meantime."""
+    return IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+
+
+def replay(record, fingerprint):
+    if record.request_hash != fingerprint:
+        return Response(
+            {"detail": f"This {HEADER} was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.status_code is None:
+        return Response(
+            {"detail": f"A request with this {HEADER} is still being processed."},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    response = Response(record.response_body, status=record.status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """
+    Make a POST handler honour the Idempotency-Key header: the first request with a key runs and
+    its response is stored; retries with the same key and body get that response back without
+    running the handler again. Server errors are not stored, so they can be retried.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} can be at most {MAX_KEY_LENGTH} characters long."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, created = claim_key(request.user, key, fingerprint)
+        if not created:
+            return replay(record, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            own_claim(record).delete()
+            raise
+
+        if response.status_code >= 500:
+            own_claim(record).delete()
+        else:
+            own_claim(record).update(status_code=response.status_code, response_body=response.data)
+        return response
+
+    return wrapper
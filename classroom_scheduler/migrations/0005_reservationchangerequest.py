@@ -0,0 +1,122 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_inline_proposals(apps, schema_editor):
+    Reservation = apps.get_model("classroom_scheduler", "Reservation")
+    ReservationChangeRequest = apps.get_model(
+        "classroom_scheduler", "ReservationChangeRequest"
+    )
+
+    change_requests = []
+    pending = Reservation.objects.filter(
+        proposed_date_time__isnull=False
+    ).select_related("reservation_info__group")
+    for reservation in pending.iterator():
+        group = reservation.reservation_info.group
+        instructor = group.instructors.order_by("id").first() if group else None
+        if instructor is None:
+            continue
+        change_requests.append(
+            ReservationChangeRequest(
+                reservation=reservation,
+                requested_by=reservation.reservation_info.user,
+                instructor=instructor,
+                proposed_room=reservation.proposed_room,
+                proposed_date_time=reservation.proposed_date_time,
+            )
+        )
+    ReservationChangeRequest.objects.bulk_create(change_requests)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("classroom_scheduler", "0004_reservation_proposed_room_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReservationChangeRequest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("proposed_date_time", models.DateTimeField(blank=True, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("approved", "Approved"),
+                            ("rejected", "Rejected"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("decided_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "instructor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reservation_change_inbox",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "proposed_room",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="proposed_changes",
+                        to="classroom_scheduler.room",
+                    ),
+                ),
+                (
+                    "requested_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="requested_reservation_changes",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "reservation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="change_requests",
+                        to="classroom_scheduler.reservation",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["instructor", "status"], name="change_request_inbox_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(move_inline_proposals, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="reservation",
+            name="proposed_date_time",
+        ),
+        migrations.RemoveField(
+            model_name="reservation",
+            name="proposed_room",
+        ),
+    ]
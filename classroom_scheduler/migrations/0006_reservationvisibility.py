@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_visibility(apps, schema_editor):
+    ClassGroup = apps.get_model("classroom_scheduler", "ClassGroup")
+    ReservationInfo = apps.get_model("classroom_scheduler", "ReservationInfo")
+    ReservationVisibility = apps.get_model(
+        "classroom_scheduler", "ReservationVisibility"
+    )
+
+    pairs = set(ReservationInfo.objects.values_list("user_id", "id"))
+    for through in (
+        ClassGroup.class_representatives.through,
+        ClassGroup.instructors.through,
+    ):
+        pairs.update(
+            through.objects.filter(
+                classgroup__reservation_infos__isnull=False
+            ).values_list("customuser_id", "classgroup__reservation_infos__id")
+        )
+    ReservationVisibility.objects.bulk_create(
+        [
+            ReservationVisibility(user_id=user_id, reservation_info_id=info_id)
+            for user_id, info_id in pairs
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("classroom_scheduler", "0005_reservationchangerequest"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReservationVisibility",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reservation_info",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="visibility",
+                        to="classroom_scheduler.reservationinfo",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="visible_reservation_infos",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "reservation_info"),
+                        name="unique_reservation_visibility",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_visibility, migrations.RunPython.noop),
+    ]
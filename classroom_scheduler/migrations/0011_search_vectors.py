@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:39
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+SEARCH_CONFIG = "simple"
+INDEXES = {
+    "building_search_idx": "classroom_scheduler_building",
+    "room_search_idx": "classroom_scheduler_room",
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    # Only Postgres has GIN indexes and tsvector; elsewhere search falls back to substring matching.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table in INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX {name} ON {table} USING gin (search_vector)"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def backfill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Building = apps.get_model("classroom_scheduler", "Building")
+    Room = apps.get_model("classroom_scheduler", "Room")
+
+    Building.objects.update(
+        search_vector=SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("department", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("address", weight="C", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="D", config=SEARCH_CONFIG)
+    )
+    for building in Building.objects.all():
+        Room.objects.filter(building_id=building.pk).update(
+            search_vector=SearchVector("room_number", weight="A", config=SEARCH_CONFIG)
+            + SearchVector(Value(building.name), weight="B", config=SEARCH_CONFIG)
+            + SearchVector(
+                Value(building.department),
+                Value(building.address),
+                weight="C",
+                config=SEARCH_CONFIG,
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("classroom_scheduler", "0010_soft_delete"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="building",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="room",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
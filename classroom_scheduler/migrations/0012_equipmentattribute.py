@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:44
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("classroom_scheduler", "0011_search_vectors"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EquipmentAttribute",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.SlugField(
+                        unique=True,
+                        validators=[
+                            django.core.validators.RegexValidator(
+                                "^[a-z][a-z0-9_]*$",
+                                "Use lower case letters, digits and underscores.",
+                            )
+                        ],
+                    ),
+                ),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[
+                            ("integer", "Integer"),
+                            ("decimal", "Decimal"),
+                            ("boolean", "Boolean"),
+                            ("string", "String"),
+                            ("list", "List of strings"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("unit", models.CharField(blank=True, max_length=20)),
+            ],
+        ),
+    ]
@@ -1,13 +1,69 @@
-from django.db import models
+import secrets
+
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import RegexValidator
+from django.db import models, transaction
+from django.utils import timezone
 
 from users.models import CustomUser
 
 
+class SoftDeleteQuerySet(models.QuerySet):
+    def delete(self):
+        """Tombstone the rows; purge_deleted_records removes them for good later, in small batches."""
+        count = 0
+        with transaction.atomic(using=self.db):
+            for instance in self.filter(deleted_at__isnull=True):
+                instance.delete()
+                count += 1
+        return count, {self.model._meta.label: count}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def hard_delete(self):
+        return super().delete()
+
+    hard_delete.alters_data = True
+    hard_delete.queryset_only = True
+
+
+class AliveManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class SoftDeleteModel(models.Model):
+    """
+    Deleting sets `deleted_at` instead of removing the row and cascading synchronously.
+    `objects` hides tombstones; `all_objects` includes them.
+    """
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = AliveManager.from_queryset(SoftDeleteQuerySet)()
+    all_objects = models.Manager.from_queryset(SoftDeleteQuerySet)()
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        if self.deleted_at is None:
+            self.deleted_at = timezone.now()
+            self.save(using=using, update_fields=['deleted_at'])
+        return 1, {self._meta.label: 1}
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super().delete(using=using, keep_parents=keep_parents)
+
+
 class Building(models.Model):
     name = models.CharField(max_length=200)
     address = models.CharField(max_length=255)
     department = models.CharField(max_length=200, blank=True)
     description = models.TextField(blank=True)
+    # Maintained by classroom_scheduler.search; GIN-indexed on Postgres by migration 0011.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -20,11 +76,41 @@ class Equipment(models.Model):
         return f"Equipment #{self.pk}"
 
 
-class Room(models.Model):
+class EquipmentAttribute(models.Model):
+    """
+    A registered key of Equipment.details. Values of registered keys are validated and stored
+    with their type, filters coerce to it, and numeric and boolean keys get an expression index
+    (manage.py sync_equipment_attributes). Unregistered keys are stored as given.
+    """
+    class Type(models.TextChoices):
+        INTEGER = 'integer', 'Integer'
+        DECIMAL = 'decimal', 'Decimal'
+        BOOLEAN = 'boolean', 'Boolean'
+        STRING = 'string', 'String'
+        LIST = 'list', 'List of strings'
+
+    key = models.SlugField(max_length=50, unique=True, validators=[
+        RegexValidator(r'^[a-z][a-z0-9_]*$', 'Use lower case letters, digits and underscores.')
+    ])
+    type = models.CharField(max_length=10, choices=Type.choices)
+    unit = models.CharField(max_length=20, blank=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.get_type_display()}{f', {self.unit}' if self.unit else ''})"
+
+
+class Room(SoftDeleteModel):
     building = models.ForeignKey(Building, related_name='rooms', on_delete=models.CASCADE)
     equipment = models.ForeignKey(Equipment, related_name='equipped_rooms', on_delete=models.SET_NULL, null=True, blank=True)
     capacity = models.PositiveIntegerField()
     room_number = models.CharField(max_length=50)
+    # Room number plus its building's name and address; see classroom_scheduler.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='room_tombstone_idx'),
+        ]
 
     def __str__(self):
         return f"Room {self.room_number} in {self.building.name}"
@@ -40,22 +126,218 @@ class ClassGroup(models.Model):
         return self.name
 
 
-class ReservationInfo(models.Model):
+class ReservationInfo(SoftDeleteModel):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='reservations')
     group = models.ForeignKey(ClassGroup, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservation_infos')
     description = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False),
+                         name='reservation_info_tombstone_idx'),
+        ]
+
     def __str__(self):
         return f"Reservation for: {self.user} (Group: {self.group}). Description: {self.description}"
 
+    def delete(self, using=None, keep_parents=False):
+        # One info holds a bounded number of reservations, so they are tombstoned right away.
+        with transaction.atomic(using=using):
+            result = super().delete(using=using, keep_parents=keep_parents)
+            self.reservations.all().delete()
+        return result
+
+
+class ReservationVisibility(models.Model):
+    """
+    Which users may see a reservation info (its owner plus the group's representatives and
+    instructors), kept up to date by signals so listing "my reservations" is one index lookup.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='visible_reservation_infos')
+    reservation_info = models.ForeignKey(ReservationInfo, on_delete=models.CASCADE, related_name='visibility')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'reservation_info'], name='unique_reservation_visibility'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} can see {self.reservation_info_id}"
+
 
-class Reservation(models.Model):
-    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='reservations')
+class ReservationQuerySet(SoftDeleteQuerySet):
+    def delete(self):
+        """
+        Tombstone the reservations with one UPDATE, reject their pending change requests and
+        report them as one reservations_changed batch.
+        """
+        from .signals import send_reservations_changed  # signals imports the models
+
+        with transaction.atomic(using=self.db):
+            reservations = list(Reservation.all_objects.using(self.db).filter(
+                pk__in=self.values('pk'), deleted_at__isnull=True
+            ).select_for_update())
+            now = timezone.now()
+            Reservation.all_objects.using(self.db).filter(pk__in=[r.pk for r in reservations]).update(deleted_at=now)
+            for reservation in reservations:
+                reservation.deleted_at = now
+            # There is nothing left to move.
+            ReservationChangeRequest.objects.using(self.db).filter(
+                reservation__in=reservations, status=ReservationChangeRequest.Status.PENDING
+            ).update(status=ReservationChangeRequest.Status.REJECTED, decided_at=now)
+            send_reservations_changed('deleted', reservations)
+        return len(reservations), {self.model._meta.label: len(reservations)}
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class LiveReservationManager(AliveManager):
+    def get_queryset(self):
+        # A deleted room's reservations are only tombstoned by purge_deleted_records; hide them until then.
+        return super().get_queryset().filter(room__deleted_at__isnull=True)
+
+
+class Reservation(SoftDeleteModel):
+    # PROTECT: rooms are only hard-deleted by the purge, once their reservations are gone.
+    room = models.ForeignKey(Room, on_delete=models.PROTECT, related_name='reservations')
     reservation_info = models.ForeignKey(ReservationInfo, on_delete=models.CASCADE, related_name="reservations")
 
     date_time = models.DateTimeField()
-    proposed_date_time = models.DateTimeField(null=True, blank=True)
-    proposed_room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="proposed_reservations", null=True)
+
+    objects = LiveReservationManager.from_queryset(ReservationQuerySet)()
+    all_objects = models.Manager.from_queryset(ReservationQuerySet)()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'date_time'], condition=models.Q(deleted_at__isnull=True),
+                         name='reservation_alive_slot_idx'),
+            models.Index(fields=['date_time'], condition=models.Q(deleted_at__isnull=True),
+                         name='reservation_alive_date_idx'),
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False),
+                         name='reservation_tombstone_idx'),
+        ]
+
+    def delete(self, using=None, keep_parents=False):
+        # Not a save: post_save would report the tombstone as an update.
+        deleted, _ = Reservation.all_objects.filter(pk=self.pk).delete()
+        if deleted:
+            self.deleted_at = timezone.now()
+        return deleted, {self._meta.label: deleted}
 
     def __str__(self):
         return f"Reservation for room {self.room}, description: {self.reservation_info}, date: {self.date_time}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_original()
+        return instance
+
+    def remember_original(self):
+        # Slot as last loaded from or written to the database, so a save can tell where it moved from.
+        self._original = {'room_id': self.__dict__.get('room_id'), 'date_time': self.__dict__.get('date_time')}
+
+
+class ReservationChangeRequestQuerySet(models.QuerySet):
+    def of_live_reservations(self):
+        return self.filter(reservation__deleted_at__isnull=True, reservation__room__deleted_at__isnull=True)
+
+
+class ReservationChangeRequest(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        APPROVED = 'approved', 'Approved'
+        REJECTED = 'rejected', 'Rejected'
+
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='change_requests')
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='requested_reservation_changes')
+    instructor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='reservation_change_inbox')
+
+    proposed_room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='proposed_changes', null=True, blank=True)
+    proposed_date_time = models.DateTimeField(null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    decided_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ReservationChangeRequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['instructor', 'status'], name='change_request_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"Change request #{self.pk} for reservation {self.reservation_id} ({self.status})"
+
+
+def new_feed_token():
+    return secrets.token_urlsafe(32)
+
+
+class CalendarFeed(models.Model):
+    """
+    An iCalendar subscription behind an unguessable URL. `version` and `changed_at` move on
+    every change to the feed's reservations and back the feed's ETag and Last-Modified.
+    """
+    class Kind(models.TextChoices):
+        USER = 'user', 'User'
+        ROOM = 'room', 'Room'
+        GROUP = 'group', 'Group'
+
+    token = models.CharField(max_length=64, unique=True, default=new_feed_token, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='calendar_feeds')
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='calendar_feeds', null=True, blank=True)
+    group = models.ForeignKey(ClassGroup, on_delete=models.CASCADE, related_name='calendar_feeds', null=True, blank=True)
+
+    version = models.PositiveIntegerField(default=0)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} calendar feed #{self.pk} of {self.user}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a POST sent with an Idempotency-Key header. A row without a status code
+    belongs to a request that is still running.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} of user {self.user_id}"
+
+
+class ReservationChange(models.Model):
+    """
+    Append-only log of reservation writes; the id is the change version clients sync from.
+    `resync` entries tell one user that reservations became visible or hidden to them, which the
+    log cannot express as individual changes.
+    """
+    class Action(models.TextChoices):
+        CREATED = 'created', 'Created'
+        UPDATED = 'updated', 'Updated'
+        DELETED = 'deleted', 'Deleted'
+        RESYNC = 'resync', 'Resync'
+
+    action = models.CharField(max_length=10, choices=Action.choices)
+    reservation_id = models.BigIntegerField(null=True, blank=True)
+    reservation_info_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} reservation {self.reservation_id}"
@@ -0,0 +1,8 @@
+from rest_framework.permissions import BasePermission
+
+
+class IsGroupInstructorOrStaff(BasePermission):
+    """Only the group's instructors and staff may change who belongs to it."""
+
+    def has_object_permission(self, request, view, group):
+        return request.user.is_staff or group.instructors.filter(pk=request.user.pk).exists()
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Prefetch
+
+from .models import ClassGroup, Reservation, ReservationInfo, ReservationVisibility, Room
+
+
+def overlapping_reservations(start_dt, end_dt):
+    """Reservations occupying any part of [start_dt, end_dt); each lasts RESERVATION_SLOT_MINUTES."""
+    return Reservation.objects.filter(
+        date_time__gt=start_dt - timedelta(minutes=settings.RESERVATION_SLOT_MINUTES),
+        date_time__lt=end_dt
+    )
+
+
+def reserved_room_ids(start_dt, end_dt):
+    return overlapping_reservations(start_dt, end_dt).values_list('room_id', flat=True)
+
+
+def available_rooms(start_dt, end_dt):
+    return Room.objects.select_related('building', 'equipment').exclude(id__in=reserved_room_ids(start_dt, end_dt))
+
+
+def visible_reservation_info_ids(user):
+    return ReservationVisibility.objects.filter(user=user).values('reservation_info_id')
+
+
+def visible_reservation_infos(user):
+    if user.is_staff:
+        return ReservationInfo.objects.all()
+    return ReservationInfo.objects.filter(id__in=visible_reservation_info_ids(user))
+
+
+def visible_reservations(user, force_user_filter=False):
+    if (user.is_staff or user.is_superuser) and not force_user_filter:
+        return Reservation.objects.all()
+    return Reservation.objects.filter(reservation_info_id__in=visible_reservation_info_ids(user))
+
+
+def class_groups(expand_members=False):
+    """
+    Groups annotated with the counts their compact representation renders. Membership lists
+    are only prefetched when they are going to be serialised.
+    """
+    groups = ClassGroup.objects.annotate(
+        member_count=Count('members', distinct=True),
+        instructor_count=Count('instructors', distinct=True)
+    )
+    if expand_members:
+        groups = groups.prefetch_related('members', 'class_representatives', 'instructors')
+    return groups
+
+
+def with_reservation_info_details(queryset, expand_group=False):
+    return queryset.select_related('user').prefetch_related(
+        Prefetch('group', queryset=class_groups(expand_group))
+    )
+
+
+def with_reservation_details(queryset, expand_group=False):
+    # Everything ReservationSerializer renders, loaded up front so serialising never queries per row.
+    return queryset.select_related(
+        'room__building',
+        'room__equipment',
+        'reservation_info__user',
+    ).prefetch_related(
+        Prefetch('reservation_info__group', queryset=class_groups(expand_group)),
+    )
@@ -0,0 +1,119 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Room
+
+MATRIX_GENERATION_KEY = 'classroom_scheduler:room-matrix-generation'
+OTHER_BUILDING_PENALTY = 0.25
+
+
+def _truthy_keys(details):
+    if not isinstance(details, dict):
+        return frozenset()
+    return frozenset(key for key, value in details.items() if value not in (None, False, 0, '', [], {}))
+
+
+class RoomFeatureMatrix:
+    """
+    Column-oriented snapshot of the features used to rank rooms, sorted by capacity
+    so that the rooms able to seat a group can be located with a single bisect.
+    """
+
+    def __init__(self, rows, generation=None):
+        rows = sorted(rows, key=lambda row: (row[1], row[0]))
+        self.generation = generation
+        self.built_at = time.monotonic()
+        self.room_ids = array('q', (row[0] for row in rows))
+        self.capacities = array('q', (row[1] for row in rows))
+        self.building_ids = array('q', (row[2] for row in rows))
+        self.equipment_keys = [_truthy_keys(row[3]) for row in rows]
+
+    @classmethod
+    def build(cls, generation=None):
+        # From the primary: a lagging replica would be cached under the new generation.
+        rows = Room.objects.using(DEFAULT_DB_ALIAS).values_list('id', 'capacity', 'building_id', 'equipment__details')
+        return cls(rows, generation=generation)
+
+    def __len__(self):
+        return len(self.room_ids)
+
+    def rank(self, group_size, excluded_room_ids=(), required_equipment=(), preferred_building_id=None, limit=10):
+        required_equipment = frozenset(required_equipment)
+        excluded_room_ids = set(excluded_room_ids)
+        size = max(group_size, 1)
+
+        # Bounded max-heap of (-score, -room_id) holding the best `limit` candidates so far.
+        best = []
+        for row in range(bisect_left(self.capacities, group_size), len(self.room_ids)):
+            slack = (self.capacities[row] - group_size) / size
+
+            # Rows are sorted by capacity, so once the slack alone is worse than the worst kept
+            # score no later room can enter the top `limit`.
+            if len(best) == limit and slack > -best[0][0]:
+                break
+
+            room_id = self.room_ids[row]
+            if room_id in excluded_room_ids or not required_equipment <= self.equipment_keys[row]:
+                continue
+
+            score = slack
+            if preferred_building_id is not None and self.building_ids[row] != preferred_building_id:
+                score += OTHER_BUILDING_PENALTY
+
+            if len(best) < limit:
+                heapq.heappush(best, (-score, -room_id))
+            elif (-score, -room_id) > best[0]:
+                heapq.heapreplace(best, (-score, -room_id))
+
+        return sorted((-score, -room_id) for score, room_id in best)
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def _is_current(matrix, generation):
+    # The age limit bounds how stale a worker can be when the default cache is not shared.
+    return (
+        matrix is not None and matrix.generation == generation
+        and time.monotonic() - matrix.built_at < settings.LOCAL_INDEX_MAX_AGE
+    )
+
+
+def get_room_matrix():
+    global _matrix
+
+    generation = cache.get(MATRIX_GENERATION_KEY, 0)
+    matrix = _matrix
+    if _is_current(matrix, generation):
+        return matrix
+
+    with _matrix_lock:
+        if not _is_current(_matrix, generation):
+            _matrix = RoomFeatureMatrix.build(generation=generation)
+        return _matrix
+
+
+def _bump_matrix_generation():
+    try:
+        cache.incr(MATRIX_GENERATION_KEY)
+    except ValueError:
+        cache.set(MATRIX_GENERATION_KEY, 1, timeout=None)
+
+
+def invalidate_room_matrix():
+    """
+    Make every worker rebuild the matrix. Other workers are told once the write commits, as
+    a rebuild before that would cache the old rows under the new generation.
+    """
+    global _matrix
+
+    _matrix = None
+    transaction.on_commit(_bump_matrix_generation)
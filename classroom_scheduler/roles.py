@@ -0,0 +1,58 @@
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q, Subquery
+
+from .models import ClassGroup, Reservation
+
+OWNER = 'owner'
+REPRESENTATIVE = 'representative'
+INSTRUCTOR = 'instructor'
+STAFF = 'staff'
+
+
+def with_roles(queryset, user):
+    """
+    Annotate reservations with what `user` is to them, and with the group's first instructor,
+    the one change requests are sent to.
+    """
+    group_id = OuterRef('reservation_info__group_id')
+    representatives = ClassGroup.class_representatives.through.objects.filter(classgroup_id=group_id)
+    instructors = ClassGroup.instructors.through.objects.filter(classgroup_id=group_id)
+
+    return queryset.annotate(
+        is_owner=ExpressionWrapper(Q(reservation_info__user_id=user.pk), output_field=BooleanField()),
+        is_representative=Exists(representatives.filter(customuser_id=user.pk)),
+        is_instructor=Exists(instructors.filter(customuser_id=user.pk)),
+        first_instructor_id=Subquery(instructors.order_by('customuser_id').values('customuser_id')[:1]),
+    )
+
+
+def annotated_roles(reservation, user):
+    roles = set()
+    if user.is_staff or user.is_superuser:
+        roles.add(STAFF)
+    if reservation.is_owner:
+        roles.add(OWNER)
+    if reservation.is_representative:
+        roles.add(REPRESENTATIVE)
+    if reservation.is_instructor:
+        roles.add(INSTRUCTOR)
+    return frozenset(roles)
+
+
+def reservation_roles(user, reservation_ids):
+    """{reservation id: roles} for the given reservations, in one query. Unknown ids are left out."""
+    reservations = with_roles(Reservation.objects.filter(id__in=reservation_ids), user).only('id')
+    return {reservation.pk: annotated_roles(reservation, user) for reservation in reservations}
+
+
+def request_roles(request, reservation):
+    """
+    The requesting user's roles for the reservation, resolved once per request. Reservations
+    loaded through with_roles() carry their roles already and cost no query.
+    """
+    cache = request.__dict__.setdefault('_reservation_roles', {})
+    if reservation.pk not in cache:
+        if hasattr(reservation, 'is_owner'):
+            cache[reservation.pk] = annotated_roles(reservation, request.user)
+        else:
+            cache.update(reservation_roles(request.user, [reservation.pk]))
+    return cache.get(reservation.pk, frozenset())
@@ -0,0 +1,56 @@
+"""
+Stored full-text documents for rooms and buildings, kept current by signals and queried by
+FullTextSearchFilter. Postgres only: on other databases the columns stay empty and the filter
+falls back to substring matching.
+"""
+from django.contrib.postgres.search import SearchVector
+from django.db import connection
+from django.db.models import Value
+
+from .models import Building, Room
+
+# No stemming or stop words: the documents are names, numbers and addresses, not prose.
+SEARCH_CONFIG = 'simple'
+
+
+def search_enabled():
+    return connection.vendor == 'postgresql'
+
+
+def building_document():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('department', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('address', weight='C', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def room_document(building):
+    # UPDATE cannot join, so the building's text is passed in as values.
+    return (
+        SearchVector('room_number', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(building.name), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Value(building.department), Value(building.address), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def index_building(building):
+    """Refresh the documents of the building and of all its rooms."""
+    if not search_enabled():
+        return
+    Building.objects.filter(pk=building.pk).update(search_vector=building_document())
+    Room.all_objects.filter(building_id=building.pk).update(search_vector=room_document(building))
+
+
+def index_room(room):
+    if search_enabled():
+        Room.all_objects.filter(pk=room.pk).update(search_vector=room_document(room.building))
+
+
+def rebuild_search_index():
+    """Recompute every document, e.g. after writes that bypassed signals. Returns the number of buildings."""
+    buildings = list(Building.objects.all())
+    for building in buildings:
+        index_building(building)
+    return len(buildings)
@@ -1,6 +1,18 @@
+import csv
+import io
+from datetime import timedelta
 from typing import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Building, Equipment, Room, Reservation, ReservationInfo, ClassGroup
+from .models import Building, CalendarFeed, Equipment, Room, Reservation, ReservationChangeRequest, ReservationInfo, \
+    ClassGroup
+from .equipment import get_attribute_registry
+from .feeds import can_follow_group
+from .services import is_slot_taken, lock_room
+from .signals import send_reservations_changed
 from users.serializers import CustomUserSerializer
 from users.models import CustomUser
 
@@ -18,6 +30,12 @@ class EquipmentSerializer(serializers.ModelSerializer):
         model = Equipment
         fields = ['id', 'details']
 
+    def validate_details(self, value):
+        details, errors = get_attribute_registry().clean_details(value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return details
+
 
 class RoomSerializer(serializers.ModelSerializer):
     equipment = EquipmentSerializer(read_only=True)
@@ -95,26 +113,66 @@ class RoomSerializer(serializers.ModelSerializer):
         return room
 
 
+class RoomSuggestionSerializer(serializers.Serializer):
+    room = RoomSerializer(read_only=True)
+    fit_score = serializers.FloatField(read_only=True)
+
+
+class FreeSlotSerializer(serializers.Serializer):
+    start = serializers.DateTimeField(read_only=True)
+    end = serializers.DateTimeField(read_only=True)
+    room = RoomSerializer(read_only=True)
+
+
+class UserIdListField(serializers.ListField):
+    """
+    A list of user ids checked with one `IN` query, where PrimaryKeyRelatedField(many=True)
+    looks each id up on its own. Validates to the de-duplicated list of ids.
+    """
+    child = serializers.IntegerField()
+    default_error_messages = {
+        'does_not_exist': 'Invalid pk(s) {pk_values} - object does not exist.',
+    }
+
+    def to_internal_value(self, data):
+        user_ids = list(dict.fromkeys(super().to_internal_value(data)))
+        existing = set(CustomUser.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        missing = [pk for pk in user_ids if pk not in existing]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+        return user_ids
+
+    def to_representation(self, data):
+        return [user.pk for user in data.all()]
+
+
 class ClassGroupSerializer(serializers.ModelSerializer):
-    members = serializers.PrimaryKeyRelatedField(
-        queryset=CustomUser.objects.all(),
-        many=True
-    )
-    class_representatives = serializers.PrimaryKeyRelatedField(
-        queryset=CustomUser.objects.all(),
-        many=True
-    )
-    instructors = serializers.PrimaryKeyRelatedField(
-        queryset=CustomUser.objects.all(),
-        many=True,
-        required=False
-    )
+    members = UserIdListField()
+    class_representatives = UserIdListField()
+    instructors = UserIdListField(required=False)
 
     class Meta:
         model = ClassGroup
         fields = ['id', 'name', 'members', 'class_representatives', 'instructors']
 
 
+class ClassGroupSummarySerializer(serializers.ModelSerializer):
+    """The group without its membership lists, which can run to hundreds of ids."""
+    member_count = serializers.SerializerMethodField()
+    instructor_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ClassGroup
+        fields = ['id', 'name', 'member_count', 'instructor_count']
+
+    # Querysets built with queries.class_groups() carry the counts as annotations.
+    def get_member_count(self, group) -> int:
+        return group.member_count if hasattr(group, 'member_count') else group.members.count()
+
+    def get_instructor_count(self, group) -> int:
+        return group.instructor_count if hasattr(group, 'instructor_count') else group.instructors.count()
+
+
 class ReservationInfoSerializer(serializers.ModelSerializer):
     user = CustomUserSerializer(read_only=True)
     user_id = serializers.PrimaryKeyRelatedField(
@@ -122,7 +180,7 @@ class ReservationInfoSerializer(serializers.ModelSerializer):
         source='user',
         write_only=True
     )
-    group = ClassGroupSerializer(read_only=True)
+    group = ClassGroupSummarySerializer(read_only=True)
     group_id = serializers.PrimaryKeyRelatedField(
         queryset=ClassGroup.objects.all(),
         source='group',
@@ -133,11 +191,17 @@ class ReservationInfoSerializer(serializers.ModelSerializer):
         model = ReservationInfo
         fields = ['id', 'user', 'user_id', 'group', 'group_id', 'description']
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # `?expand=group` swaps the summary for the group with its full membership.
+        if 'group' in self.context.get('expand', ()):
+            fields['group'] = ClassGroupSerializer(read_only=True)
+        return fields
+
 
 class ReservationSerializer(serializers.ModelSerializer):
     room = RoomSerializer(read_only=True)
     reservation_info = ReservationInfoSerializer(read_only=True)
-    proposed_room = RoomSerializer(read_only=True)
 
     room_id = serializers.PrimaryKeyRelatedField(
         queryset=Room.objects.all(),
@@ -150,6 +214,7 @@ class ReservationSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
+    proposed_date_time = serializers.DateTimeField(write_only=True, required=False)
     reservation_info_id = serializers.PrimaryKeyRelatedField(
         queryset=ReservationInfo.objects.all(),
         source='reservation_info',
@@ -165,8 +230,7 @@ class ReservationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
         fields = [
-            'id', 'room', 'room_id',
-            'proposed_room', 'proposed_room_id',
+            'id', 'room', 'room_id', 'proposed_room_id',
             'reservation_info', 'reservation_info_id', 'reservation_info_data',
             'date_time', 'proposed_date_time'
         ]
@@ -182,7 +246,9 @@ class ReservationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         reservation_info_data = validated_data.pop('reservation_info', None)
         room = validated_data.pop('room')
-        proposed_room = validated_data.pop('proposed_room', None)
+        # Proposals are only meaningful for updates, where they become change requests.
+        validated_data.pop('proposed_room', None)
+        validated_data.pop('proposed_date_time', None)
 
         if isinstance(reservation_info_data, dict):
             lookup = {
@@ -201,7 +267,6 @@ class ReservationSerializer(serializers.ModelSerializer):
 
         reservation = Reservation.objects.create(
             room=room,
-            proposed_room=proposed_room,
             reservation_info=reservation_info,
             **validated_data
         )
@@ -209,6 +274,110 @@ class ReservationSerializer(serializers.ModelSerializer):
         return reservation
 
 
+class ReservationChangeEntrySerializer(serializers.Serializer):
+    version = serializers.IntegerField()
+    action = serializers.CharField()
+    reservation_id = serializers.IntegerField()
+    reservation = ReservationSerializer(allow_null=True)
+
+
+class ReservationChangeFeedSerializer(serializers.Serializer):
+    version = serializers.IntegerField()
+    has_more = serializers.BooleanField()
+    resync = serializers.BooleanField()
+    changes = ReservationChangeEntrySerializer(many=True)
+
+
+class ReservationChangeRequestSerializer(serializers.ModelSerializer):
+    reservation = ReservationSerializer(read_only=True)
+    requested_by = CustomUserSerializer(read_only=True)
+    proposed_room = RoomSerializer(read_only=True)
+
+    class Meta:
+        model = ReservationChangeRequest
+        fields = [
+            'id', 'reservation', 'requested_by',
+            'proposed_room', 'proposed_date_time',
+            'status', 'created_at', 'decided_at'
+        ]
+
+
+class ChangeRequestDecisionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
+class BulkReservationDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
+class BulkRescheduleSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    offset = serializers.DurationField(required=False)
+    room_id = serializers.PrimaryKeyRelatedField(queryset=Room.objects.all(), required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('offset') and 'room_id' not in attrs:
+            raise serializers.ValidationError("Provide an offset, a room_id or both.")
+        return attrs
+
+
+class GroupMembershipSerializer(serializers.Serializer):
+    ids = UserIdListField(allow_empty=False)
+
+
+class RosterImportSerializer(serializers.Serializer):
+    """
+    A CSV roster with a header row naming an `id`, `username` or `email` column; other columns
+    are ignored. Every row must match an existing user.
+    """
+    KEY_COLUMNS = ['id', 'username', 'email']
+
+    file = serializers.FileField()
+    replace = serializers.BooleanField(
+        default=False,
+        help_text='Remove current members that are missing from the roster.'
+    )
+
+    def validate(self, attrs):
+        try:
+            reader = csv.DictReader(io.TextIOWrapper(attrs['file'], encoding='utf-8-sig'))
+            fieldnames = {(name or '').strip().lower(): name for name in reader.fieldnames or []}
+            column = next((key for key in self.KEY_COLUMNS if key in fieldnames), None)
+            if column is None:
+                raise serializers.ValidationError({'file': 'The roster needs an id, username or email column.'})
+            values = [(row[fieldnames[column]] or '').strip() for row in reader]
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise serializers.ValidationError({'file': f'Could not read the roster: {exc}'})
+
+        values = list(dict.fromkeys(value for value in values if value))
+        if not values:
+            raise serializers.ValidationError({'file': 'The roster is empty.'})
+        attrs['user_ids'] = self.resolve_users(column, values)
+        return attrs
+
+    def resolve_users(self, column, values):
+        if column == 'id':
+            invalid = [value for value in values if not value.isdigit()]
+            if invalid:
+                raise serializers.ValidationError({'invalid_ids': invalid})
+            lookup = dict(CustomUser.objects.filter(pk__in=[int(v) for v in values]).values_list('pk', 'pk'))
+            keys = [int(value) for value in values]
+        elif column == 'username':
+            lookup = dict(CustomUser.objects.filter(username__in=values).values_list('username', 'pk'))
+            keys = values
+        else:
+            keys = [value.lower() for value in values]
+            lookup = dict(
+                CustomUser.objects.annotate(email_lower=Lower('email'))
+                .filter(email_lower__in=keys).values_list('email_lower', 'pk')
+            )
+
+        unknown = [value for value, key in zip(values, keys) if key not in lookup]
+        if unknown:
+            raise serializers.ValidationError({'unknown_users': unknown})
+        return [lookup[key] for key in keys]
+
+
 class BulkReservationSerializer(serializers.Serializer):
     room_id = serializers.PrimaryKeyRelatedField(queryset=Room.objects.all())
     reservation_info_id = serializers.PrimaryKeyRelatedField(
@@ -240,37 +409,95 @@ class BulkReservationSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 {"date_times": f"Duplicate date_times in input: {duplicated}"}
             )
+        ordered = sorted(date_times)
+        length = timedelta(minutes=settings.RESERVATION_SLOT_MINUTES)
+        overlapping = [later for earlier, later in zip(ordered, ordered[1:]) if later - earlier < length]
+        if overlapping:
+            raise serializers.ValidationError(
+                {"date_times": f"date_times overlap earlier ones in input: {overlapping}"}
+            )
+
+        self.check_free(room, date_times)
+        return attrs
 
+    @staticmethod
+    def check_free(room, date_times):
         for dt in date_times:
-            if Reservation.objects.filter(room=room, date_time=dt).exists():
+            if is_slot_taken(room, dt):
                 raise serializers.ValidationError(
                     f"Room '{room}' is already booked for {dt}"
                 )
-
-        return attrs
     
     def create(self, validated_data):
         room = validated_data['room_id']
         date_times = validated_data['date_times']
         reservation_info_data = validated_data.pop('reservation_info', None)
 
-        if isinstance(reservation_info_data, dict):
-            lookup = {
-                'user': reservation_info_data.pop('user'),
-                'group': reservation_info_data.pop('group', None)
-            }
-            if 'description' in reservation_info_data:
-                lookup['description'] = reservation_info_data.pop('description')
-            reservation_info, _ = ReservationInfo.objects.get_or_create(
-                **lookup,
-                defaults=reservation_info_data
-            )
-        else:
-            reservation_info = reservation_info_data
+        with transaction.atomic():
+            # validate() checked without the lock; a booking may have been made since.
+            lock_room(room)
+            self.check_free(room, date_times)
 
-        reservations = [
-            Reservation(room=room, reservation_info=reservation_info, date_time=dt)
-            for dt in date_times
-        ]
+            if isinstance(reservation_info_data, dict):
+                lookup = {
+                    'user': reservation_info_data.pop('user'),
+                    'group': reservation_info_data.pop('group', None)
+                }
+                if 'description' in reservation_info_data:
+                    lookup['description'] = reservation_info_data.pop('description')
+                reservation_info, _ = ReservationInfo.objects.get_or_create(
+                    **lookup,
+                    defaults=reservation_info_data
+                )
+            else:
+                reservation_info = reservation_info_data
+
+            reservations = [
+                Reservation(room=room, reservation_info=reservation_info, date_time=dt)
+                for dt in date_times
+            ]
 
-        return Reservation.objects.bulk_create(reservations)
+            reservations = Reservation.objects.bulk_create(reservations)
+            send_reservations_changed('created', reservations)
+        return reservations
+
+
+class CalendarFeedSerializer(serializers.ModelSerializer):
+    room_id = serializers.PrimaryKeyRelatedField(
+        queryset=Room.objects.all(),
+        source='room',
+        required=False
+    )
+    group_id = serializers.PrimaryKeyRelatedField(
+        queryset=ClassGroup.objects.all(),
+        source='group',
+        required=False
+    )
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CalendarFeed
+        fields = ['id', 'kind', 'room_id', 'group_id', 'url', 'version', 'changed_at']
+        read_only_fields = ['version', 'changed_at']
+
+    def get_url(self, feed) -> str:
+        path = reverse('home_module:calendar_feed', args=[feed.token])
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
+
+    def validate(self, attrs):
+        kind = attrs['kind']
+        room = attrs.get('room')
+        group = attrs.get('group')
+        user = self.context['request'].user
+
+        if kind == CalendarFeed.Kind.ROOM and (room is None or group is not None):
+            raise serializers.ValidationError("Room feeds need room_id and no group_id.")
+        if kind == CalendarFeed.Kind.GROUP:
+            if group is None or room is not None:
+                raise serializers.ValidationError("Group feeds need group_id and no room_id.")
+            if not can_follow_group(user, group.pk):
+                raise serializers.ValidationError("You can only subscribe to groups you belong to.")
+        if kind == CalendarFeed.Kind.USER and (room is not None or group is not None):
+            raise serializers.ValidationError("Personal feeds take neither room_id nor group_id.")
+        return attrs
@@ -0,0 +1,229 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ClassGroup, Reservation, ReservationChangeRequest, ReservationInfo, Room
+from .queries import overlapping_reservations
+from .signals import send_reservations_changed
+
+
+class ReservationConflict(Exception):
+    def __init__(self, room, date_time):
+        self.room = room
+        self.date_time = date_time
+        super().__init__(f"Room '{room}' is already booked for {date_time}")
+
+
+class ChangeRequestConflict(Exception):
+    def __init__(self, change_request_ids):
+        self.change_request_ids = change_request_ids
+        super().__init__(f"Change requests {change_request_ids} target slots that are already booked")
+
+
+class BulkRescheduleConflict(Exception):
+    def __init__(self, reservation_ids):
+        self.reservation_ids = reservation_ids
+        super().__init__(f"Reservations {reservation_ids} would move into slots that are already booked")
+
+
+def lock_room(room):
+    """
+    Take a row lock on the room for the rest of the current transaction. Every write that
+    books a slot goes through this lock, so checking for a conflict and saving cannot be
+    interleaved with another booking of the same room.
+    """
+    return Room.objects.select_for_update().get(pk=room.pk)
+
+
+def is_slot_taken(room, date_time, exclude_pk=None):
+    """Whether a reservation starting at `date_time` would overlap another one in the room."""
+    end = date_time + timedelta(minutes=settings.RESERVATION_SLOT_MINUTES)
+    return overlapping_reservations(date_time, end).filter(room=room).exclude(pk=exclude_pk).exists()
+
+
+def move_reservation(reservation, room=None, date_time=None):
+    """
+    Atomically move the reservation to `room` at `date_time`, keeping the current value for
+    whichever one is omitted. Raises ReservationConflict when the target slot is taken.
+    """
+    with transaction.atomic():
+        reservation = Reservation.objects.select_for_update(of=('self',)).get(pk=reservation.pk)
+        room = room or reservation.room
+        date_time = date_time or reservation.date_time
+
+        lock_room(room)
+        if is_slot_taken(room, date_time, exclude_pk=reservation.pk):
+            raise ReservationConflict(room, date_time)
+
+        reservation.room = room
+        reservation.date_time = date_time
+        reservation.save()
+
+    return reservation
+
+
+def reschedule_reservations(reservation_ids, offset=None, room=None):
+    """
+    Shift the reservations by `offset` and/or move them to `room` in one transaction. All or
+    nothing: if any target slot is booked, or two reservations would land in the same slot,
+    BulkRescheduleConflict lists the offending reservations. Returns the moved reservations.
+    """
+    with transaction.atomic():
+        reservations = list(
+            Reservation.objects.select_for_update(of=('self',)).filter(id__in=reservation_ids).order_by('id')
+        )
+        targets = {
+            reservation.pk: (room.pk if room else reservation.room_id, reservation.date_time + (offset or timedelta()))
+            for reservation in reservations
+        }
+
+        # Same locks as single bookings, taken in room order so concurrent batches cannot deadlock.
+        room_ids = sorted({room_id for room_id, _ in targets.values()})
+        list(Room.objects.select_for_update().filter(id__in=room_ids).order_by('id').values_list('id', flat=True))
+
+        taken = set(Reservation.objects.filter(
+            room_id__in=room_ids,
+            date_time__in={date_time for _, date_time in targets.values()}
+        ).exclude(id__in=targets).values_list('room_id', 'date_time'))
+        landing = Counter(targets.values())
+        conflicts = [pk for pk, target in targets.items() if target in taken or landing[target] > 1]
+        if conflicts:
+            raise BulkRescheduleConflict(conflicts)
+
+        for reservation in reservations:
+            reservation.room_id, reservation.date_time = targets[reservation.pk]
+        Reservation.objects.bulk_update(reservations, ['room', 'date_time'])
+        send_reservations_changed('updated', reservations)
+
+    for reservation in reservations:
+        reservation.remember_original()
+    return reservations
+
+
+def decide_change_requests(instructor, change_request_ids, approve):
+    """
+    Approve or reject the instructor's pending change requests in one transaction. Approval is
+    all-or-nothing: if any request targets a slot that is taken, nothing is applied and
+    ChangeRequestConflict lists the offending requests. Returns the decided requests; ids that
+    are not pending in the instructor's inbox, or whose reservation was deleted, are skipped.
+    """
+    with transaction.atomic():
+        change_requests = list(
+            ReservationChangeRequest.objects.of_live_reservations().select_for_update(of=('self',))
+            .filter(instructor=instructor, status=ReservationChangeRequest.Status.PENDING, id__in=change_request_ids)
+            .select_related('reservation', 'proposed_room')
+        )
+
+        if approve:
+            # Applying in room order keeps the room locks of concurrent batches in the same order.
+            change_requests.sort(key=lambda cr: (cr.proposed_room_id or cr.reservation.room_id, cr.id))
+            conflicts = []
+            for change_request in change_requests:
+                try:
+                    move_reservation(
+                        change_request.reservation,
+                        change_request.proposed_room,
+                        change_request.proposed_date_time
+                    )
+                except (ReservationConflict, Reservation.DoesNotExist, Room.DoesNotExist):
+                    # A reservation or proposed room deleted since is as unavailable as a taken slot.
+                    conflicts.append(change_request.id)
+            if conflicts:
+                raise ChangeRequestConflict(conflicts)
+
+        status = ReservationChangeRequest.Status.APPROVED if approve else ReservationChangeRequest.Status.REJECTED
+        decided_at = timezone.now()
+        ReservationChangeRequest.objects.filter(id__in=[cr.id for cr in change_requests]).update(
+            status=status,
+            decided_at=decided_at
+        )
+        for change_request in change_requests:
+            change_request.status = status
+            change_request.decided_at = decided_at
+
+    return change_requests
+
+
+def add_group_members(group, user_ids):
+    """Insert the missing membership rows with a single bulk insert. Returns how many were added."""
+    through = ClassGroup.members.through
+    existing = set(
+        through.objects.filter(classgroup=group, customuser_id__in=user_ids).values_list('customuser_id', flat=True)
+    )
+    added = [
+        through(classgroup_id=group.pk, customuser_id=user_id)
+        for user_id in dict.fromkeys(user_ids) if user_id not in existing
+    ]
+    through.objects.bulk_create(added, ignore_conflicts=True)
+    return len(added)
+
+
+def remove_group_members(group, user_ids):
+    removed, _ = ClassGroup.members.through.objects.filter(classgroup=group, customuser_id__in=user_ids).delete()
+    return removed
+
+
+def replace_group_members(group, user_ids):
+    """Make `user_ids` the group's exact membership. Returns (added, removed) counts."""
+    with transaction.atomic():
+        removed, _ = ClassGroup.members.through.objects.filter(classgroup=group).exclude(
+            customuser_id__in=user_ids
+        ).delete()
+        added = add_group_members(group, user_ids)
+    return added, removed
+
+
+def _in_batches(queryset, batch_size, action):
+    total = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        with transaction.atomic():
+            action(ids)
+        total += len(ids)
+
+
+def cascade_tombstones(batch_size=500):
+    """
+    Tombstone the live reservations of deleted rooms and reservation infos, a batch per
+    transaction. Deleting a room only marks the room, so this is where its reservations follow.
+    """
+    return _in_batches(
+        Reservation.all_objects.filter(deleted_at__isnull=True).filter(
+            Q(room__deleted_at__isnull=False) | Q(reservation_info__deleted_at__isnull=False)
+        ),
+        batch_size,
+        lambda ids: Reservation.all_objects.filter(pk__in=ids).delete()
+    )
+
+
+def purge_tombstones(batch_size=500, now=None):
+    """
+    Hard-delete rows tombstoned more than SOFT_DELETE_RETENTION_DAYS ago, children first and a
+    batch per transaction, so no single statement cascades far. Returns counts per model.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=settings.SOFT_DELETE_RETENTION_DAYS)
+    return {
+        'reservations': _in_batches(
+            Reservation.all_objects.filter(deleted_at__lt=cutoff),
+            batch_size,
+            lambda ids: Reservation.all_objects.filter(pk__in=ids).hard_delete()
+        ),
+        'reservation_infos': _in_batches(
+            ReservationInfo.all_objects.filter(deleted_at__lt=cutoff).exclude(
+                id__in=Reservation.all_objects.values('reservation_info_id')
+            ),
+            batch_size,
+            lambda ids: ReservationInfo.all_objects.filter(pk__in=ids).hard_delete()
+        ),
+        'rooms': _in_batches(
+            Room.all_objects.filter(deleted_at__lt=cutoff).exclude(id__in=Reservation.all_objects.values('room_id')),
+            batch_size,
+            lambda ids: Room.all_objects.filter(pk__in=ids).hard_delete()
+        ),
+    }
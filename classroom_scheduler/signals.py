@@ -0,0 +1,148 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from .autocomplete import invalidate_autocomplete_index
+from .changes import record_changes
+from .equipment import invalidate_attribute_registry
+from .feeds import touch_feeds
+from .models import Building, ClassGroup, Equipment, EquipmentAttribute, Reservation, ReservationInfo, Room
+from .ranking import invalidate_room_matrix
+from .search import index_building, index_room
+from .visibility import refresh_group_visibility, refresh_visibility
+
+# Sent with `action` ('created', 'updated' or 'deleted') and `changes`, a list of dicts describing
+# each affected reservation before and after the write. Model signals feed it for single-object
+# saves and deletes; bulk writes, which bypass model signals, call send_reservations_changed().
+reservations_changed = Signal()
+
+
+def describe_reservation(reservation):
+    original = getattr(reservation, '_original', {})
+    return {
+        'reservation_id': reservation.pk,
+        'reservation_info_id': reservation.reservation_info_id,
+        'room_id': reservation.room_id,
+        'date_time': reservation.date_time,
+        'previous_room_id': original.get('room_id'),
+        'previous_date_time': original.get('date_time'),
+    }
+
+
+def send_reservations_changed(action, reservations):
+    changes = [describe_reservation(reservation) for reservation in reservations]
+    if changes:
+        reservations_changed.send(sender=Reservation, action=action, changes=changes)
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, **kwargs):
+    send_reservations_changed('created' if created else 'updated', [instance])
+    instance.remember_original()
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    # Purging a tombstone changes nothing anyone can see; the tombstoning was reported already.
+    if instance.deleted_at is None:
+        send_reservations_changed('deleted', [instance])
+
+
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=Equipment)
+def room_features_changed(sender, **kwargs):
+    invalidate_room_matrix()
+
+
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=Building)
+def room_labels_changed(sender, **kwargs):
+    invalidate_autocomplete_index()
+
+
+@receiver([post_save, post_delete], sender=EquipmentAttribute)
+def equipment_attributes_changed(sender, **kwargs):
+    invalidate_attribute_registry()
+
+
+@receiver(post_save, sender=Building)
+def building_saved(sender, instance, **kwargs):
+    index_building(instance)
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'deleted_at'}:
+        return
+    index_room(instance)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=Building)
+@receiver(post_save, sender=ClassGroup)
+def feed_labels_changed(sender, instance, created, **kwargs):
+    # Feeds name rooms, buildings and groups, so a rename (or a room delete) has to reach them.
+    if created:
+        return
+    if sender is ClassGroup:
+        touch_feeds(group_ids=[instance.pk], reservation_info_ids=instance.reservation_infos.values('id'))
+        return
+    room_ids = [instance.pk] if sender is Room else Room.all_objects.filter(building=instance).values('id')
+    touch_feeds(
+        room_ids=room_ids,
+        reservation_info_ids=Reservation.all_objects.filter(
+            room_id__in=room_ids, deleted_at__isnull=True
+        ).values('reservation_info_id')
+    )
+
+
+@receiver(post_save, sender=ReservationInfo)
+def reservation_info_saved(sender, instance, **kwargs):
+    refresh_visibility([instance.pk])
+    touch_feeds(
+        room_ids=Reservation.objects.filter(reservation_info_id=instance.pk).values('room_id'),
+        reservation_info_ids=[instance.pk]
+    )
+
+
+@receiver(m2m_changed, sender=ClassGroup.class_representatives.through)
+@receiver(m2m_changed, sender=ClassGroup.instructors.through)
+def group_viewers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_group_visibility([instance.pk])
+        return
+
+    # Changed from the user's side (user.instructed_groups.add(...)): pk_set holds group ids,
+    # except for clear, where the groups have to be remembered before they are gone.
+    if action == 'pre_clear':
+        instance._cleared_group_ids = list(
+            sender.objects.filter(customuser_id=instance.pk).values_list('classgroup_id', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        refresh_group_visibility(pk_set)
+    elif action == 'post_clear':
+        refresh_group_visibility(getattr(instance, '_cleared_group_ids', []))
+
+
+@receiver(pre_delete, sender=ClassGroup)
+def class_group_deleting(sender, instance, **kwargs):
+    # Reservation infos lose their group through SET_NULL, which does not send save signals.
+    instance._reservation_info_ids = list(instance.reservation_infos.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=ClassGroup)
+def class_group_deleted(sender, instance, **kwargs):
+    refresh_visibility(getattr(instance, '_reservation_info_ids', []))
+
+
+@receiver(reservations_changed)
+def reservations_changed_feeds(sender, action, changes, **kwargs):
+    touch_feeds(
+        room_ids=({change['room_id'] for change in changes} | {change['previous_room_id'] for change in changes}) - {None},
+        reservation_info_ids={change['reservation_info_id'] for change in changes}
+    )
+
+
+@receiver(reservations_changed)
+def log_reservation_changes(sender, action, changes, **kwargs):
+    record_changes(action, changes)
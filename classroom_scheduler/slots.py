@@ -0,0 +1,136 @@
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ClassGroup, Reservation
+from .ranking import get_room_matrix
+
+CANDIDATE_ROOM_LIMIT = 20
+SLOT_STEP_MINUTES = 15
+DAY_START = dt_time(8, 0)
+DAY_END = dt_time(20, 0)
+SEARCH_BUDGET_SECONDS = 0.5
+
+
+class BusyIntervals:
+    """Disjoint busy intervals as parallel sorted arrays of epoch seconds, merged with one sweep."""
+
+    def __init__(self, starts, length):
+        self.starts = array('q')
+        self.ends = array('q')
+        for start in sorted(starts):
+            end = start + length
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def blocking_end(self, start, end):
+        """End of the interval overlapping [start, end), or None when that window is free."""
+        index = bisect_right(self.ends, start)
+        if index < len(self.starts) and self.starts[index] < end:
+            return self.ends[index]
+        return None
+
+
+def group_commitments(group):
+    """
+    Reservations that keep the group busy: its own, those of every group sharing a member with
+    it, and those of groups taught or booked by its instructors.
+    """
+    members = ClassGroup.members.through.objects
+    instructors = ClassGroup.instructors.through.objects
+    member_ids = members.filter(classgroup_id=group.pk).values('customuser_id')
+    instructor_ids = instructors.filter(classgroup_id=group.pk).values('customuser_id')
+
+    return Reservation.objects.filter(
+        Q(reservation_info__group_id=group.pk)
+        | Q(reservation_info__group_id__in=members.filter(customuser_id__in=member_ids).values('classgroup_id'))
+        | Q(reservation_info__group_id__in=instructors.filter(customuser_id__in=instructor_ids).values('classgroup_id'))
+        | Q(reservation_info__user_id__in=instructor_ids)
+    )
+
+
+def candidate_starts(start, end, length, step):
+    """Step-aligned local start times within the teaching day, in order."""
+    tz = timezone.get_current_timezone()
+    day = timezone.localtime(start).date()
+    while True:
+        day_start = timezone.make_aware(datetime.combine(day, DAY_START), tz)
+        day_end = min(timezone.make_aware(datetime.combine(day, DAY_END), tz), end)
+        if day_start >= end:
+            return
+
+        offset = max(start - day_start, timedelta(0))
+        moment = day_start + -(-offset // step) * step
+        while moment + length <= day_end:
+            yield moment
+            moment += step
+        day += timedelta(days=1)
+
+
+def find_free_slots(group, start, end, group_size, length=None, limit=10, required_equipment=(),
+                    preferred_building_id=None, budget=SEARCH_BUDGET_SECONDS):
+    """
+    The earliest `limit` windows of `length` between `start` and `end` in which the group, its
+    instructors and the groups sharing its members are all free, each with the best fitting room
+    free at that time. Returns (windows, complete); complete is False when the search ran out of
+    its time budget before covering the whole range.
+    """
+    deadline = time.monotonic() + budget
+    length = length or timedelta(minutes=settings.RESERVATION_SLOT_MINUTES)
+    reservation_length = int(timedelta(minutes=settings.RESERVATION_SLOT_MINUTES).total_seconds())
+    booked_from = start - timedelta(seconds=reservation_length)
+
+    busy = BusyIntervals(
+        (int(date_time.timestamp()) for date_time in group_commitments(group).filter(
+            date_time__gte=booked_from, date_time__lt=end
+        ).values_list('date_time', flat=True)),
+        reservation_length
+    )
+
+    ranked = get_room_matrix().rank(
+        group_size=group_size,
+        required_equipment=required_equipment,
+        preferred_building_id=preferred_building_id,
+        limit=CANDIDATE_ROOM_LIMIT,
+    )
+    room_ids = [room_id for _, room_id in ranked]
+    room_starts = {room_id: [] for room_id in room_ids}
+    for room_id, date_time in Reservation.objects.filter(
+        room_id__in=room_ids, date_time__gte=booked_from, date_time__lt=end
+    ).values_list('room_id', 'date_time'):
+        room_starts[room_id].append(int(date_time.timestamp()))
+    room_busy = [(room_id, BusyIntervals(starts, reservation_length)) for room_id, starts in room_starts.items()]
+
+    windows = []
+    seconds = int(length.total_seconds())
+    skip_until = None
+    for moment in candidate_starts(start, end, length, timedelta(minutes=SLOT_STEP_MINUTES)):
+        if len(windows) >= limit:
+            break
+        if time.monotonic() > deadline:
+            return windows, False
+
+        window_start = int(moment.timestamp())
+        if skip_until is not None and window_start < skip_until:
+            continue
+        skip_until = busy.blocking_end(window_start, window_start + seconds)
+        if skip_until is not None:
+            continue
+
+        room_id = next(
+            (room_id for room_id, intervals in room_busy
+             if intervals.blocking_end(window_start, window_start + seconds) is None),
+            None
+        )
+        if room_id is not None:
+            windows.append((moment, moment + length, room_id))
+
+    return windows, True
@@ -1,14 +1,49 @@
+import asyncio
+import gc
+import io
+import json
+import os
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
 from datetime import timedelta, datetime
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 from django.utils.timezone import make_aware
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
 from django.utils import timezone
 
 from django.contrib.auth import get_user_model
 
+from bruker_backend.db_router import ReplicaRouter, is_pinned_to_primary, replica_reads
+from bruker_backend.throttling import SlidingWindowThrottle, rejection_counts, throttle_cache
 from users.models import CustomUser
-from .models import Building, ClassGroup, Equipment, Reservation, ReservationInfo, Room
+from .equipment import INDEX_PREFIX, REGISTRY_GENERATION_KEY, get_attribute_registry, normalize_equipment_details, \
+    sync_attribute_indexes
+from .events import broker
+from .idempotency import request_fingerprint
+from .ranking import MATRIX_GENERATION_KEY, get_room_matrix, invalidate_room_matrix
+from .autocomplete import INDEX_GENERATION_KEY
+from .changes import current_version, purge_changes
+from .roles import OWNER, REPRESENTATIVE, STAFF, reservation_roles
+from .models import Building, ClassGroup, Equipment, EquipmentAttribute, IdempotencyKey, Reservation, ReservationChangeRequest, \
+    ReservationChange, ReservationInfo, ReservationVisibility, Room
+from .queries import reserved_room_ids
+from .serializers import BulkReservationSerializer
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -423,8 +458,368 @@ class ReservationUpdateTest(APITestCase):
         self.reservation.refresh_from_db()
         self.assertEqual(self.reservation.room, self.new_room)
         self.assertEqual(self.reservation.date_time, make_aware(datetime(2025, 6, 25, 10, 0)))
-        self.assertIsNone(self.reservation.proposed_room)
-        self.assertIsNone(self.reservation.proposed_date_time)
+        self.assertFalse(self.reservation.change_requests.exists())
+
+    def test_instructor_update_into_taken_slot_conflicts(self):
+        Reservation.objects.create(
+            room=self.new_room,
+            date_time=make_aware(datetime(2025, 6, 25, 10, 0)),
+            reservation_info=self.info
+        )
+        url = f'/api/reservation/{self.reservation.id}/'
+        payload = {
+            "proposed_room_id": self.new_room.id,
+            "proposed_date_time": make_aware(datetime(2025, 6, 25, 10, 0)).isoformat()
+        }
+
+        response = self.client.patch(url, payload, format="json")
+        self.assertEqual(response.status_code, 409)
+
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.room, self.room)
+
+class ReservationRoleTest(APITestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pass')
+        self.representative = CustomUser.objects.create_user(username='rep', email='rep@example.com', password='pass')
+        self.instructor = CustomUser.objects.create_user(username='inst', email='inst@example.com', password='pass')
+        self.staff = CustomUser.objects.create_user(username='staff', email='staff@example.com', password='pass',
+                                                    is_staff=True)
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.group = ClassGroup.objects.create(name="Group A")
+        self.group.class_representatives.add(self.representative)
+        self.group.instructors.add(self.instructor)
+        info = ReservationInfo.objects.create(user=self.owner, group=self.group, description="desc")
+        other_info = ReservationInfo.objects.create(user=self.instructor, description="other")
+        self.reservation = Reservation.objects.create(
+            room=self.room, date_time=make_aware(datetime(2025, 6, 20, 10, 0)), reservation_info=info
+        )
+        self.other = Reservation.objects.create(
+            room=self.room, date_time=make_aware(datetime(2025, 6, 20, 12, 0)), reservation_info=other_info
+        )
+
+    def test_bulk_roles_resolve_in_one_query(self):
+        with self.assertNumQueries(1):
+            roles = reservation_roles(self.representative, [self.reservation.id, self.other.id])
+        self.assertEqual(roles, {self.reservation.id: {REPRESENTATIVE}, self.other.id: frozenset()})
+
+        roles = reservation_roles(self.staff, [self.reservation.id])
+        self.assertEqual(roles[self.reservation.id], {STAFF})
+        self.assertEqual(reservation_roles(self.owner, [self.reservation.id])[self.reservation.id], {OWNER})
+
+    def test_destroy_checks_roles_with_the_reservation_lookup(self):
+        self.client.force_authenticate(self.instructor)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/reservation/{self.reservation.id}/')
+        self.assertEqual(response.status_code, 204)
+        role_queries = [query for query in queries.captured_queries if 'EXISTS' in query['sql']]
+        self.assertEqual(len(role_queries), 1)
+
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.delete(f'/api/reservation/{self.other.id}/').status_code, 204)
+
+    def test_representative_update_goes_to_first_instructor(self):
+        self.client.force_authenticate(self.representative)
+        response = self.client.patch(f'/api/reservation/{self.reservation.id}/', {
+            "proposed_room_id": self.room.id,
+            "proposed_date_time": make_aware(datetime(2025, 6, 21, 10, 0)).isoformat()
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        change_request = ReservationChangeRequest.objects.get(pk=response.data['change_request_id'])
+        self.assertEqual(change_request.instructor, self.instructor)
+
+    def test_stranger_is_forbidden(self):
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.delete(f'/api/reservation/{self.other.id}/').status_code, 404)
+
+
+class BulkReservationActionsTest(APITestCase):
+    def setUp(self):
+        self.instructor = CustomUser.objects.create_user(username='inst', email='inst@example.com', password='pass')
+        self.student = CustomUser.objects.create_user(username='student', email='student@example.com', password='pass')
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.other_room = Room.objects.create(building=building, room_number="1.40", capacity=30)
+        group = ClassGroup.objects.create(name="Group A")
+        group.instructors.add(self.instructor)
+        info = ReservationInfo.objects.create(user=self.student, group=group, description="Lecture")
+        self.series = [
+            Reservation.objects.create(
+                room=self.room, date_time=make_aware(datetime(2025, 6, 2 + week * 7, 10, 0)), reservation_info=info
+            )
+            for week in range(4)
+        ]
+        self.ids = [reservation.id for reservation in self.series]
+        self.client.force_authenticate(self.instructor)
+
+    def test_bulk_delete(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/reservation/bulk_delete/', {'ids': self.ids}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Reservation.objects.filter(id__in=self.ids).exists())
+        self.assertEqual(sum('EXISTS' in query['sql'] for query in queries.captured_queries), 1)
+
+    def test_bulk_delete_is_all_or_nothing(self):
+        stranger = ReservationInfo.objects.create(user=self.student, description="Private")
+        private = Reservation.objects.create(room=self.other_room, date_time=self.series[0].date_time,
+                                             reservation_info=stranger)
+
+        response = self.client.post('/api/reservation/bulk_delete/', {'ids': self.ids + [private.id, 0]},
+                                    format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['forbidden_ids'], [private.id, 0])
+        self.assertEqual(Reservation.objects.filter(id__in=self.ids).count(), 4)
+
+    def test_bulk_reschedule_shifts_and_moves(self):
+        version = current_version()
+        response = self.client.post('/api/reservation/bulk_reschedule/', {
+            'ids': self.ids, 'offset': '1 02:00:00', 'room_id': self.other_room.id
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        for reservation in self.series:
+            moved = Reservation.objects.get(pk=reservation.pk)
+            self.assertEqual(moved.room, self.other_room)
+            self.assertEqual(moved.date_time, reservation.date_time + timedelta(days=1, hours=2))
+        self.assertEqual(
+            set(ReservationChange.objects.filter(id__gt=version).values_list('action', flat=True)), {'updated'}
+        )
+
+    def test_bulk_reschedule_conflicts_apply_nothing(self):
+        blocker_info = ReservationInfo.objects.create(user=self.instructor, description="Exam")
+        Reservation.objects.create(room=self.room, date_time=self.series[3].date_time + timedelta(days=7),
+                                   reservation_info=blocker_info)
+
+        # A week's shift moves each occurrence into the next one's slot, which is fine until the last.
+        response = self.client.post('/api/reservation/bulk_reschedule/', {
+            'ids': self.ids, 'offset': '7 00:00:00'
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicting_ids'], [self.ids[3]])
+        self.assertEqual(Reservation.objects.get(pk=self.ids[0]).date_time, self.series[0].date_time)
+
+    def test_owner_cannot_bulk_reschedule(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.post('/api/reservation/bulk_reschedule/', {
+            'ids': self.ids, 'offset': '7 00:00:00'
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ThrottlingTest(APITestCase):
+    def setUp(self):
+        throttle_cache().clear()
+        self.user = CustomUser.objects.create_user(username='user', email='user@example.com', password='pass')
+
+    def test_login_is_limited_per_client(self):
+        payload = {'username': 'user@example.com', 'password': 'wrong'}
+        # A fixed clock, so the requests cannot straddle a window boundary.
+        with patch.object(SlidingWindowThrottle, 'THROTTLE_RATES', {'login': '3/min'}), \
+                patch.object(SlidingWindowThrottle, 'timer', lambda self: 6030.0):
+            statuses = [self.client.post('/users/login/', payload, format='json').status_code for _ in range(4)]
+            self.assertEqual(statuses, [401, 401, 401, 429])
+            self.assertEqual(rejection_counts(['login']), {'login': 1})
+
+            response = self.client.post('/users/login/', payload, format='json', REMOTE_ADDR='10.0.0.2')
+            self.assertEqual(response.status_code, 401)
+
+    def test_window_slides_instead_of_resetting(self):
+        throttle = SlidingWindowThrottle()
+        view = SimpleNamespace(throttle_scope='reservation_write')
+        request = SimpleNamespace(user=self.user, method='POST', META={'REMOTE_ADDR': '127.0.0.1'})
+
+        with patch.object(SlidingWindowThrottle, 'THROTTLE_RATES', {'reservation_write': '4/min'}):
+            throttle.timer = lambda: 6000.0 + 50
+            self.assertEqual([throttle.allow_request(request, view) for _ in range(5)], [True] * 4 + [False])
+
+            # 6 s into the next window the previous one still counts for 90%, leaving room for one request.
+            throttle.timer = lambda: 6060.0 + 6
+            self.assertTrue(throttle.allow_request(request, view))
+            self.assertFalse(throttle.allow_request(request, view))
+            self.assertAlmostEqual(throttle.wait(), 9.0)
+
+    def test_reservation_reads_are_not_throttled(self):
+        self.client.force_authenticate(self.user)
+        with patch.object(SlidingWindowThrottle, 'THROTTLE_RATES', {'reservation_write': '1/min'}), \
+                patch.object(SlidingWindowThrottle, 'timer', lambda self: 6030.0):
+            self.assertEqual(self.client.get('/api/reservation/').status_code, 200)
+            self.assertEqual(self.client.get('/api/reservation/').status_code, 200)
+            self.assertEqual(self.client.post('/api/reservation/bulk_delete/', {'ids': [0]}, format='json').status_code, 403)
+            self.assertEqual(self.client.post('/api/reservation/bulk_delete/', {'ids': [0]}, format='json').status_code, 429)
+
+
+class SchemaEndpointTest(APITestCase):
+    def test_built_schema_is_served_with_etag(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'openapi.json')
+            call_command('build_openapi_schema', file=path, stdout=io.StringIO())
+
+            with override_settings(OPENAPI_SCHEMA_FILE=path):
+                response = self.client.get('/api/schema/')
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('/api/reservation/', json.loads(response.content)['paths'])
+
+                response = self.client.get('/api/schema/', HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_live_generation_only_in_debug(self):
+        with override_settings(OPENAPI_SCHEMA_FILE=None):
+            self.assertEqual(self.client.get('/api/schema/').status_code, 503)
+            with override_settings(DEBUG=True):
+                response = self.client.get('/api/schema/', {'format': 'json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/api/reservation/', response.json()['paths'])
+
+
+class FullTextSearchTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='user', email='user@example.com', password='pass')
+        self.client.force_authenticate(self.user)
+        self.d17 = Building.objects.create(name="D17", address="Kawiory 21", department="Informatyka")
+        self.c2 = Building.objects.create(name="C2", address="Czarnowiejska 30", description="Laboratoria D17 obok")
+        self.room = Room.objects.create(building=self.d17, room_number="1.38", capacity=30)
+        Room.objects.create(building=self.d17, room_number="2.41", capacity=30)
+        Room.objects.create(building=self.c2, room_number="1.38", capacity=30)
+
+    def search(self, url, q):
+        return [row['id'] for row in self.client.get(url, {'q': q}).json()]
+
+    def test_rooms_match_every_word_as_prefix(self):
+        self.assertEqual(self.search('/api/rooms/', 'd17 1.3'), [self.room.id])
+        self.assertEqual(len(self.search('/api/rooms/', 'kawiory')), 2)
+        self.assertEqual(self.search('/api/rooms/', "1.38 ' & !"), self.search('/api/rooms/', '1.38'))
+
+    def test_buildings_are_ranked(self):
+        # The name outweighs a mention in another building's description.
+        self.assertEqual(self.search('/api/buildings/', 'd17'), [self.d17.id, self.c2.id])
+
+    def test_building_changes_reach_its_rooms(self):
+        self.d17.name = "D-17"
+        self.d17.save()
+        self.assertEqual(self.search('/api/rooms/', 'd17'), [])
+        self.assertEqual(len(self.search('/api/rooms/', 'd-17')), 2)
+
+    def test_fallback_without_postgres(self):
+        with patch('classroom_scheduler.filters.search_enabled', return_value=False):
+            self.assertEqual(self.search('/api/rooms/', 'd17 1.3'), [self.room.id])
+
+
+class AutocompleteTest(APITestCase):
+    def setUp(self):
+        self.d17 = Building.objects.create(name="D17", address="Kawiory 21")
+        self.lab = Building.objects.create(name="Laboratorium Łódź", address="Piotrkowska 1")
+        self.room = Room.objects.create(building=self.d17, room_number="1.38", capacity=30)
+        Room.objects.create(building=self.d17, room_number="2.41", capacity=30)
+
+    def complete(self, q, **params):
+        return [(row['type'], row['id']) for row in self.client.get('/api/autocomplete/', {'q': q, **params}).json()]
+
+    def test_prefixes_and_typos(self):
+        self.assertEqual(self.complete('d17 1.3'), [('room', self.room.id)])
+        self.assertEqual(self.complete('labratorium lodz'), [('building', self.lab.id)])
+        self.assertEqual(self.complete('d1')[0], ('building', self.d17.id))
+        self.assertEqual(self.complete('xyz'), [])
+        self.assertEqual(len(self.complete('d17', limit=1)), 1)
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.complete('d17 1.3'), [('room', self.room.id)])
+        self.room.delete()
+        self.assertEqual(self.complete('d17 1.3'), [])
+
+        self.lab.name = "Biblioteka"
+        self.lab.save()
+        self.assertEqual(self.complete('biblio'), [('building', self.lab.id)])
+        with self.assertNumQueries(0):
+            self.complete('biblio')
+
+    def test_other_workers_are_told_on_commit(self):
+        generation = cache.get(INDEX_GENERATION_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lab.save()
+            self.assertEqual(cache.get(INDEX_GENERATION_KEY, 0), generation)
+        self.assertEqual(cache.get(INDEX_GENERATION_KEY, 0), generation + 1)
+
+    def test_response_is_id_and_label(self):
+        response = self.client.get('/api/autocomplete/', {'q': '2.41'})
+        self.assertEqual(response.json()[0]['label'], '2.41, D17')
+        self.assertEqual(self.client.get('/api/autocomplete/', {'q': 'd', 'limit': 'x'}).status_code, 400)
+
+
+class EquipmentAttributeTest(APITestCase):
+    def setUp(self):
+        EquipmentAttribute.objects.create(key='computers', type=EquipmentAttribute.Type.INTEGER)
+        EquipmentAttribute.objects.create(key='projector', type=EquipmentAttribute.Type.BOOLEAN)
+        EquipmentAttribute.objects.create(key='programs', type=EquipmentAttribute.Type.LIST)
+        self.building = Building.objects.create(name="D17", address="Kawiory 21")
+
+    def test_details_are_stored_with_their_type(self):
+        response = self.client.post('/api/equipment/', {
+            'details': {'computers': '30', 'projector': 'yes', 'programs': 'linux, matlab', 'colour': 'blue'}
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Equipment.objects.get().details,
+                         {'computers': 30, 'projector': True, 'programs': ['linux', 'matlab'], 'colour': 'blue'})
+
+        response = self.client.post('/api/equipment/', {'details': {'computers': '2.5', 'projector': 'maybe'}},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['details']), {'computers', 'projector'})
+
+    def test_filter_values_follow_the_registry(self):
+        room = Room.objects.create(building=self.building, room_number="1.38", capacity=30,
+                                   equipment=Equipment.objects.create(details={'computers': 30, 'projector': True}))
+        Room.objects.create(building=self.building, room_number="2.41", capacity=30,
+                            equipment=Equipment.objects.create(details={'computers': 12, 'projector': False}))
+
+        def rooms(**params):
+            return [row['id'] for row in self.client.get('/api/rooms/', params).json()]
+
+        self.assertEqual(rooms(computers__gte='20', projector='true'), [room.id])
+        self.assertEqual(rooms(projector='1', computers='30'), [room.id])
+        self.assertEqual(self.client.get('/api/rooms/', {'computers__gte': 'many'}).status_code, 400)
+
+    def test_registry_follows_changes(self):
+        self.assertEqual(get_attribute_registry().types['computers'], 'integer')
+        EquipmentAttribute.objects.filter(key='computers').get().delete()
+        self.assertNotIn('computers', get_attribute_registry().types)
+        with self.assertNumQueries(0):
+            get_attribute_registry()
+
+    def test_other_workers_are_told_on_commit(self):
+        generation = cache.get(REGISTRY_GENERATION_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            EquipmentAttribute.objects.create(key='seats', type=EquipmentAttribute.Type.INTEGER)
+            self.assertEqual(cache.get(REGISTRY_GENERATION_KEY, 0), generation)
+        self.assertEqual(cache.get(REGISTRY_GENERATION_KEY, 0), generation + 1)
+
+    def test_normalizing_refreshes_room_matrix(self):
+        equipment = Equipment.objects.create(details={})
+        Equipment.objects.filter(pk=equipment.pk).update(details={'projector': 'no', 'computers': '0'})
+        room = Room.objects.create(building=self.building, room_number="1.38", capacity=30, equipment=equipment)
+
+        def with_projector():
+            return [room_id for _, room_id in get_room_matrix().rank(10, required_equipment=['projector'])]
+
+        self.assertEqual(with_projector(), [room.id])
+        normalize_equipment_details()
+        self.assertEqual(Equipment.objects.get().details, {'projector': False, 'computers': 0})
+        self.assertEqual(with_projector(), [])
+
+    # SQLite cannot alter its schema inside the test case's transaction.
+    @skipUnless(connection.vendor == 'postgresql', 'Needs transactional DDL.')
+    def test_indexes_of_numeric_and_boolean_keys(self):
+        created, dropped = sync_attribute_indexes()
+        self.assertEqual(created, [f'{INDEX_PREFIX}computers', f'{INDEX_PREFIX}projector'])
+        self.assertEqual(dropped, [])
+
+        EquipmentAttribute.objects.filter(key='projector').delete()
+        self.assertEqual(sync_attribute_indexes(), ([], [f'{INDEX_PREFIX}projector']))
+        with connection.cursor() as cursor:
+            names = connection.introspection.get_constraints(cursor, Equipment._meta.db_table)
+        self.assertIn(f'{INDEX_PREFIX}computers', names)
+        self.assertNotIn(f'{INDEX_PREFIX}projector', names)
+
 
 class RoomAvailableAPITest(APITestCase):
     def setUp(self):
@@ -510,3 +905,948 @@ class RoomAvailableAPITest(APITestCase):
         self.assertIn(self.room_matching.id, room_ids)
         self.assertNotIn(self.room_non_matching.id, room_ids)
         self.assertNotIn(self.reserved_room.id, room_ids)
+
+
+class RoomSuggestAPITest(APITestCase):
+    def setUp(self):
+        self.students = CustomUser.objects.bulk_create([
+            CustomUser(username=f'student{i}', email=f'student{i}@example.com') for i in range(12)
+        ])
+        self.group = ClassGroup.objects.create(name="Lab group")
+        self.group.members.add(*self.students)
+
+        self.info = ReservationInfo.objects.create(user=self.students[0], group=self.group, description="Lab")
+
+        self.main_building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.other_building = Building.objects.create(name="C2", address="Czarnowiejska 50")
+
+        self.projector = Equipment.objects.create(details={"projector": True, "whiteboard": 1})
+        self.whiteboard_only = Equipment.objects.create(details={"projector": False, "whiteboard": 1})
+
+        self.too_small = Room.objects.create(building=self.main_building, equipment=self.projector, capacity=10, room_number="1.01")
+        self.snug = Room.objects.create(building=self.main_building, equipment=self.projector, capacity=14, room_number="1.02")
+        self.snug_other_building = Room.objects.create(building=self.other_building, equipment=self.projector, capacity=13, room_number="2.01")
+        self.no_projector = Room.objects.create(building=self.main_building, equipment=self.whiteboard_only, capacity=12, room_number="1.03")
+        self.taken = Room.objects.create(building=self.main_building, equipment=self.projector, capacity=12, room_number="1.04")
+        self.hall = Room.objects.create(building=self.main_building, equipment=self.projector, capacity=300, room_number="0.01")
+
+        Reservation.objects.create(
+            room=self.taken,
+            date_time=make_aware(datetime(2025, 6, 17, 10, 0)),
+            reservation_info=self.info
+        )
+        self.url = '/api/rooms/suggest/'
+        self.params = {
+            'group': self.group.id,
+            'start': '2025-06-17T09:00:00',
+            'end': '2025-06-17T12:00:00',
+            'equipment': 'projector',
+            'building': self.main_building.id,
+        }
+
+    def test_rooms_ranked_by_fit(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, 200)
+
+        room_ids = [suggestion['room']['id'] for suggestion in response.data]
+        self.assertEqual(room_ids, [self.snug.id, self.snug_other_building.id, self.hall.id])
+
+    def test_matrix_follows_room_changes(self):
+        self.client.get(self.url, self.params)
+        self.hall.capacity = 12
+        self.hall.save()
+
+        response = self.client.get(self.url, dict(self.params, limit=1))
+        self.assertEqual([suggestion['room']['id'] for suggestion in response.data], [self.hall.id])
+
+    def test_matrix_generation_bumped_on_commit(self):
+        generation = cache.get(MATRIX_GENERATION_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_room_matrix()
+            self.assertEqual(cache.get(MATRIX_GENERATION_KEY, 0), generation)
+        self.assertEqual(cache.get(MATRIX_GENERATION_KEY, 0), generation + 1)
+
+    def test_matrix_expires_without_invalidation(self):
+        self.client.get(self.url, self.params)
+        # Not signalled here, like a write through another worker with a per-process cache.
+        Room.objects.filter(pk=self.hall.pk).update(capacity=12)
+
+        response = self.client.get(self.url, dict(self.params, limit=1))
+        self.assertEqual([suggestion['room']['id'] for suggestion in response.data], [self.snug.id])
+        with override_settings(LOCAL_INDEX_MAX_AGE=0):
+            response = self.client.get(self.url, dict(self.params, limit=1))
+        self.assertEqual([suggestion['room']['id'] for suggestion in response.data], [self.hall.id])
+
+    def test_missing_window_rejected(self):
+        response = self.client.get(self.url, {'group': self.group.id})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReservationConfirmationRaceTest(APITransactionTestCase):
+    def setUp(self):
+        self.instructor = CustomUser.objects.create_user(username="instructor", email='instructor@example.com')
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.target_room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.group = ClassGroup.objects.create(name="Group A")
+        self.group.instructors.add(self.instructor)
+        info = ReservationInfo.objects.create(user=self.instructor, group=self.group, description="desc")
+
+        self.target_time = make_aware(datetime(2025, 6, 25, 10, 0))
+        self.change_requests = [
+            ReservationChangeRequest.objects.create(
+                reservation=Reservation.objects.create(
+                    room=Room.objects.create(building=building, room_number=f"0.0{i}", capacity=30),
+                    date_time=make_aware(datetime(2025, 6, 20, 10, 0)),
+                    reservation_info=info
+                ),
+                requested_by=self.instructor,
+                instructor=self.instructor,
+                proposed_room=self.target_room,
+                proposed_date_time=self.target_time
+            )
+            for i in range(2)
+        ]
+
+        uid = urlsafe_base64_encode(force_bytes(self.instructor.pk))
+        token = default_token_generator.make_token(self.instructor)
+        self.url = lambda change_request: f'/api/reservation_update_confirmation/{uid}/{token}/{change_request.id}/'
+
+    # SQLite ignores select_for_update, and its in-memory test database is not shared between threads.
+    @skipUnless(connection.vendor == 'postgresql', 'Row locks need PostgreSQL.')
+    def test_racing_confirmations_for_same_slot(self):
+        barrier = threading.Barrier(len(self.change_requests))
+        statuses = []
+
+        def confirm(change_request):
+            try:
+                barrier.wait()
+                statuses.append(APIClient().get(self.url(change_request)).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=confirm, args=(change_request,)) for change_request in self.change_requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [200, 409])
+        self.assertEqual(Reservation.objects.filter(room=self.target_room, date_time=self.target_time).count(), 1)
+
+
+class BulkReservationTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="student", email='student@example.com')
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.info = ReservationInfo.objects.create(user=self.user, description="desc")
+        self.date_times = [make_aware(datetime(2025, 6, 20, hour, 0)) for hour in (8, 12)]
+
+    def test_slot_booked_after_validation_is_rejected(self):
+        serializer = BulkReservationSerializer(data={
+            'room_id': self.room.id, 'reservation_info_id': self.info.id,
+            'date_times': [dt.isoformat() for dt in self.date_times],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        Reservation.objects.create(room=self.room, date_time=self.date_times[1], reservation_info=self.info)
+
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), 1)
+
+    def test_overlapping_slots_are_rejected(self):
+        Reservation.objects.create(
+            room=self.room, date_time=make_aware(datetime(2025, 6, 20, 10, 0)), reservation_info=self.info
+        )
+
+        def valid(*hours_minutes):
+            return BulkReservationSerializer(data={
+                'room_id': self.room.id, 'reservation_info_id': self.info.id,
+                'date_times': [make_aware(datetime(2025, 6, 20, *hm)).isoformat() for hm in hours_minutes],
+            }).is_valid()
+
+        self.assertFalse(valid((11, 0)))
+        self.assertFalse(valid((8, 45)))
+        self.assertTrue(valid((11, 30), (8, 30)))
+        self.assertFalse(valid((13, 0), (14, 0)))
+
+        window = (make_aware(datetime(2025, 6, 20, 11, 0)), make_aware(datetime(2025, 6, 20, 12, 0)))
+        self.assertEqual(list(reserved_room_ids(*window)), [self.room.id])
+
+
+class ReservationChangeRequestInboxTest(APITestCase):
+    def setUp(self):
+        self.instructor = CustomUser.objects.create_user(username="instructor", email='instructor@example.com')
+        self.representative = CustomUser.objects.create_user(username="rep", email='rep@example.com')
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.other_room = Room.objects.create(building=building, room_number="1.40", capacity=30)
+
+        group = ClassGroup.objects.create(name="Group A")
+        group.instructors.add(self.instructor)
+        group.class_representatives.add(self.representative)
+        info = ReservationInfo.objects.create(user=self.representative, group=group, description="desc")
+
+        self.reservations = [
+            Reservation.objects.create(
+                room=self.room,
+                date_time=make_aware(datetime(2025, 6, 20 + i, 10, 0)),
+                reservation_info=info
+            )
+            for i in range(3)
+        ]
+        self.list_url = reverse('home_module:reservationchangerequest-list')
+        self.approve_url = reverse('home_module:reservationchangerequest-approve')
+        self.reject_url = reverse('home_module:reservationchangerequest-reject')
+
+    def propose(self, reservation, room):
+        self.client.force_authenticate(self.representative)
+        response = self.client.patch(
+            f'/api/reservation/{reservation.id}/',
+            {"proposed_room_id": room.id},
+            format="json"
+        )
+        self.assertEqual(response.status_code, 202)
+        return response.data['change_request_id']
+
+    def test_representative_proposals_queue_up(self):
+        first = self.propose(self.reservations[0], self.other_room)
+        second = self.propose(self.reservations[0], self.room)
+
+        self.client.force_authenticate(self.instructor)
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([change_request['id'] for change_request in response.data], [first, second])
+
+    def test_batch_approve_and_reject(self):
+        ids = [self.propose(reservation, self.other_room) for reservation in self.reservations]
+
+        self.client.force_authenticate(self.instructor)
+        response = self.client.post(self.approve_url, {"ids": ids[:2]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['decided_ids'], ids[:2])
+
+        response = self.client.post(self.reject_url, {"ids": ids[2:]}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(Reservation.objects.filter(room=self.other_room).count(), 2)
+        self.assertEqual(
+            ReservationChangeRequest.objects.get(id=ids[2]).status,
+            ReservationChangeRequest.Status.REJECTED
+        )
+        self.assertEqual(self.client.get(self.list_url).data, [])
+
+    def test_batch_approve_is_all_or_nothing(self):
+        ids = [self.propose(reservation, self.other_room) for reservation in self.reservations[:2]]
+        Reservation.objects.create(
+            room=self.other_room,
+            date_time=self.reservations[1].date_time,
+            reservation_info=self.reservations[1].reservation_info
+        )
+
+        self.client.force_authenticate(self.instructor)
+        response = self.client.post(self.approve_url, {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicting_ids'], [ids[1]])
+
+        self.reservations[0].refresh_from_db()
+        self.assertEqual(self.reservations[0].room, self.room)
+        self.assertEqual(
+            ReservationChangeRequest.objects.filter(status=ReservationChangeRequest.Status.PENDING).count(), 2
+        )
+
+
+    def test_deleted_reservations_and_rooms(self):
+        ids = [self.propose(reservation, self.other_room) for reservation in self.reservations]
+        self.reservations[0].delete()
+        self.assertEqual(
+            ReservationChangeRequest.objects.get(id=ids[0]).status, ReservationChangeRequest.Status.REJECTED
+        )
+
+        self.client.force_authenticate(self.instructor)
+        self.other_room.delete()
+        response = self.client.post(self.approve_url, {"ids": ids[1:2]}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicting_ids'], [ids[1]])
+
+        self.room.delete()
+        self.assertEqual(self.client.get(self.list_url).data, [])
+        response = self.client.post(self.approve_url, {"ids": ids[1:]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['skipped_ids'], ids[1:])
+
+
+class ReservationEventStreamTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="instructor", email='instructor@example.com')
+        self.building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.other_building = Building.objects.create(name="C2", address="Czarnowiejska 50")
+        self.room = Room.objects.create(building=self.building, room_number="1.38", capacity=30)
+        self.other_room = Room.objects.create(building=self.other_building, room_number="2.01", capacity=30)
+        self.info = ReservationInfo.objects.create(user=self.user, description="desc")
+        self.auth = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+
+    def book(self, room, day):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reservation.objects.create(
+                room=room,
+                date_time=make_aware(datetime(2025, 6, day, 10, 0)),
+                reservation_info=self.info
+            )
+
+    def move(self, reservation, room):
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.room = room
+            reservation.save()
+
+    async def read_event(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), timeout=2)
+        event_line, data_line = chunk.decode().strip().split('\n')
+        return event_line.removeprefix('event: '), json.loads(data_line.removeprefix('data: '))
+
+    async def test_stream_filters_by_building(self):
+        response = await self.async_client.get(
+            '/api/events/reservations/', {'building': self.building.id}, headers=self.auth
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        await sync_to_async(self.book)(self.other_room, 20)
+        reservation = await sync_to_async(self.book)(self.room, 21)
+
+        name, event = await self.read_event(stream)
+        self.assertEqual(name, 'reservation.created')
+        self.assertEqual(event['reservation_id'], reservation.id)
+
+        # Moving out of the building is still relevant to its subscribers: the slot became free.
+        await sync_to_async(self.move)(reservation, self.other_room)
+        name, event = await self.read_event(stream)
+        self.assertEqual(name, 'reservation.updated')
+        self.assertEqual((event['previous_room_id'], event['room_id']), (self.room.id, self.other_room.id))
+
+        await stream.aclose()
+        del stream, response
+        gc.collect()
+        await asyncio.sleep(0)
+        self.assertFalse(broker.has_subscribers)
+
+    async def test_stream_needs_a_token_and_is_capped(self):
+        response = await self.async_client.get('/api/events/reservations/')
+        self.assertEqual(response.status_code, 401)
+
+        with patch('classroom_scheduler.views.EVENT_STREAMS_PER_USER', 1):
+            first = await self.async_client.get('/api/events/reservations/', headers=self.auth)
+            self.assertEqual(first.status_code, 200)
+            second = await self.async_client.get('/api/events/reservations/', headers=self.auth)
+            self.assertEqual(second.status_code, 429)
+        del first
+        gc.collect()
+        self.assertFalse(broker.has_subscribers)
+
+
+class AsyncReadEndpointsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="student", email='student@example.com')
+        self.token = Token.objects.create(user=self.user)
+        group = ClassGroup.objects.create(name="Group A")
+        group.members.add(self.user)
+        group.class_representatives.add(self.user)
+
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        equipment = Equipment.objects.create(details={"projector": 1})
+        self.free_room = Room.objects.create(building=building, equipment=equipment, room_number="1.38", capacity=30)
+        self.booked_room = Room.objects.create(building=building, equipment=equipment, room_number="1.40", capacity=60)
+
+        info = ReservationInfo.objects.create(user=self.user, group=group, description="desc")
+        self.reservation = Reservation.objects.create(
+            room=self.booked_room,
+            date_time=make_aware(datetime(2025, 6, 17, 10, 0)),
+            reservation_info=info
+        )
+        other_info = ReservationInfo.objects.create(
+            user=CustomUser.objects.create_user(username="other", email='other@example.com'),
+            description="not mine"
+        )
+        Reservation.objects.create(room=self.free_room, date_time=make_aware(datetime(2025, 7, 1, 10, 0)), reservation_info=other_info)
+
+    async def test_room_list_matches_sync_filters(self):
+        response = await self.async_client.get('/api/async/rooms/', {'capacity__gte': 50})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room['id'] for room in response.json()], [self.booked_room.id])
+
+    async def test_available_rooms(self):
+        response = await self.async_client.get('/api/async/rooms/available/', {
+            'start': make_aware(datetime(2025, 6, 17, 9, 0)).isoformat(),
+            'end': make_aware(datetime(2025, 6, 17, 12, 0)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room['id'] for room in response.json()], [self.free_room.id])
+
+    async def test_reservation_list_requires_token(self):
+        response = await self.async_client.get('/api/async/reservation/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_reservation_list_shows_visible_reservations(self):
+        response = await self.async_client.get(
+            '/api/async/reservation/',
+            {'page_size': 10, 'expand': 'group'},
+            headers={'Authorization': f'Token {self.token.key}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Total-Count'], '1')
+        reservation = response.json()[0]
+        self.assertEqual(reservation['id'], self.reservation.id)
+        self.assertEqual(reservation['reservation_info']['group']['members'], [self.user.id])
+
+    async def test_building_list(self):
+        response = await self.async_client.get('/api/async/buildings/', {'search': 'Kawiory'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaRoutingTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="student", email='student@example.com')
+        self.client.force_authenticate(self.user)
+        self.building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=self.building, room_number="1.38", capacity=30)
+        self.router = ReplicaRouter()
+        cache.clear()
+
+    def test_reads_use_replica_only_when_enabled(self):
+        self.assertEqual(self.router.db_for_read(Room), 'default')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Room), 'replica_0')
+            self.assertEqual(self.router.db_for_write(Room), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica_0', 'replica_1'])
+    def test_one_replica_serves_a_block(self):
+        with replica_reads():
+            alias = self.router.db_for_read(Room)
+            self.assertIn(alias, ['replica_0', 'replica_1'])
+            for _ in range(20):
+                self.assertEqual(self.router.db_for_read(Room), alias)
+            with replica_reads():
+                self.assertEqual(self.router.db_for_read(Room), alias)
+        self.assertEqual(self.router.db_for_read(Room), 'default')
+
+    def test_write_pins_user_to_primary(self):
+        key = f'user:{self.user.pk}'
+        self.assertFalse(is_pinned_to_primary(key))
+
+        response = self.client.patch(f'/api/rooms/{self.room.id}/', {"capacity": 40}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(is_pinned_to_primary(key))
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.patch(f'/api/rooms/{self.room.id}/', {"capacity": -1}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(is_pinned_to_primary(f'user:{self.user.pk}'))
+
+
+class ReservationVisibilityTest(APITestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(username="owner", email='owner@example.com')
+        self.instructor = CustomUser.objects.create_user(username="instructor", email='instructor@example.com')
+        self.representative = CustomUser.objects.create_user(username="rep", email='rep@example.com')
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+
+        self.group = ClassGroup.objects.create(name="Group A")
+        self.info = ReservationInfo.objects.create(user=self.owner, group=self.group, description="desc")
+        self.reservation = Reservation.objects.create(
+            room=room, date_time=make_aware(datetime(2025, 6, 20, 10, 0)), reservation_info=self.info
+        )
+
+    def visible_ids(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/reservation/')
+        self.assertEqual(response.status_code, 200)
+        return [reservation['id'] for reservation in response.data]
+
+    def viewers(self):
+        return set(ReservationVisibility.objects.filter(reservation_info=self.info).values_list('user_id', flat=True))
+
+    def test_group_membership_changes_visibility(self):
+        self.assertEqual(self.visible_ids(self.instructor), [])
+
+        self.group.instructors.add(self.instructor)
+        self.representative.representative_of_groups.add(self.group)
+        self.assertEqual(self.viewers(), {self.owner.id, self.instructor.id, self.representative.id})
+        self.assertEqual(self.visible_ids(self.instructor), [self.reservation.id])
+        self.assertEqual(self.visible_ids(self.representative), [self.reservation.id])
+
+        self.group.instructors.remove(self.instructor)
+        self.representative.representative_of_groups.clear()
+        self.assertEqual(self.viewers(), {self.owner.id})
+        self.assertEqual(self.visible_ids(self.instructor), [])
+
+    def test_reassigning_or_deleting_group(self):
+        self.group.instructors.add(self.instructor)
+
+        self.info.group = None
+        self.info.save()
+        self.assertEqual(self.viewers(), {self.owner.id})
+
+        self.info.group = self.group
+        self.info.save()
+        self.assertEqual(self.viewers(), {self.owner.id, self.instructor.id})
+
+        self.group.delete()
+        self.assertEqual(self.viewers(), {self.owner.id})
+        self.assertEqual(self.visible_ids(self.owner), [self.reservation.id])
+
+
+class ClassGroupMembershipTest(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(username="admin", email='admin@example.com', password="pass")
+        self.client.force_authenticate(self.admin)
+        self.students = CustomUser.objects.bulk_create([
+            CustomUser(username=f"student{i}", email=f'student{i}@example.com') for i in range(50)
+        ])
+        self.group = ClassGroup.objects.create(name="Lecture")
+        self.group.members.add(self.students[0])
+        self.url = f'/api/class_groups/{self.group.id}/members/'
+
+    def member_ids(self):
+        return set(self.group.members.values_list('id', flat=True))
+
+    def test_add_members_in_constant_queries(self):
+        ids = [student.id for student in self.students]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url + 'add/', {"ids": ids}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['added'], 49)
+        self.assertEqual(self.member_ids(), set(ids))
+        self.assertLess(len(queries), 10)
+
+    def test_unknown_ids_are_rejected(self):
+        response = self.client.post(self.url + 'add/', {"ids": [self.students[1].id, 999999]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', str(response.data['ids']))
+        self.assertEqual(self.member_ids(), {self.students[0].id})
+
+    def test_remove_members(self):
+        response = self.client.post(self.url + 'remove/', {"ids": [self.students[0].id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['removed'], 1)
+        self.assertEqual(self.member_ids(), set())
+
+    def test_import_roster(self):
+        roster = "Name,Email\nA,STUDENT1@example.com\nB,student2@example.com\n"
+        response = self.client.post(self.url + 'import/', {
+            "file": SimpleUploadedFile("roster.csv", roster.encode(), content_type='text/csv'),
+            "replace": True,
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"added": 2, "removed": 1})
+        self.assertEqual(self.member_ids(), {self.students[1].id, self.students[2].id})
+
+    def test_import_roster_with_unknown_user(self):
+        roster = "username\nstudent1\nnobody\n"
+        response = self.client.post(self.url + 'import/', {
+            "file": SimpleUploadedFile("roster.csv", roster.encode(), content_type='text/csv'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['unknown_users'], ['nobody'])
+        self.assertEqual(self.member_ids(), {self.students[0].id})
+
+    def test_only_instructors_and_staff_edit_rosters(self):
+        instructor, student = self.students[48], self.students[49]
+        self.group.instructors.add(instructor)
+        payload = {"ids": [self.students[1].id]}
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post(self.url + 'add/', payload, format='json').status_code, 401)
+        self.client.force_authenticate(student)
+        self.assertEqual(self.client.post(self.url + 'add/', payload, format='json').status_code, 403)
+        self.assertEqual(self.client.post(self.url + 'remove/', payload, format='json').status_code, 403)
+        self.client.force_authenticate(instructor)
+        self.assertEqual(self.client.post(self.url + 'add/', payload, format='json').status_code, 200)
+
+
+class CompactClassGroupTest(APITestCase):
+    def setUp(self):
+        self.instructor = CustomUser.objects.create_user(username="instructor", email='instructor@example.com')
+        self.students = CustomUser.objects.bulk_create([
+            CustomUser(username=f"student{i}", email=f'student{i}@example.com') for i in range(30)
+        ])
+        self.client.force_authenticate(self.instructor)
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+
+        self.group = ClassGroup.objects.create(name="Lecture")
+        self.group.members.add(*self.students)
+        self.group.instructors.add(self.instructor)
+        info = ReservationInfo.objects.create(user=self.instructor, group=self.group, description="desc")
+        for day in range(5):
+            Reservation.objects.create(
+                room=room, date_time=make_aware(datetime(2025, 6, 20 + day, 10, 0)), reservation_info=info
+            )
+
+    def test_reservations_embed_group_counts(self):
+        response = self.client.get('/api/reservation/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(response.data[0]['reservation_info']['group'], {
+            'id': self.group.id, 'name': "Lecture", 'member_count': 30, 'instructor_count': 1
+        })
+
+    def test_expand_group_embeds_membership(self):
+        response = self.client.get('/api/reservation/', {'expand': 'group'})
+        self.assertEqual(response.status_code, 200)
+        group = response.data[0]['reservation_info']['group']
+        self.assertEqual(sorted(group['members']), sorted(student.id for student in self.students))
+        self.assertEqual(group['instructors'], [self.instructor.id])
+
+    def test_group_list_is_compact_and_detail_is_full(self):
+        response = self.client.get('/api/class_groups/')
+        self.assertEqual(response.data[0]['member_count'], 30)
+        self.assertNotIn('members', response.data[0])
+
+        response = self.client.get(f'/api/class_groups/{self.group.id}/')
+        self.assertEqual(len(response.data['members']), 30)
+
+
+class GroupFreeSlotsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="user", email='user@example.com')
+        self.instructor = CustomUser.objects.create_user(username="instructor", email='instructor@example.com')
+        self.student = CustomUser.objects.create_user(username="student", email='student@example.com')
+        self.client.force_authenticate(self.user)
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+
+        self.group = ClassGroup.objects.create(name="Group A")
+        self.group.members.add(self.student, *CustomUser.objects.bulk_create([
+            CustomUser(username=f"classmate{i}", email=f'classmate{i}@example.com') for i in range(20)
+        ]))
+        self.group.instructors.add(self.instructor)
+
+        # The student's other group and the instructor's other group each block a slot.
+        other_members = ClassGroup.objects.create(name="Group B")
+        other_members.members.add(self.student)
+        other_taught = ClassGroup.objects.create(name="Group C")
+        other_taught.instructors.add(self.instructor)
+        unrelated = ClassGroup.objects.create(name="Group D")
+        for group, hour in [(other_members, 8), (other_taught, 9), (unrelated, 11)]:
+            info = ReservationInfo.objects.create(user=self.user, group=group, description=group.name)
+            Reservation.objects.create(
+                room=Room.objects.create(building=building, room_number=f"2.{hour}", capacity=10),
+                date_time=make_aware(datetime(2025, 6, 2, hour, 0)),
+                reservation_info=info
+            )
+        # The only suitable room is taken at 11:00.
+        Reservation.objects.create(room=self.room, date_time=make_aware(datetime(2025, 6, 2, 11, 0)), reservation_info=info)
+
+    def test_earliest_common_windows(self):
+        response = self.client.get(f'/api/class_groups/{self.group.id}/free-slots/', {
+            'start': '2025-06-02T08:00:00+02:00',
+            'end': '2025-06-02T20:00:00+02:00',
+            'duration': 60,
+            'limit': 3,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Search-Complete'], 'true')
+        # Busy until 10:30 through Group C, and the room is booked 11:00-12:30.
+        self.assertEqual(
+            [(slot['start'], slot['room']['id']) for slot in response.data],
+            [('2025-06-02T12:30:00+02:00', self.room.id),
+             ('2025-06-02T12:45:00+02:00', self.room.id),
+             ('2025-06-02T13:00:00+02:00', self.room.id)]
+        )
+
+    def test_requires_range(self):
+        response = self.client.get(f'/api/class_groups/{self.group.id}/free-slots/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_naive_range_is_local_time(self):
+        response = self.client.get(f'/api/class_groups/{self.group.id}/free-slots/', {
+            'start': '2025-06-02T08:00:00', 'end': '2025-06-02T20:00:00', 'duration': 60, 'limit': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['start'], '2025-06-02T12:30:00+02:00')
+
+
+class CalendarFeedTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="student", email='student@example.com')
+        self.client.force_authenticate(self.user)
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.group = ClassGroup.objects.create(name="Algebra, group 1")
+        self.group.members.add(self.user)
+        self.info = ReservationInfo.objects.create(user=self.user, group=self.group, description="Lecture")
+        self.reservation = Reservation.objects.create(
+            room=self.room, date_time=timezone.now() + timedelta(days=1), reservation_info=self.info
+        )
+
+    def subscribe(self, **data):
+        response = self.client.post('/api/calendar-feeds/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['url']
+
+    def fetch(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        body = b''.join(response.streaming_content).decode() if response.streaming else ''
+        return response, body
+
+    def test_feed_streams_events_and_answers_304(self):
+        url = self.subscribe(kind='room', room_id=self.room.id)
+        response, body = self.fetch(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertIn(f'UID:reservation-{self.reservation.id}@bruker', body)
+        self.assertIn('SUMMARY:Algebra\\, group 1', body)
+
+        etag = response['ETag']
+        response, _ = self.fetch(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Reservation.objects.create(room=self.room, date_time=timezone.now() + timedelta(days=2), reservation_info=self.info)
+        response, body = self.fetch(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+
+    def test_personal_feed_follows_visibility(self):
+        url = self.subscribe(kind='user')
+        etag = self.fetch(url)[0]['ETag']
+
+        other = CustomUser.objects.create_user(username="other", email='other@example.com')
+        other_group = ClassGroup.objects.create(name="Physics")
+        ReservationInfo.objects.create(user=other, group=other_group, description="Lab")
+        self.assertEqual(self.fetch(url, if_none_match=etag)[0].status_code, 304)
+
+        other_group.class_representatives.add(self.user)
+        self.assertEqual(self.fetch(url, if_none_match=etag)[0].status_code, 200)
+
+    def test_group_feed_requires_membership(self):
+        other_group = ClassGroup.objects.create(name="Physics")
+        response = self.client.post('/api/calendar-feeds/', {'kind': 'group', 'group_id': other_group.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_token(self):
+        self.assertEqual(self.client.get('/api/calendar/nope.ics').status_code, 404)
+
+    def test_room_feed_hides_other_bookings(self):
+        other = CustomUser.objects.create_user(username="other", email='other@example.com')
+        Reservation.objects.create(
+            room=self.room, date_time=timezone.now() + timedelta(days=2),
+            reservation_info=ReservationInfo.objects.create(user=other, description="Thesis defence")
+        )
+        body = self.fetch(self.subscribe(kind='room', room_id=self.room.id))[1]
+        self.assertIn('SUMMARY:Algebra\\, group 1', body)
+        self.assertIn('SUMMARY:Busy', body)
+        self.assertNotIn('Thesis defence', body)
+
+    def test_group_feed_stops_after_leaving(self):
+        url = self.subscribe(kind='group', group_id=self.group.id)
+        self.assertEqual(self.fetch(url)[0].status_code, 200)
+        self.group.members.remove(self.user)
+        self.assertEqual(self.fetch(url)[0].status_code, 403)
+
+    def test_renames_move_the_version(self):
+        url = self.subscribe(kind='user')
+        etag = self.fetch(url)[0]['ETag']
+        self.room.building.name = "D-17"
+        self.room.building.save()
+        response, body = self.fetch(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('LOCATION:1.38\\, D-17', body)
+
+        self.group.name = "Algebra II"
+        self.group.save()
+        self.assertIn('SUMMARY:Algebra II', self.fetch(url, if_none_match=response['ETag'])[1])
+
+
+class IdempotencyKeyTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="student", email='student@example.com')
+        self.client.force_authenticate(self.user)
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.group = ClassGroup.objects.create(name="Group A")
+        self.payload = {
+            "room_id": self.room.id,
+            "date_time": "2025-06-20T10:00:00+02:00",
+            "reservation_info_data": {"user_id": self.user.id, "group_id": self.group.id, "description": "Lab"}
+        }
+
+    def post(self, payload, key):
+        return self.client.post('/api/reservation/', payload, format='json', headers={'Idempotency-Key': key})
+
+    def test_retry_returns_original_response(self):
+        first = self.post(self.payload, 'retry-1')
+        retry = self.post(self.payload, 'retry-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(ReservationInfo.objects.count(), 1)
+
+    def test_key_reused_for_other_request(self):
+        self.post(self.payload, 'retry-1')
+        response = self.post({**self.payload, "date_time": "2025-06-21T10:00:00+02:00"}, 'retry-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_expired_keys_are_purged_and_reusable(self):
+        self.post(self.payload, 'retry-1')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        call_command('purge_idempotency_keys', stdout=io.StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        response = self.post({**self.payload, "date_time": "2025-06-21T10:00:00+02:00"}, 'retry-1')
+        self.assertEqual(response.status_code, 201)
+
+    def test_abandoned_claim_is_taken_over(self):
+        request = SimpleNamespace(method='POST', path='/api/reservation/', data=self.payload)
+        record = IdempotencyKey.objects.create(user=self.user, key='retry-1', request_hash=request_fingerprint(request))
+        self.assertEqual(self.post(self.payload, 'retry-1').status_code, 409)
+
+        # The worker holding the claim died without storing a response.
+        IdempotencyKey.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(minutes=10))
+        response = self.post(self.payload, 'retry-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+        self.assertEqual(self.post(self.payload, 'retry-1')['Idempotent-Replayed'], 'true')
+
+
+class ReservationChangeFeedTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="student", email='student@example.com')
+        self.other = CustomUser.objects.create_user(username="other", email='other@example.com')
+        self.client.force_authenticate(self.user)
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.info = ReservationInfo.objects.create(user=self.user, description="mine")
+        self.other_info = ReservationInfo.objects.create(user=self.other, description="theirs")
+        self.first = self.reserve(self.info, 10)
+
+    def reserve(self, info, hour):
+        return Reservation.objects.create(
+            room=self.room, date_time=make_aware(datetime(2025, 6, 20, hour, 0)), reservation_info=info
+        )
+
+    def sync(self, since):
+        response = self.client.get('/api/reservation/changes/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_delta_sync(self):
+        version = int(self.client.get('/api/reservation/')['X-Change-Version'])
+        self.assertEqual(self.sync(version)['changes'], [])
+
+        second = self.reserve(self.info, 12)
+        self.reserve(self.other_info, 14)
+        self.first.date_time = make_aware(datetime(2025, 6, 20, 11, 0))
+        self.first.save()
+        second_id = second.id
+        second.delete()
+
+        data = self.sync(version)
+        self.assertFalse(data['resync'])
+        self.assertEqual(
+            [(change['action'], change['reservation_id']) for change in data['changes']],
+            [('updated', self.first.id), ('deleted', second_id)]
+        )
+        self.assertEqual(data['changes'][0]['reservation']['date_time'], '2025-06-20T11:00:00+02:00')
+        self.assertEqual(self.sync(data['version'])['changes'], [])
+
+    def test_visibility_change_requests_resync(self):
+        version = self.sync(0)['version']
+        group = ClassGroup.objects.create(name="Group A")
+        self.other_info.group = group
+        self.other_info.save()
+        self.reserve(self.other_info, 14)
+
+        group.instructors.add(self.user)
+        self.assertTrue(self.sync(version)['resync'])
+
+    def test_purged_log_requests_resync(self):
+        version = self.sync(0)['version']
+        self.reserve(self.info, 12)
+        self.reserve(self.info, 14)
+        head = self.sync(version)['version']
+
+        purge_changes(now=timezone.now() + timedelta(days=365))
+        self.assertEqual(ReservationChange.objects.count(), 1)
+        data = self.sync(version)
+        self.assertTrue(data['resync'])
+        self.assertEqual(data['version'], head)
+        self.assertFalse(self.sync(head)['resync'])
+
+
+class SoftDeleteTest(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(username="admin", email='admin@example.com', password="pass")
+        self.client.force_authenticate(self.admin)
+        building = Building.objects.create(name="D17", address="Kawiory 21")
+        self.room = Room.objects.create(building=building, room_number="1.38", capacity=30)
+        self.info = ReservationInfo.objects.create(user=self.admin, description="desc")
+        self.reservations = [
+            Reservation.objects.create(
+                room=self.room, date_time=make_aware(datetime(2025, 6, 20, hour, 0)), reservation_info=self.info
+            )
+            for hour in (8, 10, 12)
+        ]
+
+    def test_deleted_reservation_is_a_tombstone(self):
+        version = int(self.client.get('/api/reservation/')['X-Change-Version'])
+        response = self.client.delete(f'/api/reservation/{self.reservations[0].id}/')
+        self.assertEqual(response.status_code, 204)
+
+        self.assertFalse(Reservation.objects.filter(id=self.reservations[0].id).exists())
+        self.assertIsNotNone(Reservation.all_objects.get(id=self.reservations[0].id).deleted_at)
+        changes = self.client.get('/api/reservation/changes/', {'since': version}).data['changes']
+        self.assertEqual([(c['action'], c['reservation_id']) for c in changes], [('deleted', self.reservations[0].id)])
+
+    def test_room_delete_is_constant_and_purge_cascades(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/rooms/{self.room.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertLess(len(queries), 10)
+        self.assertFalse(Room.objects.filter(id=self.room.id).exists())
+        # Hidden right away, although only the purge tombstones them.
+        self.assertEqual(self.client.get('/api/reservation/').json(), [])
+        self.assertEqual(Reservation.all_objects.filter(deleted_at__isnull=True).count(), 3)
+
+        call_command('purge_deleted_records', stdout=io.StringIO())
+        self.assertEqual(Reservation.all_objects.filter(deleted_at__isnull=True).count(), 0)
+        self.assertEqual(Reservation.all_objects.count(), 3)
+
+        with self.settings(SOFT_DELETE_RETENTION_DAYS=0):
+            call_command('purge_deleted_records', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(Reservation.all_objects.count(), 0)
+        self.assertFalse(Room.all_objects.filter(id=self.room.id).exists())
+        # The reservation info is still alive and keeps its row.
+        self.assertTrue(ReservationInfo.objects.filter(id=self.info.id).exists())
+
+    def test_admin_room_delete_is_a_tombstone(self):
+        self.client.force_login(self.admin)
+        url = reverse('admin:classroom_scheduler_room_delete', args=[self.room.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'protected')
+        self.assertNotContains(response, 'Reservation for room')
+
+        response = self.client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Room.objects.filter(id=self.room.id).exists())
+        self.assertIsNotNone(Room.all_objects.get(id=self.room.id).deleted_at)
+
+        other = Room.objects.create(building=self.room.building, room_number="2.41", capacity=30)
+        response = self.client.post(reverse('admin:classroom_scheduler_room_changelist'), {
+            'action': 'delete_selected', '_selected_action': [other.id], 'post': 'yes'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNotNone(Room.all_objects.get(id=other.id).deleted_at)
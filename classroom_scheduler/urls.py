@@ -1,5 +1,5 @@
 from django.urls import path, include
-from . import views
+from . import async_views, views
 from rest_framework.routers import DefaultRouter
 
 app_name = 'home_module'
@@ -11,10 +11,19 @@ router.register('rooms', views.RoomViewSet)
 router.register('reservation-info', views.ReservationInfoViewSet)
 router.register('reservation', views.ReservationViewSet)
 router.register("class_groups", views.ClassGroupViewSet)
+router.register('reservation-change-requests', views.ReservationChangeRequestViewSet)
+router.register('calendar-feeds', views.CalendarFeedViewSet)
 urlpatterns = [
     path('', views.home, name='home page'),
+    path('api/events/reservations/', views.reservation_events, name='reservation_events'),
+    path('api/autocomplete/', views.autocomplete, name='autocomplete'),
+    path('api/calendar/<str:token>.ics', views.calendar_feed, name='calendar_feed'),
+    path('api/async/buildings/', async_views.building_list, name='async_building_list'),
+    path('api/async/rooms/', async_views.room_list, name='async_room_list'),
+    path('api/async/rooms/available/', async_views.room_available, name='async_room_available'),
+    path('api/async/reservation/', async_views.reservation_list, name='async_reservation_list'),
     path(
-        'api/reservation_update_confirmation/<uidb64>/<token>/<reservation_id>/',
+        'api/reservation_update_confirmation/<uidb64>/<token>/<change_request_id>/',
         views.ReservationUpdateConfirmationView.as_view(),
         name='reservation_update_confirmation'
     ),
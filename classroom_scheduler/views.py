@@ -1,49 +1,229 @@
+import asyncio
+import json
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from django.utils.encoding import force_str
-from django.utils.http import urlsafe_base64_decode
+from django.utils.http import http_date, urlsafe_base64_decode
+from django.utils.timezone import is_naive, make_aware
+from django.views.decorators.http import require_safe
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.views import APIView
 
-from .models import Building, Room, Equipment, Reservation, ReservationInfo, ClassGroup
+from .models import Building, CalendarFeed, Room, Equipment, Reservation, ReservationChangeRequest, ReservationInfo, \
+    ClassGroup
 from .serializers import BuildingSerializer, BulkReservationSerializer, RoomSerializer, EquipmentSerializer, ReservationInfoSerializer, \
-    ReservationSerializer, ClassGroupSerializer
-from .filters import DynamicJsonFilterBackend
-from rest_framework import viewsets, status
+    ReservationSerializer, ClassGroupSerializer, RoomSuggestionSerializer, ReservationChangeRequestSerializer, \
+    ChangeRequestDecisionSerializer, ClassGroupSummarySerializer, FreeSlotSerializer, GroupMembershipSerializer, \
+    RosterImportSerializer, CalendarFeedSerializer, ReservationChangeFeedSerializer, BulkReservationDeleteSerializer, \
+    BulkRescheduleSerializer
+from .autocomplete import get_autocomplete_index
+from .changes import changes_since, current_version
+from .events import broker
+from .feeds import can_follow_group, write_calendar
+from .filters import DynamicJsonFilterBackend, FullTextSearchFilter
+from .idempotency import idempotent
+from .permissions import IsGroupInstructorOrStaff
+from .queries import available_rooms, class_groups, reserved_room_ids, visible_reservation_infos, \
+    visible_reservations, with_reservation_details, with_reservation_info_details
+from .ranking import get_room_matrix
+from .roles import INSTRUCTOR, OWNER, REPRESENTATIVE, STAFF, request_roles, reservation_roles, with_roles
+from .slots import find_free_slots
+from .services import BulkRescheduleConflict, ChangeRequestConflict, ReservationConflict, add_group_members, \
+    decide_change_requests, is_slot_taken, lock_room, move_reservation, remove_group_members, replace_group_members, \
+    reschedule_reservations
+from rest_framework import mixins, viewsets, status
 from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiResponse
 from django.utils.dateparse import parse_datetime
+from bruker_backend.db_router import activate_replica_reads, deactivate_replica_reads, is_pinned_to_primary, \
+    pin_to_primary
+from bruker_backend.throttling import WriteThrottle
 from users.views import send_email
 
+SUGGESTION_LIMIT = 10
+SUGGESTION_MAX_LIMIT = 100
+FREE_SLOT_LIMIT = 10
+FREE_SLOT_MAX_LIMIT = 50
+FREE_SLOT_MAX_RANGE = timedelta(days=62)
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+EVENT_STREAM_KEEPALIVE = 15
+EVENT_STREAM_RETRY_MS = 5000
+EVENT_STREAMS_PER_USER = 5
 
 def home(request):
     return HttpResponse('Classroom scheduler home page')
 
 
-class BuildingViewSet(viewsets.ModelViewSet):
+@require_safe
+def autocomplete(request):
+    """
+    Rooms and buildings whose labels match `q` as prefixes or near misses, as id and label only.
+    A plain view over an in-memory index: it runs on every keystroke of the booking form.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer.'}, status=400)
+
+    matches = get_autocomplete_index().search(request.GET.get('q', ''), limit=max(limit, 1))
+    return JsonResponse([{'type': kind, 'id': pk, 'label': label} for kind, pk, label in matches], safe=False)
+
+
+@require_safe
+def calendar_feed(request, token):
+    """iCalendar feed behind a tokenised URL. Polling clients get a 304 until the feed's version moves."""
+    feed = get_object_or_404(CalendarFeed.objects.select_related('user', 'room__building', 'group'), token=token)
+    # Checked on every fetch: a subscriber who left the group must stop receiving it.
+    if feed.kind == CalendarFeed.Kind.GROUP and not can_follow_group(feed.user, feed.group_id):
+        return JsonResponse({'detail': 'You no longer belong to this group.'}, status=403)
+
+    # A room feed shows more to staff, so the owner's role is part of the content.
+    etag = f'"{feed.pk}-{feed.version}-{int(feed.user.is_staff)}"'
+    last_modified = int(feed.changed_at.timestamp())
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    if feed.kind == CalendarFeed.Kind.ROOM:
+        name = str(feed.room)
+    elif feed.kind == CalendarFeed.Kind.GROUP:
+        name = feed.group.name
+    else:
+        name = f"Reservations of {feed.user.username}"
+
+    response = StreamingHttpResponse(write_calendar(feed, name), content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _id_list(raw):
+    return [int(value) for value in raw.split(',') if value.strip()] if raw else []
+
+
+async def reservation_events(request):
+    """
+    Server-Sent Events stream of reservation create/update/delete events, optionally limited
+    to the comma separated `room` and `building` ids. Meant to be served under ASGI. Needs a
+    token, like the other async endpoints; a user holds at most EVENT_STREAMS_PER_USER streams
+    per worker process.
+    """
+    from .async_views import authenticate  # async_views imports this module
+
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    try:
+        room_ids = _id_list(request.GET.get('room'))
+        building_ids = _id_list(request.GET.get('building'))
+    except ValueError:
+        return JsonResponse({'error': 'room and building must be comma separated ids.'}, status=400)
+
+    subscription = broker.subscribe(
+        room_ids=room_ids, building_ids=building_ids, owner=user.pk, limit=EVENT_STREAMS_PER_USER
+    )
+    if subscription is None:
+        return JsonResponse({'detail': 'Too many open event streams.'}, status=429)
+
+    async def stream():
+        try:
+            yield f'retry: {EVENT_STREAM_RETRY_MS}\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=EVENT_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: reservation.{event['action']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def replica_pin_key(request, user=None):
+    user = user or getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR')}"
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests from a read replica, unless the requester made a successful write
+    recently; writes pin them to the primary so they always read their own changes.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(replica_pin_key(request)):
+            self._replica_token = activate_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            deactivate_replica_reads(token)
+            self._replica_token = None
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(replica_pin_key(request))
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def expansions(query_params):
+    return {name.strip() for name in query_params.get('expand', '').split(',') if name.strip()}
+
+
+class ExpandMixin:
+    """Pass the comma separated `?expand=` names to the serializers, which opt into larger representations."""
+
+    @property
+    def expand(self):
+        return expansions(self.request.query_params)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.expand
+        return context
+
+
+class BuildingViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Building.objects.all()
     serializer_class = BuildingSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter, SearchFilter]
     ordering_fields = ['name', 'address', 'department']
     search_fields = ['name', 'address', 'department', 'description']
+    full_text_fallback_fields = search_fields
 
 
-class EquipmentViewSet(viewsets.ModelViewSet):
+class EquipmentViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Equipment.objects.all()
     serializer_class = EquipmentSerializer
     filter_backends = [SearchFilter]
     search_fields = ['details']
 
 
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Room.objects.select_related('building', 'equipment').all()
     serializer_class = RoomSerializer
-    filter_backends = [DjangoFilterBackend, DynamicJsonFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, DynamicJsonFilterBackend, FullTextSearchFilter, SearchFilter, OrderingFilter]
     filterset_fields = {
         'capacity': ['exact', 'gte', 'lte'],
         'room_number': ['exact', 'icontains'],
@@ -51,6 +231,7 @@ class RoomViewSet(viewsets.ModelViewSet):
     }
 
     search_fields = ['room_number', 'building__name']
+    full_text_fallback_fields = ['room_number', 'building__name', 'building__department', 'building__address']
     ordering_fields = ['capacity', 'room_number', 'building__name']
 
     @extend_schema(
@@ -87,48 +268,291 @@ class RoomViewSet(viewsets.ModelViewSet):
         if not start_dt or not end_dt:
             return Response({'error': 'Incorrect date format. Use ISO 8601.'}, status=400)
 
-        overlapping_reservations = Reservation.objects.filter(
-            date_time__gte=start_dt,
-            date_time__lt=end_dt
-        ).values_list('room_id', flat=True)
-
-        available_rooms = Room.objects.exclude(id__in=overlapping_reservations)
+        rooms = available_rooms(start_dt, end_dt)
 
         django_filter = DjangoFilterBackend()
-        available_rooms = django_filter.filter_queryset(request, available_rooms, self)
+        rooms = django_filter.filter_queryset(request, rooms, self)
 
         dynamic_filter = DynamicJsonFilterBackend()
-        available_rooms = dynamic_filter.filter_queryset(request, available_rooms, self)
+        rooms = dynamic_filter.filter_queryset(request, rooms, self)
 
-        serializer = self.get_serializer(available_rooms, many=True)
+        serializer = self.get_serializer(rooms, many=True)
         return Response(serializer.data)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='group',
+                type=int,
+                location=OpenApiParameter.QUERY,
+                required=True,
+                description='Class group whose size the room has to fit.'
+            ),
+            OpenApiParameter(
+                name='start',
+                type=str,
+                location=OpenApiParameter.QUERY,
+                required=True,
+                description='Start datetime in ISO 8601 format.'
+            ),
+            OpenApiParameter(
+                name='end',
+                type=str,
+                location=OpenApiParameter.QUERY,
+                required=True,
+                description='End datetime in ISO 8601 format.'
+            ),
+            OpenApiParameter(
+                name='equipment',
+                type=str,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description='Comma separated equipment keys the room must provide.'
+            ),
+            OpenApiParameter(
+                name='building',
+                type=int,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description='Preferred building id.'
+            ),
+            OpenApiParameter(
+                name='limit',
+                type=int,
+                location=OpenApiParameter.QUERY,
+                required=False,
+                description=f'Maximum number of suggestions (default {SUGGESTION_LIMIT}, max {SUGGESTION_MAX_LIMIT}).'
+            ),
+        ],
+        responses={200: RoomSuggestionSerializer(many=True)},
+        description='Get free rooms between start and end ordered by how well they fit the group.'
+    )
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        start_dt = parse_datetime(request.query_params.get('start', ''))
+        end_dt = parse_datetime(request.query_params.get('end', ''))
+
+        if not start_dt or not end_dt:
+            return Response({'error': 'Enter start and end params (ISO 8601).'}, status=400)
+
+        try:
+            group_id = int(request.query_params['group'])
+            building_id = request.query_params.get('building')
+            building_id = int(building_id) if building_id else None
+            limit = int(request.query_params.get('limit', SUGGESTION_LIMIT))
+        except (KeyError, ValueError):
+            return Response({'error': 'group, building and limit params must be integers.'}, status=400)
+
+        limit = min(max(limit, 1), SUGGESTION_MAX_LIMIT)
+        required_equipment = [
+            key.strip() for key in request.query_params.get('equipment', '').split(',') if key.strip()
+        ]
+
+        group = get_object_or_404(ClassGroup.objects.annotate(member_count=Count('members')), pk=group_id)
+
+        ranked = get_room_matrix().rank(
+            group_size=group.member_count,
+            excluded_room_ids=reserved_room_ids(start_dt, end_dt),
+            required_equipment=required_equipment,
+            preferred_building_id=building_id,
+            limit=limit,
+        )
 
-class ReservationInfoViewSet(viewsets.ModelViewSet):
+        rooms = Room.objects.select_related('building', 'equipment').in_bulk([room_id for _, room_id in ranked])
+        suggestions = [
+            {'room': rooms[room_id], 'fit_score': round(score, 4)}
+            for score, room_id in ranked if room_id in rooms
+        ]
+        return Response(RoomSuggestionSerializer(suggestions, many=True).data)
+
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name='Idempotency-Key',
+    type=str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description=(
+        "Client-chosen unique key. Retries with the same key and body return the stored response "
+        "(marked Idempotent-Replayed: true) instead of creating reservations again."
+    )
+)
+
+EXPAND_GROUP_PARAMETER = OpenApiParameter(
+    name='expand',
+    type=str,
+    location=OpenApiParameter.QUERY,
+    required=False,
+    description="'group' embeds full group membership instead of member/instructor counts."
+)
+
+
+@extend_schema_view(list=extend_schema(parameters=[EXPAND_GROUP_PARAMETER]),
+                    retrieve=extend_schema(parameters=[EXPAND_GROUP_PARAMETER]))
+class ReservationInfoViewSet(ExpandMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = ReservationInfoSerializer
     queryset = ReservationInfo.objects.none()
 
     def get_queryset(self):
-        user = self.request.user
+        return with_reservation_info_details(
+            visible_reservation_infos(self.request.user), expand_group='group' in self.expand
+        )
+
+
+@extend_schema_view(list=extend_schema(
+    parameters=[OpenApiParameter(
+        name='expand',
+        type=str,
+        location=OpenApiParameter.QUERY,
+        required=False,
+        description="'members' lists full membership instead of member/instructor counts."
+    )]
+))
+class ClassGroupViewSet(ExpandMixin, ReplicaReadMixin, viewsets.ModelViewSet):
+    serializer_class = ClassGroupSerializer
+    queryset = ClassGroup.objects.none()
+
+    def list_members(self):
+        return self.action in ['retrieve', 'create', 'update', 'partial_update'] or 'members' in self.expand
+
+    def get_serializer_class(self):
+        return ClassGroupSerializer if self.list_members() else ClassGroupSummarySerializer
+
+    def get_queryset(self):
+        if self.action in ['add_members', 'remove_members', 'import_roster']:
+            return ClassGroup.objects.all()
+        if self.action == 'free_slots':
+            return class_groups()
+        if self.list_members():
+            return ClassGroup.objects.prefetch_related('members', 'class_representatives', 'instructors')
+        return class_groups()
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='start', type=str, location=OpenApiParameter.QUERY, required=True,
+                             description="Search from (ISO 8601)."),
+            OpenApiParameter(name='end', type=str, location=OpenApiParameter.QUERY, required=True,
+                             description="Search until (ISO 8601)."),
+            OpenApiParameter(name='duration', type=int, location=OpenApiParameter.QUERY, required=False,
+                             description="Window length in minutes. Defaults to one reservation slot."),
+            OpenApiParameter(name='limit', type=int, location=OpenApiParameter.QUERY, required=False,
+                             description=f"Number of windows. Defaults to {FREE_SLOT_LIMIT}, at most {FREE_SLOT_MAX_LIMIT}."),
+            OpenApiParameter(name='building', type=int, location=OpenApiParameter.QUERY, required=False,
+                             description="Preferred building ID."),
+            OpenApiParameter(name='equipment', type=str, location=OpenApiParameter.QUERY, required=False,
+                             description="Comma separated equipment keys the room must have."),
+        ],
+        responses={200: FreeSlotSerializer(many=True)},
+        description=(
+            "Earliest windows in which the group, its instructors and every group sharing its members "
+            "are free, each with the best fitting free room. The X-Search-Complete header is false "
+            "when the search stopped at its time budget before covering the whole range."
+        )
+    )
+    @action(detail=True, methods=['get'], url_path='free-slots')
+    def free_slots(self, request, pk=None):
+        start_dt = parse_datetime(request.query_params.get('start', ''))
+        end_dt = parse_datetime(request.query_params.get('end', ''))
 
-        if user.is_staff:
-            return ReservationInfo.objects.all()
+        if not start_dt or not end_dt:
+            return Response({'error': 'Enter start and end params (ISO 8601).'}, status=400)
+        # Without an offset the times are local, as the other endpoints read them.
+        start_dt, end_dt = (make_aware(value) if is_naive(value) else value for value in (start_dt, end_dt))
+        if end_dt - start_dt > FREE_SLOT_MAX_RANGE:
+            return Response({'error': f'The range can span at most {FREE_SLOT_MAX_RANGE.days} days.'}, status=400)
 
-        return ReservationInfo.objects.filter(
-            Q(user=user) |
-            Q(group__class_representatives=user) |
-            Q(group__instructors=user)
-        ).distinct()
+        try:
+            building_id = request.query_params.get('building')
+            building_id = int(building_id) if building_id else None
+            limit = int(request.query_params.get('limit', FREE_SLOT_LIMIT))
+            duration = request.query_params.get('duration')
+            length = timedelta(minutes=int(duration)) if duration else None
+        except ValueError:
+            return Response({'error': 'building, limit and duration params must be integers.'}, status=400)
+        if length is not None and length <= timedelta(0):
+            return Response({'error': 'duration must be positive.'}, status=400)
+
+        group = self.get_object()
+        windows, complete = find_free_slots(
+            group,
+            start_dt,
+            end_dt,
+            group_size=group.member_count,
+            length=length,
+            limit=min(max(limit, 1), FREE_SLOT_MAX_LIMIT),
+            required_equipment=[
+                key.strip() for key in request.query_params.get('equipment', '').split(',') if key.strip()
+            ],
+            preferred_building_id=building_id,
+        )
 
+        rooms = Room.objects.select_related('building', 'equipment').in_bulk({room_id for _, _, room_id in windows})
+        response = Response(FreeSlotSerializer(
+            [{'start': start, 'end': end, 'room': rooms[room_id]} for start, end, room_id in windows if room_id in rooms],
+            many=True
+        ).data)
+        response['X-Search-Complete'] = 'true' if complete else 'false'
+        return response
 
-class ClassGroupViewSet(viewsets.ModelViewSet):
-    serializer_class = ClassGroupSerializer
-    queryset = ClassGroup.objects.all()
+    @extend_schema(
+        request=GroupMembershipSerializer,
+        responses={200: OpenApiResponse(description="Number of users added; existing members are skipped.")},
+        description="Add users to the group's members."
+    )
+    @action(detail=True, methods=['post'], url_path='members/add',
+            permission_classes=[IsAuthenticated, IsGroupInstructorOrStaff])
+    def add_members(self, request, pk=None):
+        group = self.get_object()
+        serializer = GroupMembershipSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
+        added = add_group_members(group, serializer.validated_data['ids'])
+        return Response({"added": added}, status=status.HTTP_200_OK)
 
-class ReservationViewSet(viewsets.ModelViewSet):
+    @extend_schema(
+        request=GroupMembershipSerializer,
+        responses={200: OpenApiResponse(description="Number of members removed.")},
+        description="Remove users from the group's members."
+    )
+    @action(detail=True, methods=['post'], url_path='members/remove',
+            permission_classes=[IsAuthenticated, IsGroupInstructorOrStaff])
+    def remove_members(self, request, pk=None):
+        group = self.get_object()
+        serializer = GroupMembershipSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        removed = remove_group_members(group, serializer.validated_data['ids'])
+        return Response({"removed": removed}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request={'multipart/form-data': RosterImportSerializer},
+        responses={
+            200: OpenApiResponse(description="Numbers of members added and removed."),
+            400: OpenApiResponse(description="Unreadable roster or unknown users; nothing was changed."),
+        },
+        description="Import the group's members from a CSV roster with an id, username or email column."
+    )
+    @action(detail=True, methods=['post'], url_path='members/import', parser_classes=[MultiPartParser],
+            permission_classes=[IsAuthenticated, IsGroupInstructorOrStaff])
+    def import_roster(self, request, pk=None):
+        group = self.get_object()
+        serializer = RosterImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user_ids = serializer.validated_data['user_ids']
+        if serializer.validated_data['replace']:
+            added, removed = replace_group_members(group, user_ids)
+        else:
+            added, removed = add_group_members(group, user_ids), 0
+        return Response({"added": added, "removed": removed}, status=status.HTTP_200_OK)
+
+
+@extend_schema_view(list=extend_schema(parameters=[EXPAND_GROUP_PARAMETER]),
+                    retrieve=extend_schema(parameters=[EXPAND_GROUP_PARAMETER]))
+class ReservationViewSet(ExpandMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteThrottle]
+    throttle_scope = 'reservation_write'
     serializer_class = ReservationSerializer
     queryset = Reservation.objects.none()
     filter_backends = [DjangoFilterBackend]
@@ -137,20 +561,51 @@ class ReservationViewSet(viewsets.ModelViewSet):
     }
     
     def get_queryset(self):
-        user = self.request.user
-
-        me_param = self.request.query_params.get('me', '').lower()
-        force_user_filter = me_param in ['true', '1', 'yes', 'on']
+        queryset = with_reservation_details(
+            visible_reservations(self.request.user, self.force_user_filter), expand_group='group' in self.expand
+        )
+        if self.action in ('update', 'partial_update', 'destroy'):
+            queryset = with_roles(queryset, self.request.user)
+        return queryset
 
-        if (user.is_staff or user.is_superuser) and not force_user_filter:
-            return Reservation.objects.all()
+    @property
+    def force_user_filter(self):
+        return self.request.query_params.get('me', '').lower() in ['true', '1', 'yes', 'on']
 
-        return Reservation.objects.filter(
-            Q(reservation_info__user=user) |
-            Q(reservation_info__group__class_representatives=user) |
-            Q(reservation_info__group__instructors=user)
-        ).distinct()
+    def list(self, request, *args, **kwargs):
+        # Read before the list, so the list already contains every change up to this version.
+        version = current_version()
+        response = super().list(request, *args, **kwargs)
+        response['X-Change-Version'] = version
+        return response
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='since', type=int, location=OpenApiParameter.QUERY, required=True,
+                             description="Last synced version, from X-Change-Version or a previous response."),
+            OpenApiParameter(name='me', type=bool, location=OpenApiParameter.QUERY, required=False),
+        ],
+        responses={200: ReservationChangeFeedSerializer, 400: OpenApiResponse(description="Missing since.")},
+        description=(
+            "Reservation changes after `since`, at most one per reservation. Continue from `version` "
+            "while `has_more` is true. With `resync` set, reload the full list instead."
+        )
+    )
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        try:
+            since = int(request.query_params['since'])
+        except (KeyError, ValueError):
+            return Response({'error': 'since must be an integer version.'}, status=400)
+
+        version, changes, has_more, resync = changes_since(request.user, since, self.force_user_filter)
+        return Response(ReservationChangeFeedSerializer(
+            {'version': version, 'has_more': has_more, 'resync': resync, 'changes': changes},
+            context=self.get_serializer_context()
+        ).data)
+
+    @extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER])
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -158,12 +613,14 @@ class ReservationViewSet(viewsets.ModelViewSet):
         room = serializer.validated_data.get('room')
         date_time = serializer.validated_data.get('date_time')
 
-        if Reservation.objects.filter(room=room, date_time=date_time).exists():
-            return Response(
-                {"detail": "A reservation already exists for this room at the given time."},
-                status=status.HTTP_409_CONFLICT
-            )
-        serializer.save()
+        with transaction.atomic():
+            lock_room(room)
+            if is_slot_taken(room, date_time):
+                return Response(
+                    {"detail": "A reservation already exists for this room at the given time."},
+                    status=status.HTTP_409_CONFLICT
+                )
+            serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @extend_schema(
@@ -172,7 +629,8 @@ class ReservationViewSet(viewsets.ModelViewSet):
             200: OpenApiResponse(description="Reservation updated successfully."),
             202: OpenApiResponse(description="Confirmation email sent to reservation owner."),
             403: OpenApiResponse(description="You do not have permission to modify this reservation."),
-            400: OpenApiResponse(description="Validation failed.")
+            400: OpenApiResponse(description="Validation failed."),
+            409: OpenApiResponse(description="The target slot is already booked.")
         },
         description="Update reservation. Staff can update immediately.Class representatives trigger email confirmation."
     )
@@ -182,25 +640,31 @@ class ReservationViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
 
         user = request.user
-
-        group = reservation.reservation_info.group
+        roles = request_roles(request, reservation)
         proposed_date_time = serializer.validated_data.get('proposed_date_time')
         proposed_room = serializer.validated_data.get('proposed_room')
 
-        if group and group.class_representatives.filter(id=user.id).exists():
+        if REPRESENTATIVE in roles:
 
-            reservation.proposed_date_time = proposed_date_time
-            reservation.proposed_room = proposed_room
-            reservation.save()
+            if not proposed_room and not proposed_date_time:
+                return Response({"detail": "Propose a new room or date time."}, status=400)
 
-            instructor = group.instructors.first()
+            instructor = get_user_model().objects.filter(pk=reservation.first_instructor_id).first()
             if not instructor:
                 return Response({"detail": "No instructor assigned to the group."}, status=400)
 
+            change_request = ReservationChangeRequest.objects.create(
+                reservation=reservation,
+                requested_by=user,
+                instructor=instructor,
+                proposed_room=proposed_room,
+                proposed_date_time=proposed_date_time
+            )
+
             extra_context = {
                 'requesting_user': user,
                 'reservation': reservation,
-
+                'change_request': change_request,
             }
 
             send_email(
@@ -215,21 +679,26 @@ class ReservationViewSet(viewsets.ModelViewSet):
 
             return Response({
                 "detail": "Confirmation email sent to reservation instructor.",
-                "reservation_id": reservation.id
+                "reservation_id": reservation.id,
+                "change_request_id": change_request.id
             }, status=status.HTTP_202_ACCEPTED)
 
-        elif group and group.instructors.filter(id=user.id).exists():
-            reservation.date_time = proposed_date_time
-            reservation.room = proposed_room
-            reservation.proposed_room = None
-            reservation.proposed_date_time = None
-            reservation.save()
+        elif roles & {INSTRUCTOR, STAFF}:
+            try:
+                move_reservation(reservation, proposed_room, proposed_date_time)
+            except ReservationConflict:
+                return Response(
+                    {"detail": "A reservation already exists for this room at the given time."},
+                    status=status.HTTP_409_CONFLICT
+                )
             return Response({"detail": "Reservation updated successfully."}, status=status.HTTP_200_OK)
 
         return Response({"detail": "You do not have permission to modify this reservation."},
                         status=status.HTTP_403_FORBIDDEN)
 
+    @extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER])
     @action(detail=False, methods=['post'], url_path='bulk_create')
+    @idempotent
     def bulk_create_reservation(self, request):
         data = request.data.copy()
         if 'reservation_info_data' in data:
@@ -240,6 +709,72 @@ class ReservationViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response({"detail": "Reservations created successfully."}, status=status.HTTP_201_CREATED)
     
+    def _forbidden_ids(self, reservation_ids, allowed_roles):
+        # Unknown ids are reported like forbidden ones, so the response does not reveal which exist.
+        roles = reservation_roles(self.request.user, reservation_ids)
+        return [pk for pk in dict.fromkeys(reservation_ids) if not roles.get(pk, frozenset()) & allowed_roles]
+
+    @extend_schema(
+        request=BulkReservationDeleteSerializer,
+        responses={
+            204: OpenApiResponse(description="Reservations deleted successfully."),
+            403: OpenApiResponse(description="Some reservations may not be deleted; nothing was deleted."),
+        },
+        description="Delete many reservations in one transaction, with the same permissions as a single delete."
+    )
+    @action(detail=False, methods=['post'], url_path='bulk_delete')
+    def bulk_delete(self, request):
+        serializer = BulkReservationDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        forbidden = self._forbidden_ids(ids, {OWNER, REPRESENTATIVE, INSTRUCTOR, STAFF})
+        if forbidden:
+            return Response({
+                "detail": "You do not have permission to delete some of these reservations. Nothing was deleted.",
+                "forbidden_ids": forbidden
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        Reservation.objects.filter(id__in=ids).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(
+        request=BulkRescheduleSerializer,
+        responses={
+            200: OpenApiResponse(description="Reservations rescheduled."),
+            403: OpenApiResponse(description="Some reservations may not be moved; nothing was applied."),
+            409: OpenApiResponse(description="Some target slots are booked; nothing was applied."),
+        },
+        description=(
+            "Shift reservations by `offset` (e.g. \"7 00:00:00\") and/or move them to `room_id` in one "
+            "transaction. Only instructors of the group and staff can move reservations directly."
+        )
+    )
+    @action(detail=False, methods=['post'], url_path='bulk_reschedule')
+    def bulk_reschedule(self, request):
+        serializer = BulkRescheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        forbidden = self._forbidden_ids(ids, {INSTRUCTOR, STAFF})
+        if forbidden:
+            return Response({
+                "detail": "You do not have permission to move some of these reservations. Nothing was applied.",
+                "forbidden_ids": forbidden
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            moved = reschedule_reservations(
+                ids, serializer.validated_data.get('offset'), serializer.validated_data.get('room_id')
+            )
+        except BulkRescheduleConflict as exc:
+            return Response({
+                "detail": "Some reservations would move into slots that are already booked. Nothing was applied.",
+                "conflicting_ids": exc.reservation_ids
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response({"updated_ids": [reservation.id for reservation in moved]}, status=status.HTTP_200_OK)
+
     @extend_schema(
         responses={
             204: OpenApiResponse(description="Reservation deleted successfully."),
@@ -249,15 +784,8 @@ class ReservationViewSet(viewsets.ModelViewSet):
     )
     def destroy(self, request, *args, **kwargs):
         reservation = self.get_object()
-        user = request.user
-
-        group = reservation.reservation_info.group
-
-        if user == reservation.reservation_info.user:
-            reservation.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if group and (group.class_representatives.filter(id=user.id).exists() or group.instructors.filter(id=user.id).exists()):
+        if request_roles(request, reservation) & {OWNER, REPRESENTATIVE, INSTRUCTOR, STAFF}:
             reservation.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -267,19 +795,82 @@ class ReservationViewSet(viewsets.ModelViewSet):
         )
 
 
+class ReservationChangeRequestViewSet(ReplicaReadMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                                      viewsets.GenericViewSet):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReservationChangeRequestSerializer
+    queryset = ReservationChangeRequest.objects.none()
+
+    def get_queryset(self):
+        change_status = self.request.query_params.get('status', ReservationChangeRequest.Status.PENDING)
+        return ReservationChangeRequest.objects.of_live_reservations().filter(
+            instructor=self.request.user,
+            status=change_status
+        ).select_related(
+            'requested_by',
+            'proposed_room__building',
+            'proposed_room__equipment',
+            'reservation__room__building',
+            'reservation__room__equipment',
+            'reservation__reservation_info__user',
+        ).prefetch_related(
+            Prefetch('reservation__reservation_info__group', queryset=class_groups()),
+        ).order_by('created_at')
+
+    def _decide(self, request, approve):
+        serializer = ChangeRequestDecisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            decided = decide_change_requests(request.user, serializer.validated_data['ids'], approve=approve)
+        except ChangeRequestConflict as exc:
+            return Response({
+                "detail": "Some change requests target slots that are already booked. Nothing was applied.",
+                "conflicting_ids": exc.change_request_ids
+            }, status=status.HTTP_409_CONFLICT)
+
+        decided_ids = {change_request.id for change_request in decided}
+        return Response({
+            "decided_ids": sorted(decided_ids),
+            "skipped_ids": [pk for pk in serializer.validated_data['ids'] if pk not in decided_ids]
+        }, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=ChangeRequestDecisionSerializer,
+        responses={
+            200: OpenApiResponse(description="Change requests approved."),
+            409: OpenApiResponse(description="Some requests target booked slots; nothing was applied.")
+        },
+        description="Approve pending change requests from the instructor's inbox in one transaction."
+    )
+    @action(detail=False, methods=['post'])
+    def approve(self, request):
+        return self._decide(request, approve=True)
+
+    @extend_schema(
+        request=ChangeRequestDecisionSerializer,
+        responses={200: OpenApiResponse(description="Change requests rejected.")},
+        description="Reject pending change requests from the instructor's inbox in one transaction."
+    )
+    @action(detail=False, methods=['post'])
+    def reject(self, request):
+        return self._decide(request, approve=False)
+
+
 class ReservationUpdateConfirmationView(APIView):
     @extend_schema(
         parameters=[
             OpenApiParameter('uidb64', str, OpenApiParameter.PATH),
             OpenApiParameter('token', str, OpenApiParameter.PATH),
-            OpenApiParameter('reservation_id', str, OpenApiParameter.PATH)
+            OpenApiParameter('change_request_id', str, OpenApiParameter.PATH)
         ],
         responses={
             200: OpenApiResponse(description="Reservation updated correctly"),
-            400: OpenApiResponse(description="Invalid token or validation error")
+            400: OpenApiResponse(description="Invalid token or validation error"),
+            409: OpenApiResponse(description="The proposed slot is no longer free")
         }
     )
-    def get(self, request, uidb64, token, reservation_id):
+    def get(self, request, uidb64, token, change_request_id):
         try:
             uid = force_str(urlsafe_base64_decode(uidb64))
             user = get_user_model().objects.get(pk=uid)
@@ -289,21 +880,41 @@ class ReservationUpdateConfirmationView(APIView):
         if not default_token_generator.check_token(user, token):
             return Response({"detail": 'Token invalid or expired.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not reservation_id:
-            return Response({"detail": "Reservation ID not provided."}, status=status.HTTP_400_BAD_REQUEST)
+        if not change_request_id:
+            return Response({"detail": "Change request ID not provided."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            reservation = Reservation.objects.get(id=reservation_id)
-        except Reservation.DoesNotExist:
-            return Response({"detail": "Reservation not found."}, status=status.HTTP_404_NOT_FOUND)
+            change_request = ReservationChangeRequest.objects.of_live_reservations().get(
+                id=change_request_id, instructor=user
+            )
+        except (ReservationChangeRequest.DoesNotExist, ValueError):
+            return Response({"detail": "Change request not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        if not reservation.proposed_date_time:
+        try:
+            decided = decide_change_requests(user, [change_request.id], approve=True)
+        except ChangeRequestConflict:
+            return Response(
+                {"detail": "The proposed slot has been taken in the meantime."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if not decided:
             return Response({"detail": "No pending update to confirm."}, status=status.HTTP_400_BAD_REQUEST)
 
-        reservation.date_time = reservation.proposed_date_time
-        reservation.proposed_date_time = None
-        reservation.room = reservation.proposed_room
-        reservation.proposed_room = None
-        reservation.save()
+        pin_to_primary(replica_pin_key(request, user))
 
         return Response({"detail": "Reservation updated correctly."}, status=status.HTTP_200_OK)
+
+
+class CalendarFeedViewSet(ReplicaReadMixin, mixins.CreateModelMixin, mixins.ListModelMixin,
+                          mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """The requester's calendar subscriptions; deleting one revokes its URL."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = CalendarFeedSerializer
+    queryset = CalendarFeed.objects.none()
+
+    def get_queryset(self):
+        return CalendarFeed.objects.filter(user=self.request.user).order_by('id')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
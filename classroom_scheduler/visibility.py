@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .changes import record_resync
+from .feeds import touch_feeds
+from .models import ClassGroup, Reservation, ReservationInfo, ReservationVisibility
+
+
+def expected_visibility(infos):
+    """(user_id, reservation_info_id) pairs for (info_id, user_id, group_id) rows."""
+    infos = list(infos)
+    group_ids = {group_id for _, _, group_id in infos if group_id}
+
+    viewers_by_group = defaultdict(set)
+    for through in (ClassGroup.class_representatives.through, ClassGroup.instructors.through):
+        for group_id, user_id in through.objects.filter(classgroup_id__in=group_ids).values_list(
+            'classgroup_id', 'customuser_id'
+        ):
+            viewers_by_group[group_id].add(user_id)
+
+    pairs = set()
+    for info_id, owner_id, group_id in infos:
+        pairs.add((owner_id, info_id))
+        pairs.update((user_id, info_id) for user_id in viewers_by_group.get(group_id, ()))
+    return pairs
+
+
+def refresh_visibility(reservation_info_ids):
+    """
+    Bring the visibility rows of the given reservation infos in line with their owner and group.
+    Tombstoned infos keep their rows, so delta sync can still report their deleted reservations.
+    """
+    reservation_info_ids = list(reservation_info_ids)
+    if not reservation_info_ids:
+        return
+
+    with transaction.atomic():
+        expected = expected_visibility(
+            ReservationInfo.all_objects.filter(id__in=reservation_info_ids).values_list('id', 'user_id', 'group_id')
+        )
+        existing = {
+            (user_id, info_id): pk
+            for pk, user_id, info_id in ReservationVisibility.objects.filter(
+                reservation_info_id__in=reservation_info_ids
+            ).values_list('id', 'user_id', 'reservation_info_id')
+        }
+
+        stale = {pair: pk for pair, pk in existing.items() if pair not in expected}
+        if stale:
+            ReservationVisibility.objects.filter(id__in=stale.values()).delete()
+
+        added = [pair for pair in expected if pair not in existing]
+        ReservationVisibility.objects.bulk_create(
+            [ReservationVisibility(user_id=user_id, reservation_info_id=info_id) for user_id, info_id in added],
+            ignore_conflicts=True
+        )
+
+        changed = set(stale) | set(added)
+        if changed:
+            touch_feeds(user_ids={user_id for user_id, _ in changed})
+
+            # Users who gained or lost booked reservations cannot catch up through the change log.
+            booked = set(Reservation.objects.filter(
+                reservation_info_id__in={info_id for _, info_id in changed}
+            ).values_list('reservation_info_id', flat=True).distinct())
+            resync_users = {user_id for user_id, info_id in changed if info_id in booked}
+            if resync_users:
+                record_resync(resync_users)
+
+
+def refresh_group_visibility(group_ids):
+    refresh_visibility(ReservationInfo.all_objects.filter(group_id__in=group_ids).values_list('id', flat=True))
+
+
+def rebuild_visibility(batch_size=1000):
+    """Recompute the whole table, one transaction per batch of reservation infos. Returns the number of infos."""
+    info_ids = list(ReservationInfo.all_objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(info_ids), batch_size):
+        refresh_visibility(info_ids[start:start + batch_size])
+    return len(info_ids)
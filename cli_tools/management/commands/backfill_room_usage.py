@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from analytics.usage import rebuild_room_usage
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the room usage tables behind /api/analytics/ from all reservations. Run once '
+        'after deploying the analytics app and after writes that bypassed reservation signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per insert.')
+
+    def handle(self, *args, **options):
+        count = rebuild_room_usage(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} room usage rows."))
@@ -0,0 +1,56 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare per-request database latency when every request opens a fresh connection '
+        'against the configured connection handling (DB_CONN_MAX_AGE or DB_POOL).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Simulated requests per mode.')
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        options_dict = connection.settings_dict['OPTIONS']
+        if 'pool' in options_dict:
+            configured = f"pool {options_dict['pool']}"
+        else:
+            configured = f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}"
+
+        unpooled = connection.__class__(
+            {
+                **connection.settings_dict,
+                'CONN_MAX_AGE': 0,
+                'OPTIONS': {key: value for key, value in options_dict.items() if key != 'pool'},
+            },
+            alias='benchmark_unpooled'
+        )
+
+        self.report('fresh connection per request', self.measure(options['requests'], unpooled, unpooled.close))
+        self.report(f'configured ({configured})', self.measure(options['requests'], connection, close_old_connections))
+
+    def measure(self, total, wrapper, end_of_request):
+        # Mirrors a request cycle: Django calls close_old_connections() when a request starts and
+        # finishes, which only closes the connection when it may not be reused.
+        latencies = []
+        for _ in range(total):
+            started = time.perf_counter()
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            end_of_request()
+            latencies.append(time.perf_counter() - started)
+        return sorted(latencies)
+
+    def report(self, label, latencies):
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: mean {statistics.mean(latencies) * 1000:.2f} ms, "
+            f"p50 {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p95 {p95 * 1000:.2f} ms"
+        ))
@@ -0,0 +1,73 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.hashers import TunedArgon2PasswordHasher, TunedPBKDF2PasswordHasher, TunedScryptPasswordHasher
+
+PASSWORD = 'correct horse battery staple'
+SALT = 'benchmarksalt0123456789'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how long each password hasher takes on this host with the configured parameters, '
+        'and recommend parameters that bring one hash close to --target-ms. Run it on the '
+        'deployment host: the right cost depends on its CPUs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250.0, help='Wanted duration of one hash.')
+        parser.add_argument('--rounds', type=int, default=3, help='Hashes per measurement; the median is used.')
+
+    def handle(self, *args, **options):
+        self.rounds = options['rounds']
+        target = options['target_ms'] / 1000
+        self.stdout.write(f"Profile in use: {settings.PASSWORD_HASHER_PROFILE}; target {options['target_ms']:.0f} ms")
+
+        self.pbkdf2(target)
+        self.scrypt(target)
+        try:
+            self.argon2(target)
+        except ValueError:
+            self.stdout.write("argon2: argon2-cffi is not installed, skipped")
+
+    def measure(self, encode):
+        durations = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            encode()
+            durations.append(time.perf_counter() - started)
+        return statistics.median(durations)
+
+    def report(self, name, current, settings_line):
+        self.stdout.write(f"{name}: {current * 1000:.0f} ms with the current parameters")
+        self.stdout.write(self.style.SUCCESS(f"  recommended: {settings_line}"))
+
+    def pbkdf2(self, target):
+        hasher = TunedPBKDF2PasswordHasher()
+        current = self.measure(lambda: hasher.encode(PASSWORD, SALT))
+        # Cost is linear in the iteration count.
+        iterations = max(100_000, round(hasher.iterations * target / current, -4))
+        self.report('pbkdf2', current, f"PASSWORD_HASH_PBKDF2_ITERATIONS={iterations:.0f}")
+
+    def scrypt(self, target):
+        hasher = TunedScryptPasswordHasher()
+        r, p = hasher.block_size, hasher.parallelism
+        current = self.measure(lambda: hasher.encode(PASSWORD, SALT))
+
+        # The work factor must be a power of two; take the largest that stays within the target.
+        n = 2 ** 10
+        while self.measure(lambda: hasher.encode(PASSWORD, SALT, n=n * 2, r=r, p=p)) <= target:
+            n *= 2
+        self.report('scrypt', current,
+                    f"PASSWORD_HASH_SCRYPT_WORK_FACTOR={n} (uses {128 * n * r // 2 ** 20} MiB per hash)")
+
+    def argon2(self, target):
+        hasher = TunedArgon2PasswordHasher()
+        hasher._load_library()
+        current = self.measure(lambda: hasher.encode(PASSWORD, SALT))
+        # Memory is kept; time cost, linear in duration, is scaled to the target.
+        time_cost = max(1, round(hasher.time_cost * target / current))
+        self.report('argon2', current, f"PASSWORD_HASH_ARGON2_TIME_COST={time_cost}")
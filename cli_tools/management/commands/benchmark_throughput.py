@@ -0,0 +1,62 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent-request throughput of running deployments, e.g. the sync API under '
+        '"gunicorn bruker_backend.wsgi" against the async read endpoints under '
+        '"uvicorn bruker_backend.asgi:application". Every --url is benchmarked in turn.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True,
+                            help='Full URL to request, e.g. http://localhost:8000/api/async/rooms/. Repeatable.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per URL.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--token', help='API token sent as "Authorization: Token <token>".')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds.')
+
+    def handle(self, *args, **options):
+        headers = {'Authorization': f"Token {options['token']}"} if options['token'] else {}
+
+        for url in options['url']:
+            self.stdout.write(f"{url} ({options['requests']} requests, concurrency {options['concurrency']})")
+            latencies, errors, elapsed = self.run(url, headers, options['requests'], options['concurrency'], options['timeout'])
+            self.report(latencies, errors, elapsed)
+
+    def run(self, url, headers, total, concurrency, timeout):
+        def fetch(_):
+            started = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers), timeout=timeout) as response:
+                    response.read()
+            except (HTTPError, URLError, TimeoutError):
+                return None
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(result for result in results if result is not None)
+        return latencies, len(results) - len(latencies), elapsed
+
+    def report(self, latencies, errors, elapsed):
+        if not latencies:
+            self.stderr.write(self.style.ERROR(f"  all {errors} requests failed"))
+            return
+
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f"  {len(latencies) / elapsed:.1f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:.1f} ms, "
+            f"p95 {p95 * 1000:.1f} ms, "
+            f"errors {errors}"
+        ))
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bruker_backend.schema import build_schema
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the OpenAPI schema into OPENAPI_SCHEMA_FILE (or --file) for /api/schema/ to serve. '
+        'Run it at deploy time, after the code is in place; running workers pick the new file up.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Output path; defaults to OPENAPI_SCHEMA_FILE.')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.OPENAPI_SCHEMA_FILE
+        if not path:
+            raise CommandError('Set OPENAPI_SCHEMA_FILE or pass --file.')
+
+        body = build_schema()
+
+        # Written next to the target and renamed, so workers never read a half-written file.
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as schema_file:
+            schema_file.write(body)
+        os.chmod(schema_file.name, 0o644)
+        os.replace(schema_file.name, path)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(body)} bytes of OpenAPI schema to {path}."))
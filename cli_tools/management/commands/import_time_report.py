@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Run in a fresh interpreter, since this process has imported everything already.
+STARTUP_SCRIPT = (
+    'import django; django.setup(); '
+    'from django.core.wsgi import get_wsgi_application; get_wsgi_application(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Report where a worker spends its import time: starts a fresh interpreter with '
+        '"python -X importtime" under the current settings (pass --settings to compare profiles), '
+        'loads the apps and the URLconf the way a worker does, and lists the most expensive packages.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=15, help='Number of packages and modules to list.')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode:
+            self.stderr.write(self.style.ERROR(result.stderr.strip().splitlines()[-1]))
+            return
+
+        modules = parse_importtime(result.stderr)
+        by_package = defaultdict(int)
+        for name, self_us, _ in modules:
+            by_package[name.split('.')[0]] += self_us
+
+        total = sum(self_us for _, self_us, _ in modules)
+        self.stdout.write(f"{settings.SETTINGS_MODULE}: {len(modules)} modules, {total / 1000:.0f} ms importing")
+
+        self.stdout.write("\nPackages by own import time:")
+        for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:options['limit']]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} ms  {package}")
+
+        self.stdout.write("\nModules by cumulative import time:")
+        for name, _, cumulative_us in sorted(modules, key=lambda module: -module[2])[:options['limit']]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+def parse_importtime(output):
+    """(module, self µs, cumulative µs) for every line of `-X importtime` output."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if self_us.strip().isdigit():
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
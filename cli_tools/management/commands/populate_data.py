@@ -1,5 +1,5 @@
 import json
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from pathlib import Path
 from django.urls import reverse
 from rest_framework.test import APIClient
@@ -42,18 +42,15 @@ class Command(BaseCommand):
         with open(base_path / 'Groups.json') as f:
             groups = json.load(f)
             for group_data in groups:
-                members = [CustomUser.objects.get(username=name).pk for name in group_data.pop('members')]
-                class_rep = [CustomUser.objects.get(username=name).pk for name in group_data.pop('class_representatives')]
-                instructors = [CustomUser.objects.get(username=name).pk for name in group_data.pop('instructors')]
+                members = self.user_ids(group_data.pop('members'))
+                class_rep = self.user_ids(group_data.pop('class_representatives'))
+                instructors = self.user_ids(group_data.pop('instructors'))
 
                 group, created = ClassGroup.objects.get_or_create(**group_data)
                 if created:
-                    for mem in members:
-                        group.members.add(mem)
-                    for rep in class_rep:
-                        group.class_representatives.add(rep)
-                    for inst in instructors:
-                        group.instructors.add(inst)
+                    group.members.add(*members)
+                    group.class_representatives.add(*class_rep)
+                    group.instructors.add(*instructors)
                 self.stdout.write(self.style.SUCCESS(f"{'Created' if created else 'Skipped'} class group: {group.name}"))
 
         with open(base_path / 'Reservations.json') as f:
@@ -83,4 +80,11 @@ class Command(BaseCommand):
                 if resp.status_code == 201:
                     self.stdout.write(self.style.SUCCESS("Batch created successfully."))
                 else:
-                    self.stderr.write(self.style.ERROR(f"Error: {resp.status_code} - {resp.json()}"))
\ No newline at end of file
+                    self.stderr.write(self.style.ERROR(f"Error: {resp.status_code} - {resp.json()}"))
+
+    def user_ids(self, usernames):
+        users = CustomUser.objects.in_bulk(usernames, field_name='username')
+        missing = [name for name in usernames if name not in users]
+        if missing:
+            raise CommandError(f"Unknown users: {', '.join(missing)}")
+        return [users[name].pk for name in usernames]
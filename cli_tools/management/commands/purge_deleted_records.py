@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from classroom_scheduler.services import cascade_tombstones, purge_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Tombstone the reservations of deleted rooms and reservation infos, then hard-delete tombstones '
+        'older than SOFT_DELETE_RETENTION_DAYS. Works in small batches; meant for a frequent periodic job.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per transaction.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        tombstoned = cascade_tombstones(options['batch_size'])
+        purged = purge_tombstones(options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Tombstoned {tombstoned} reservations of deleted rooms and infos; purged "
+            + ", ".join(f"{count} {name}" for name, count in purged.items())
+            + f" in {time.perf_counter() - started:.1f}s."
+        ))
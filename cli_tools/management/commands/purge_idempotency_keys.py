@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from classroom_scheduler.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL_HOURS. Meant for a periodic job.'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys."))
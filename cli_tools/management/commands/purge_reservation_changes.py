@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from classroom_scheduler.changes import purge_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete reservation change log entries older than RESERVATION_CHANGE_RETENTION_DAYS. Clients '
+        'that last synced before the oldest remaining entry are told to resync. Meant for a periodic job.'
+    )
+
+    def handle(self, *args, **options):
+        deleted = purge_changes()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} reservation change log entries."))
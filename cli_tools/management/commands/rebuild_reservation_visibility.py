@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from classroom_scheduler.visibility import rebuild_visibility
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the per-user reservation visibility table from reservation owners and group '
+        'representatives/instructors. Only needed after writes that bypassed model signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Reservation infos per transaction.')
+
+    def handle(self, *args, **options):
+        count = rebuild_visibility(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Visibility rebuilt for {count} reservation infos."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from classroom_scheduler.search import rebuild_search_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the stored full-text documents of all buildings and rooms. Saves keep them '
+        'current; this is for rows written with bulk operations or raw SQL.'
+    )
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            self.stdout.write("Full-text search needs Postgres; nothing to do.")
+            return
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} buildings and their rooms."))
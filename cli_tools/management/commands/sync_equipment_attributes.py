@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from classroom_scheduler.equipment import normalize_equipment_details, sync_attribute_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply the equipment attribute registry: store registered values of existing equipment '
+        'with their types and create or drop the expression indexes of numeric and boolean keys. '
+        'Run it after registering, retyping or removing an attribute.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-normalize', action='store_true', help="Only sync the indexes.")
+
+    def handle(self, *args, **options):
+        if not options['skip_normalize']:
+            updated, invalid = normalize_equipment_details()
+            self.stdout.write(f"Normalized the details of {updated} equipment rows.")
+            for equipment_id, errors in invalid.items():
+                for key, error in errors.items():
+                    self.stderr.write(f"Equipment {equipment_id}, {key}: {error}")
+
+        created, dropped = sync_attribute_indexes()
+        for name in created:
+            self.stdout.write(f"Created index {name}")
+        for name in dropped:
+            self.stdout.write(f"Dropped index {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} indexes created, {len(dropped)} dropped."))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bruker_backend.throttling import rejection_counts, reset_rejection_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Report how many requests each throttle scope has rejected since the counters were last '
+        'reset. With a per-process THROTTLE_CACHE_URL (locmem) this only sees the current process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting.')
+
+    def handle(self, *args, **options):
+        scopes = sorted(settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {}))
+        for scope, count in rejection_counts(scopes).items():
+            rate = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope]
+            self.stdout.write(f"{scope:<20} {rate or 'unlimited':<12} {count} rejected")
+
+        if options['reset']:
+            reset_rejection_counts(scopes)
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
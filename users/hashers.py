@@ -0,0 +1,46 @@
+"""
+Password hashers whose cost comes from settings (see benchmark_password_hashers). A stored hash
+made with other parameters, or by a hasher other than the first in PASSWORD_HASHERS, is rehashed
+by check_password() on the user's next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    # Only a ceiling: hashlib's default of 32 MiB would reject larger work factors.
+    maxmem = 2 ** 30
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_HASH_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_HASH_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASH_SCRYPT_PARALLELISM
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Needs argon2-cffi."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_HASH_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_HASH_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASH_ARGON2_PARALLELISM
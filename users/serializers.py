@@ -33,14 +33,13 @@ class RegisterSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
+        # One hash and one INSERT: the password is hashed once, with the preferred hasher.
         user = CustomUser.objects.create_user(
             username=validated_data['username'],
             email=validated_data['email'],
-
+            password=validated_data['password'],
+            is_active=False,
         )
-        user.set_password(validated_data['password'])
-        user.is_active = False
-        user.save()
         Token.objects.create(user=user)
         return user
 
@@ -1,3 +1,42 @@
-from django.test import TestCase
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import identify_hasher
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from .models import CustomUser
+
+SCRYPT_FIRST = [
+    'users.hashers.TunedScryptPasswordHasher',
+    'users.hashers.TunedPBKDF2PasswordHasher',
+]
+
+
+@override_settings(PASSWORD_HASH_PBKDF2_ITERATIONS=1000, PASSWORD_HASH_SCRYPT_WORK_FACTOR=2 ** 10)
+class PasswordHashingTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='student', email='student@example.com', password='secret')
+
+    def test_parameters_come_from_settings(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_login_upgrades_cost(self):
+        with override_settings(PASSWORD_HASH_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(authenticate(username='student@example.com', password='secret'), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_login_upgrades_to_preferred_hasher(self):
+        with override_settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            self.assertEqual(authenticate(username='student', password='secret'), self.user)
+            self.user.refresh_from_db()
+            self.assertEqual(identify_hasher(self.user.password).algorithm, 'scrypt')
+            self.assertIn('$1024$', self.user.password)
+            self.assertIsNone(authenticate(username='student', password='wrong'))
+
+    def test_register_hashes_once(self):
+        response = self.client.post('/users/register/', {
+            'username': 'new', 'email': 'new@example.com', 'password': 'pass1234!', 'password2': 'pass1234!'
+        })
+        self.assertEqual(response.status_code, 201)
+        user = CustomUser.objects.get(username='new')
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password('pass1234!'))
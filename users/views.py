@@ -13,6 +13,7 @@ from .serializers import RegisterSerializer, LoginSerializer, TokenResponseSeria
     ResetPasswordRequestSerializer, MessageSerializer
 from .tokens import account_activation_token
 from django.conf import settings
+from bruker_backend.throttling import SlidingWindowThrottle
 
 
 def send_email(request, user, mail_subject, token_generator, template_name, to_email,extra_context=None):
@@ -62,6 +63,8 @@ class ActivateAccountView(APIView):
 
 
 class ResetPasswordRequestView(APIView):
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'password_reset'
 
     @extend_schema(
         request=ResetPasswordRequestSerializer,
@@ -119,6 +122,9 @@ class ResetPasswordConfirmationView(APIView):
 
 
 class RegisterView(APIView):
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'register'
+
     @extend_schema(
         request=RegisterSerializer,
         responses={201: TokenResponseSerializer},
@@ -143,6 +149,9 @@ class RegisterView(APIView):
 
 
 class LoginView(APIView):
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scope = 'login'
+
     @extend_schema(
         request=LoginSerializer,
         responses={200: TokenResponseSerializer},